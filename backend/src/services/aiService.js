@@ -48,7 +48,11 @@ class AIService {
                 `${ML_SERVICE_URL}/api/predict/health`,
                 data,
                 {
-                    headers: { 'Content-Type': 'application/json' },
+                    headers: {
+                        'Content-Type': 'application/json',
+                        // ML service membuang request yang sudah tidak kita tunggu
+                        'X-Request-Timeout-Ms': '5000'
+                    },
                     timeout: 5000 // Short timeout to fallback quickly
                 }
             );
@@ -159,7 +163,7 @@ class AIService {
                     `${ML_SERVICE_URL}/api/predict/disease`,
                     formData,
                     {
-                        headers: formData.getHeaders(),
+                        headers: { ...formData.getHeaders(), 'X-Request-Timeout-Ms': '60000' },
                         timeout: 60000
                     }
                 );
@@ -169,7 +173,7 @@ class AIService {
                     `${ML_SERVICE_URL}/api/predict/disease`,
                     { image: imageData },
                     {
-                        headers: { 'Content-Type': 'application/json' },
+                        headers: { 'Content-Type': 'application/json', 'X-Request-Timeout-Ms': '60000' },
                         timeout: 60000
                     }
                 );
@@ -184,6 +188,48 @@ class AIService {
         }
     }
 
+    /**
+     * Add/update a product in the ML visual search index
+     * Dipanggil setelah produk dibuat/diubah, error tidak menggagalkan request
+     * @param {Object} product - Product with id and images
+     */
+    static async indexProduct(product) {
+        const imageUrl = product?.images?.[0];
+        if (!product?.id || !imageUrl) return null;
+
+        try {
+            const response = await axios.post(
+                `${ML_SERVICE_URL}/api/index/products`,
+                { products: [{ id: product.id, image_url: imageUrl }] },
+                {
+                    headers: { 'Content-Type': 'application/json', 'X-Request-Timeout-Ms': '30000' },
+                    timeout: 30000
+                }
+            );
+            return response.data;
+        } catch (error) {
+            console.log(`ML index update failed for product ${product.id}: ${error.message}`);
+            return null;
+        }
+    }
+
+    /**
+     * Remove a product from the ML visual search index
+     * @param {string} productId - Product ID
+     */
+    static async removeProductFromIndex(productId) {
+        try {
+            const response = await axios.delete(
+                `${ML_SERVICE_URL}/api/index/products/${encodeURIComponent(productId)}`,
+                { timeout: 5000 }
+            );
+            return response.data;
+        } catch (error) {
+            console.log(`ML index removal failed for product ${productId}: ${error.message}`);
+            return null;
+        }
+    }
+
     /**
      * Get current model status
      */
@@ -8,6 +8,7 @@ const Order = require('../models/Order');
 const Cart = require('../models/Cart');
 const User = require('../models/User');
 const Shop = require('../models/Shop');
+const AIService = require('./aiService');
 const { ORDER_STATUS, PRODUCT_STATUS, USER_ROLES } = require('../config/constants');
 
 class MarketplaceService {
@@ -41,6 +42,9 @@ class MarketplaceService {
                 status: PRODUCT_STATUS.ACTIVE,
             });
 
+            // Index visual search di ML service (tidak ditunggu)
+            AIService.indexProduct(product);
+
             return product;
         } catch (error) {
             throw error;
@@ -197,7 +201,14 @@ class MarketplaceService {
                 throw new Error('Anda tidak memiliki akses ke produk ini');
             }
 
-            return await Product.update(productId, updateData);
+            const updated = await Product.update(productId, updateData);
+
+            // Gambar mungkin berubah, perbarui index visual search (tidak ditunggu)
+            if (updateData.images) {
+                AIService.indexProduct(updated);
+            }
+
+            return updated;
         } catch (error) {
             throw error;
         }
@@ -240,6 +251,7 @@ class MarketplaceService {
             }
 
             await Product.delete(productId);
+            AIService.removeProductFromIndex(productId);
             return true;
         } catch (error) {
             throw error;
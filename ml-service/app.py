@@ -3,18 +3,29 @@ Flask API for ML Service
 Menyediakan endpoint untuk prediksi kesehatan dan deteksi penyakit
 """
 
-from flask import Flask, request, jsonify
+import time
+_APP_IMPORT_STARTED = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, g
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import importlib
 import os
 import sys
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from models.health_predictor import HealthPredictor
-from models.disease_detector import DiseaseDetector
-from models.product_analyzer import ProductAnalyzer
-from models.google_vision_client import GoogleVisionClient
+from models.health_training import HealthModelStore, ModelVersionWatcher, TrainingJobs
+from utils.admission import AdmissionController, Rejected, parse_deadline
+from utils.result_cache import ResultCache
+from utils.uploads import UploadRequest, read_request_image
+from utils import metrics
+from utils.metrics import stage
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -35,15 +46,456 @@ logging.getLogger('').addHandler(console)
 
 logging.info("ML Service Started with File Logging")
 
-# Initialize models
-health_predictor = HealthPredictor()
-disease_detector = DiseaseDetector()
-product_analyzer = ProductAnalyzer()
-google_vision = GoogleVisionClient(credential_path="credentials.json")
-
 # Configuration
 PORT = int(os.environ.get('ML_SERVICE_PORT', 5001))
 DEBUG = os.environ.get('ML_SERVICE_DEBUG', 'true').lower() == 'true'
+MAX_BATCH_SIZE = int(os.environ.get('ML_SERVICE_MAX_BATCH', 5000))
+# Model yang langsung dimuat saat startup: "all", atau daftar nama dipisah koma
+WARMUP_MODELS = os.environ.get('ML_SERVICE_WARMUP', '')
+# Lokasi index feature visual produk marketplace
+PRODUCT_INDEX_DIR = os.environ.get(
+    'ML_SERVICE_PRODUCT_INDEX_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_models', 'product_index')
+)
+# Baseline vital per animal_id (statistik berjalan, SQLite)
+BASELINE_DB = os.environ.get(
+    'ML_SERVICE_BASELINE_DB',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_models', 'animal_baselines.sqlite3')
+)
+# Model kesehatan berversi (hasil training background) + hot-swap
+HEALTH_MODEL_DIR = os.environ.get(
+    'ML_SERVICE_HEALTH_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'saved_models', 'health')
+)
+TRAIN_MIN_ACCURACY = float(os.environ.get('ML_SERVICE_TRAIN_MIN_ACCURACY', 0.5))
+HEALTH_KEEP_VERSIONS = int(os.environ.get('ML_SERVICE_HEALTH_KEEP_VERSIONS', 5))
+MODEL_POLL_SECONDS = float(os.environ.get('ML_SERVICE_MODEL_POLL', 2.0))
+# Upload gambar: batas ukuran body dan batas spool ke disk (bytes)
+MAX_CONTENT_LENGTH = int(os.environ.get('ML_SERVICE_MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+UPLOAD_SPOOL_BYTES = int(os.environ.get('ML_SERVICE_UPLOAD_SPOOL_BYTES', 4 * 1024 * 1024))
+# Batas waktu menunggu Google Vision (detik) sebelum memakai hasil lokal saja
+GCV_DEADLINE = float(os.environ.get('ML_SERVICE_GCV_DEADLINE', 3.0))
+GCV_WORKERS = int(os.environ.get('ML_SERVICE_GCV_WORKERS', 8))
+# Analisis multi-foto penyakit: batas foto per request
+MAX_DISEASE_IMAGES = int(os.environ.get('ML_SERVICE_DISEASE_MAX_IMAGES', 8))
+# Process pool analisis gambar (shared memory), satu per worker Gunicorn:
+# jumlah proses (0 = otomatis: core dibagi jumlah worker, 1-2 proses).
+# Multi-foto penyakit selalu lewat pool ini; endpoint satu gambar hanya
+# kalau IMAGE_OFFLOAD (default: di thread request)
+IMAGE_PROCESSES = int(os.environ.get('ML_SERVICE_IMAGE_PROCESSES', 0))
+IMAGE_OFFLOAD = os.environ.get('ML_SERVICE_IMAGE_OFFLOAD', 'false').lower() == 'true'
+IMAGE_BLOCKS = int(os.environ.get('ML_SERVICE_IMAGE_BLOCKS', 0))
+IMAGE_BLOCK_MB = int(os.environ.get('ML_SERVICE_IMAGE_BLOCK_MB', 40))
+IMAGE_QUEUE_TIMEOUT = float(os.environ.get('ML_SERVICE_IMAGE_QUEUE_TIMEOUT', 5.0))
+# Admission control: "konkurensi:antrean" per endpoint (per proses worker).
+# Antrean penuh -> 503 + Retry-After; request tanpa header deadline menunggu
+# slot paling lama ADMISSION_QUEUE_TIMEOUT detik (timeout backend Node 5 s)
+ADMISSION_ENABLED = os.environ.get('ML_SERVICE_ADMISSION', 'true').lower() == 'true'
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ML_SERVICE_QUEUE_TIMEOUT', 5.0))
+# Thread per worker Gunicorn (gthread, lihat gunicorn.conf.py). Request yang
+# berjalan dan yang antre sama-sama memegang satu thread, jadi konkurensi +
+# antrean per endpoint diturunkan dari jumlah thread dan harus < thread;
+# kalau tidak, request berlebih menunggu di backlog Gunicorn, bukan di sini
+# (queue_full tidak pernah terjadi).
+WORKER_THREADS = int(os.environ.get('ML_SERVICE_THREADS', 16))
+
+
+def _thread_share(divisor, minimum=1):
+    return max(minimum, WORKER_THREADS // divisor)
+
+
+ADMISSION_DEFAULTS = {
+    'analyze_product': (_thread_share(8), _thread_share(4, 0)),
+    'index_products': (_thread_share(16), _thread_share(8, 0)),
+    'predict_health': (_thread_share(4), _thread_share(2, 0)),
+    'predict_health_batch': (_thread_share(16), _thread_share(8, 0)),
+    'predict_disease': (_thread_share(8), _thread_share(4, 0)),
+    'predict_disease_multi': (_thread_share(16), _thread_share(8, 0)),
+    'predict_disease_burst': (_thread_share(16), _thread_share(8, 0)),
+}
+
+
+def _admission_limit(endpoint, default):
+    """ML_SERVICE_LIMIT_<ENDPOINT>=konkurensi:antrean (konkurensi 0 = tanpa batas)"""
+    value = os.environ.get(f'ML_SERVICE_LIMIT_{endpoint.upper()}')
+    if not value:
+        return default
+    concurrency, _, queue_size = value.partition(':')
+    return int(concurrency), int(queue_size or 0)
+
+
+ADMISSION_LIMITS = {name: _admission_limit(name, default) for name, default in ADMISSION_DEFAULTS.items()}
+if ADMISSION_ENABLED:
+    for _name, (_concurrency, _queue) in ADMISSION_LIMITS.items():
+        if _concurrency and _concurrency + _queue >= WORKER_THREADS:
+            print(f"WARNING: admission {_name} {_concurrency}:{_queue} >= {WORKER_THREADS} threads, "
+                  f"antrean tidak pernah penuh (naikkan ML_SERVICE_THREADS)")
+# Burst kamera: batas frame, jumlah frame stabil berturut-turut untuk berhenti, toleransi confidence
+BURST_MAX_FRAMES = int(os.environ.get('ML_SERVICE_BURST_MAX_FRAMES', 30))
+BURST_STABLE_FRAMES = int(os.environ.get('ML_SERVICE_BURST_STABLE_FRAMES', 2))
+BURST_CONFIDENCE_TOLERANCE = float(os.environ.get('ML_SERVICE_BURST_CONFIDENCE_TOLERANCE', 5.0))
+
+# Body biner / multipart dibaca ke satu buffer (lihat utils/uploads.py)
+UploadRequest.spool_threshold = UPLOAD_SPOOL_BYTES
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+
+class InvalidUpload(ValueError):
+    """Body request terpotong / tidak terbaca: dijawab 400 (lihat errorhandler)"""
+
+
+def _read_upload():
+    """Upload biner/multipart untuk request ini (ditutup di teardown)"""
+    try:
+        upload = read_request_image(request)
+    except (ValueError, ClientDisconnected) as e:
+        # Body terpotong (utils/uploads.py / werkzeug)
+        raise InvalidUpload(str(e)) from e
+    if upload is not None:
+        g.upload = upload
+    return upload
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider Flask yang mencatat waktu parse body dan serialisasi respons"""
+
+    def dumps(self, obj, **kwargs):
+        with stage('json.serialize'):
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        with stage('json.parse'):
+            return super().loads(s, **kwargs)
+
+
+app.json = TimedJSONProvider(app)
+
+
+@app.before_request
+def _start_request_metrics():
+    if metrics.ENABLED:
+        g.metrics_token = metrics.begin_request()
+        g.request_started = time.perf_counter()
+
+
+@app.before_request
+def _admit_request():
+    """Ambil slot endpoint sebelum body dibaca; antrean penuh / deadline lewat -> 503"""
+    limiter = admission.get(request.endpoint)
+    if limiter is None:
+        return
+    queued = time.perf_counter()
+    try:
+        g.admission = (limiter, limiter.acquire(parse_deadline(request.headers)))
+    except Rejected as e:
+        raise ServiceOverloaded(str(e), e.retry_after, reason=e.reason)
+    finally:
+        if metrics.ENABLED:
+            metrics.REGISTRY.observe('ml_queue_wait_seconds', 'endpoint', request.endpoint,
+                                     time.perf_counter() - queued)
+
+
+@app.before_request
+def _check_health_model_version():
+    # Murah (cek waktu); versi baru dimuat di thread background watcher
+    if registry.peek('health_predictor') is not None:
+        health_model_watcher.check()
+
+
+@app.after_request
+def _finish_request_metrics(response):
+    """Histogram latency per endpoint + header Server-Timing per tahap"""
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        total = time.perf_counter() - g.pop('request_started')
+        timings = metrics.end_request(token)
+        metrics.observe_request(request.url_rule.rule if request.url_rule else 'unmatched', total)
+        response.headers['Server-Timing'] = metrics.server_timing_header(timings, total)
+    return response
+
+
+@app.teardown_request
+def _release_admission(exc=None):
+    admitted = g.pop('admission', None)
+    if admitted is not None:
+        limiter, started = admitted
+        limiter.release(started)
+
+
+def _streaming_response(body, mimetype):
+    """
+    Response streaming yang memegang slot admission sampai body selesai
+    dikirim (atau klien putus), bukan hanya sampai view return: teardown
+    berjalan sebelum generator dikonsumsi.
+    """
+    response = Response(body, mimetype=mimetype)
+    admitted = g.pop('admission', None)
+    if admitted is not None:
+        limiter, started = admitted
+        response.call_on_close(lambda: limiter.release(started))
+    return response
+
+
+@app.teardown_request
+def _close_upload(exc=None):
+    upload = g.pop('upload', None)
+    if upload is not None:
+        upload.close()
+
+
+class ModelRegistry:
+    """
+    Lazy model registry.
+    Modul model (pandas, sklearn, scikit-image, PIL, google-cloud) baru
+    di-import dan objeknya baru dibuat saat pertama kali dipakai, atau
+    saat warm_up() dipanggil. Waktu import dan load dicatat per model.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._timings = {}
+
+    def register(self, name, module_name, factory):
+        """factory(module) -> model instance"""
+        self._factories[name] = (module_name, factory)
+        self._locks[name] = threading.Lock()
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._locks[name]:
+            # Cek lagi, mungkin thread lain sudah selesai memuat
+            if name not in self._instances:
+                module_name, factory = self._factories[name]
+
+                started = time.perf_counter()
+                with stage(f'model_load.{name}'):
+                    module = importlib.import_module(module_name)
+                    imported = time.perf_counter()
+                    instance = factory(module)
+                loaded = time.perf_counter()
+
+                self._timings[name] = {
+                    'module': module_name,
+                    'import_seconds': round(imported - started, 4),
+                    'load_seconds': round(loaded - imported, 4)
+                }
+                logging.info(f"Model {name} ready (import {imported - started:.3f}s, load {loaded - imported:.3f}s)")
+                self._instances[name] = instance
+
+        return self._instances[name]
+
+    def peek(self, name):
+        """Return the instance if already loaded, without loading it"""
+        return self._instances.get(name)
+
+    def replace(self, name, instance):
+        """
+        Swap in a new instance (mis. model hasil training baru).
+        Satu assignment referensi: request yang sudah memegang instance lama
+        menyelesaikan prediksinya dengan model lama yang utuh.
+        """
+        with self._locks[name]:
+            self._instances[name] = instance
+
+    def warm_up(self, names=None):
+        """Load the given models (default: all) ahead of the first request"""
+        for name in (names or list(self._factories)):
+            self.get(name)
+
+    def names(self):
+        return list(self._factories)
+
+    def report(self):
+        return {
+            name: dict(self._timings.get(name, {}), loaded=name in self._instances)
+            for name in self._factories
+        }
+
+
+def _build_health_predictor(module, model_dir=None):
+    return module.HealthPredictor(
+        cache_size=int(os.environ.get('ML_SERVICE_HEALTH_CACHE', 0)),
+        use_compiled_forest=os.environ.get('ML_SERVICE_COMPILED_FOREST', 'true').lower() == 'true',
+        model_dir=model_dir
+    )
+
+
+def _create_health_predictor(module):
+    # Versi aktif hasil training background; tanpa itu pakai saved_models/ lama
+    version = health_models.current_version()
+    predictor = _build_health_predictor(module, health_models.version_dir(version) if version else None)
+    # Kalau belum ada file model, training dilakukan saat prediksi pertama
+    predictor.load_model()
+    health_model_watcher.loaded_version = version
+    return predictor
+
+
+def _load_health_version(model_dir):
+    """Muat satu versi artifact ke instance baru (dipanggil di thread watcher)"""
+    predictor = _build_health_predictor(importlib.import_module('models.health_predictor'), model_dir)
+    if not predictor.load_model():
+        raise FileNotFoundError(f"Artifact model tidak ditemukan di {model_dir}")
+    return predictor
+
+
+def _json_with_cache_status(result, hit):
+    """jsonify + header X-Cache (HIT/MISS) untuk endpoint yang memakai result_cache"""
+    response = jsonify(result)
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response
+
+
+def _pool_processes():
+    """Proses pool default per worker Gunicorn: total ~ jumlah core, 1-2 per worker"""
+    workers = max(1, int(os.environ.get('ML_SERVICE_WORKERS', 1)))
+    return max(1, min(2, (os.cpu_count() or 1) // workers))
+
+
+registry = ModelRegistry()
+health_models = HealthModelStore(HEALTH_MODEL_DIR)
+training_jobs = TrainingJobs(health_models, min_accuracy=TRAIN_MIN_ACCURACY, keep_versions=HEALTH_KEEP_VERSIONS)
+health_model_watcher = ModelVersionWatcher(
+    health_models,
+    load=_load_health_version,
+    on_swap=lambda predictor, version: registry.replace('health_predictor', predictor),
+    poll_seconds=MODEL_POLL_SECONDS
+)
+registry.register('health_predictor', 'models.health_predictor', _create_health_predictor)
+registry.register('disease_detector', 'models.disease_detector',
+                  lambda m: m.DiseaseDetector(grid_size=int(os.environ.get('ML_SERVICE_DISEASE_GRID', 10))))
+registry.register('product_analyzer', 'models.product_analyzer', lambda m: m.ProductAnalyzer(
+    fetch_workers=int(os.environ.get('ML_SERVICE_FETCH_WORKERS', 8)),
+    match_deadline=float(os.environ.get('ML_SERVICE_MATCH_DEADLINE', 10.0)),
+    default_tier=os.environ.get('ML_SERVICE_PRODUCT_TIER', 'accurate')
+))
+registry.register('image_executor', 'models.image_executor', lambda m: m.SharedMemoryExecutor(
+    processes=IMAGE_PROCESSES or _pool_processes(),
+    blocks=IMAGE_BLOCKS or None,
+    block_bytes=IMAGE_BLOCK_MB * 1024 * 1024,
+    acquire_timeout=IMAGE_QUEUE_TIMEOUT,
+    settings={
+        'disease_grid': int(os.environ.get('ML_SERVICE_DISEASE_GRID', 10)),
+        'product_tier': os.environ.get('ML_SERVICE_PRODUCT_TIER', 'accurate')
+    }
+).start())
+registry.register('google_vision', 'models.google_vision_client',
+                  lambda m: m.GoogleVisionClient(
+                      credential_path="credentials.json",
+                      timeout=float(os.environ.get('ML_SERVICE_GCV_TIMEOUT', 5.0)),
+                      retries=int(os.environ.get('ML_SERVICE_GCV_RETRIES', 2)),
+                      # Timeout x (1 + retries) tidak boleh melewati deadline endpoint
+                      deadline=GCV_DEADLINE
+                  ))
+registry.register('product_index', 'models.product_index',
+                  lambda m: m.ProductFeatureIndex(PRODUCT_INDEX_DIR))
+registry.register('animal_baselines', 'models.animal_baselines',
+                  lambda m: m.AnimalBaselineStore(BASELINE_DB))
+registry.register('product_ann', 'models.product_ann', lambda m: m.ProductANN(
+    registry.get('product_index'),
+    nprobe=int(os.environ.get('ML_SERVICE_ANN_NPROBE', 8)),
+    min_train_size=int(os.environ.get('ML_SERVICE_ANN_MIN_TRAIN', 1000))
+))
+
+admission = AdmissionController(ADMISSION_LIMITS, queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                                enabled=ADMISSION_ENABLED)
+
+# Cache hasil endpoint gambar (memory LRU + disk opsional)
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('ML_SERVICE_RESULT_CACHE_SIZE', 256)),
+    ttl_seconds=int(os.environ.get('ML_SERVICE_RESULT_CACHE_TTL', 3600)),
+    disk_dir=os.environ.get('ML_SERVICE_RESULT_CACHE_DIR') or None
+)
+
+# Panggilan Google Vision berjalan di thread pool, paralel dengan CV lokal
+# di thread request. Analisis lokal sengaja tidak masuk pool ini: kalau GCV
+# menggantung, semua worker pool ikut tertahan dan fallback lokal ikut antre.
+_hybrid_executor = None
+_hybrid_executor_lock = threading.Lock()
+
+
+def _get_hybrid_executor():
+    global _hybrid_executor
+    if _hybrid_executor is None:
+        with _hybrid_executor_lock:
+            if _hybrid_executor is None:
+                _hybrid_executor = ThreadPoolExecutor(max_workers=GCV_WORKERS, thread_name_prefix='hybrid')
+    return _hybrid_executor
+
+
+def _submit_gcv(google_vision, image_bytes):
+    """Mulai analisis GCV di background; None kalau GCV tidak aktif"""
+    if not google_vision.enabled:
+        return None
+    # Salin mmap upload sekarang: buffer ditutup saat request selesai
+    if not isinstance(image_bytes, bytes):
+        image_bytes = bytes(image_bytes)
+    # copy_context: tahap GCV tetap masuk Server-Timing request ini
+    ctx = contextvars.copy_context()
+    return _get_hybrid_executor().submit(ctx.run, google_vision.analyze_image, image_bytes), time.monotonic()
+
+
+def _collect_gcv(pending):
+    """
+    Tunggu hasil GCV sampai GCV_DEADLINE sejak panggilan dimulai.
+    Return (gcv_result atau None, status): ok | empty | timeout | error | disabled
+    """
+    if pending is None:
+        return None, 'disabled'
+    future, started = pending
+    try:
+        with stage('gcv.wait'):
+            result = future.result(timeout=max(0.0, GCV_DEADLINE - (time.monotonic() - started)))
+    except FuturesTimeout:
+        # Hasil yang datang terlambat dibuang
+        future.cancel()
+        print(f"WARN: Google Vision deadline {GCV_DEADLINE}s reached, using local result only")
+        return None, 'timeout'
+    except Exception as e:
+        print(f"WARN: Google Vision failed: {e}")
+        return None, 'error'
+    return result, 'ok' if result else 'empty'
+
+
+class ServiceOverloaded(Exception):
+    """
+    Kapasitas analisis penuh: dijawab 503 + Retry-After (lihat errorhandler).
+    reason: busy (executor) | queue_full | deadline | queue_timeout (admission)
+    """
+
+    def __init__(self, message, retry_after=1, reason='busy'):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def _run_image_task(task, array, inline, **kwargs):
+    """
+    Jalankan analisis CPU-bound di SharedMemoryExecutor kalau IMAGE_OFFLOAD,
+    selain itu inline() di thread ini (perilaku lama). Array yang lebih
+    besar dari satu blok shared memory juga dianalisis inline.
+    """
+    if not IMAGE_OFFLOAD:
+        return inline()
+    executor = registry.get('image_executor')
+    if not executor.fits(array):
+        return inline()
+    try:
+        with stage(f'executor.{task}'):
+            return executor.run(task, array, **kwargs)
+    except executor.Busy as e:
+        raise ServiceOverloaded(str(e))
+
+
+def _local_product_analysis(product_analyzer, img_array, tier):
+    return _run_image_task('product.analyze', img_array,
+                           lambda: product_analyzer.analyze(img_array, tier), tier=tier)
+
 
 @app.route('/api/analyze/product', methods=['POST'])
 def analyze_product():
@@ -53,12 +505,25 @@ def analyze_product():
     try:
         image_data = None
         candidates = []
+        search_index = False
+        nprobe = None
+        # Tier analisis lokal: fast | balanced | accurate (None = default)
+        tier = request.args.get('tier') or None
         
         # DEBUG: Print Raw Request Info
         print(f"DEBUG REQ: Headers: {request.headers}")
         # ... (Parsing image_data sama seperti sebelumnya) ...
         # Copas logic parsing image dari kode sebelumnya (baris 38-67)
-        if request.is_json:
+        upload = _read_upload()
+        if upload is not None:
+            # Body biner / multipart: bytes gambar langsung, tanpa base64
+            image_data = upload.data
+            search_index = request.args.get('search_index', 'false').lower() == 'true'
+            if request.args.get('nprobe'):
+                nprobe = int(request.args['nprobe'])
+            print(f"DEBUG REQ: Binary upload received ({len(upload)} bytes, spooled={upload.spooled})")
+
+        elif request.is_json:
             data = request.get_json()
             print(f"DEBUG REQ: JSON Keys received: {data.keys()}")
             
@@ -72,11 +537,14 @@ def analyze_product():
                 print(f"DEBUG REQ: First Candidate Sample: {candidates[0] if len(candidates)>0 else 'None'}")
             else:
                 print("DEBUG REQ: No 'candidates' key in JSON")
+            
+            # Cari di seluruh index produk (tanpa daftar kandidat)
+            search_index = bool(data.get('search_index', False))
+            # Knob recall vs latency untuk pencarian index (ANN)
+            if data.get('nprobe') is not None:
+                nprobe = int(data['nprobe'])
+            tier = data.get('tier') or tier
                 
-        elif 'image' in request.files:
-            file = request.files['image']
-            image_data = file.read()
-            print("DEBUG REQ: File upload received")
         elif 'image' in request.form:
              image_data = request.form['image']
 
@@ -85,8 +553,6 @@ def analyze_product():
 
         # Decode Base64 (sama seperti sebelumnya)
         import base64
-        from skimage import io
-        from io import BytesIO
         if isinstance(image_data, str) and 'base64' in image_data:
             image_data = image_data.split(',')[1]
             image_data = base64.b64decode(image_data)
@@ -95,63 +561,211 @@ def analyze_product():
                  image_data = base64.b64decode(image_data)
              except: pass
 
-        # 1. VISUAL MATCHING (Prioritas Utama untuk Marketplace)
-        img_array = io.imread(BytesIO(image_data))
-        if img_array.shape[-1] == 4: img_array = img_array[:,:,:3]
-
-        if candidates and len(candidates) > 0:
-            try:
-                print(f"INFO: Attempting visual match with {len(candidates)} candidates")
-                matches = product_analyzer.find_matches(img_array, candidates)
-                return jsonify({'success': True, 'mode': 'match', 'matches': matches})
-            except Exception as match_err:
-                print(f"WAR: Match failed: {match_err}")
-                pass # Lanjut ke analisis teks
-
-        # 2. ANALYSIS (Google Vision vs Local)
-        
-        # Coba Google Vision dulu
-        gcv_result = google_vision.analyze_image(image_data)
-        
-        if gcv_result:
-            # Mapping GCV result to our format
-            labels = gcv_result['labels'] # e.g. ['Cattle', 'Snout']
-            
-            # Simple Logic mapping
-            category = "Umum"
-            if "Cattle" in labels or "Cow" in labels: category = "Sapi"
-            elif "Goat" in labels or "Sheep" in labels: category = "Kambing"
-            elif "Chicken" in labels or "Bird" in labels: category = "Ayam"
-            elif "Grass" in labels or "Plant" in labels: category = "Pakan"
-            elif "Bottle" in labels or "Medicine" in labels: category = "Obat"
-            elif "Tool" in labels: category = "Alat"
-            
-            search_query = f"{category} {' '.join(labels[:2])}"
-            
+        # Cache berbasis isi gambar: gambar yang dikirim ulang tidak dianalisis lagi
+        product_analyzer = registry.get('product_analyzer')
+        tier = tier or product_analyzer.default_tier
+        if tier not in product_analyzer.TIERS:
             return jsonify({
-                'success': True,
-                'search_query': search_query,
-                'detected_features': {
-                    'category': category,
-                    'color': gcv_result.get('color', 'Unknown'),
-                    'is_man_made': "Product" in labels
-                },
-                'source': 'Google Cloud Vision'
-            })
-            
-        else:
-            # Fallback ke Local AI
-            print("INFO: Using Local AI Analysis")
-            result = product_analyzer.analyze(img_array)
-            result['source'] = 'Local AI'
-            return jsonify(result)
+                'success': False,
+                'error': f'Unknown tier: {tier}',
+                'message': f"Tier harus salah satu dari {', '.join(product_analyzer.TIERS)}"
+            }), 400
+        google_vision = registry.get('google_vision')
+        product_index = registry.get('product_index')
+        cache_key = result_cache.make_key('product', image_data, product_analyzer.model_version, {
+            'candidates': candidates,
+            'search_index': search_index,
+            'index_version': product_index.version,
+            'nprobe': nprobe,
+            'tier': tier,
+            'gcv': google_vision.enabled
+        })
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return _json_with_cache_status(cached, hit=True)
+
+        result = _analyze_product_image(image_data, candidates, product_analyzer, google_vision,
+                                        product_index, search_index, nprobe, tier)
+        # Hasil fallback karena GCV timeout/error tidak di-cache
+        if result.get('success') and result.get('gcv_status') not in ('timeout', 'error'):
+            result_cache.set(cache_key, result)
+        return _json_with_cache_status(result, hit=False)
             
+    except (RequestEntityTooLarge, ServiceOverloaded, InvalidUpload):
+        raise
     except Exception as e:
         print(f"Error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+
+def _analyze_product_image(image_data, candidates, product_analyzer, google_vision,
+                           product_index=None, search_index=False, nprobe=None, tier=None):
+    """Visual matching atau analisis produk untuk satu gambar (bytes / mmap)"""
+    import numpy as np
+    from models.image_pipeline import open_image
+
+    # 1. VISUAL MATCHING (Prioritas Utama untuk Marketplace)
+    with stage('product.decode'):
+        img = open_image(image_data)
+        if img.mode not in ('RGB', 'RGBA', 'L'): img = img.convert('RGB')
+        img_array = np.asarray(img)
+        if img_array.shape[-1] == 4: img_array = img_array[:,:,:3]
+
+    if (candidates and len(candidates) > 0) or (search_index and product_index is not None and len(product_index) > 0):
+        try:
+            print(f"INFO: Attempting visual match with {len(candidates) if candidates else 'all indexed'} candidates")
+            product_ann = registry.get('product_ann') if not candidates else None
+            matches = product_analyzer.find_matches(img_array, candidates or None, index=product_index,
+                                                    ann=product_ann, nprobe=nprobe)
+            return {'success': True, 'mode': 'match', 'matches': matches}
+        except Exception as match_err:
+            print(f"WAR: Match failed: {match_err}")
+            pass # Lanjut ke analisis teks
+
+    # 2. ANALYSIS (Google Vision vs Local)
+    
+    # Google Vision diprioritaskan, tapi analisis lokal tetap jalan di thread
+    # request selama menunggu GCV, supaya GCV yang lambat/gagal tidak menambah
+    # latency: total ~ max(lokal, GCV_DEADLINE).
+    pending_gcv = _submit_gcv(google_vision, image_data)
+    local_result = _local_product_analysis(product_analyzer, img_array, tier)
+    gcv_result, gcv_status = _collect_gcv(pending_gcv)
+    
+    if gcv_result:
+        # Mapping GCV result to our format
+        labels = gcv_result['labels'] # e.g. ['Cattle', 'Snout']
+        
+        # Simple Logic mapping
+        category = "Umum"
+        if "Cattle" in labels or "Cow" in labels: category = "Sapi"
+        elif "Goat" in labels or "Sheep" in labels: category = "Kambing"
+        elif "Chicken" in labels or "Bird" in labels: category = "Ayam"
+        elif "Grass" in labels or "Plant" in labels: category = "Pakan"
+        elif "Bottle" in labels or "Medicine" in labels: category = "Obat"
+        elif "Tool" in labels: category = "Alat"
+        
+        search_query = f"{category} {' '.join(labels[:2])}"
+        
+        return {
+            'success': True,
+            'search_query': search_query,
+            'detected_features': {
+                'category': category,
+                'color': gcv_result.get('color', 'Unknown'),
+                'is_man_made': "Product" in labels
+            },
+            'source': 'Google Cloud Vision',
+            'gcv_status': gcv_status
+        }
+        
+    else:
+        # Fallback ke Local AI
+        print("INFO: Using Local AI Analysis")
+        result = local_result
+        result['source'] = 'Local AI'
+        result['gcv_status'] = gcv_status
+        return result
+
+
+@app.route('/api/index/products', methods=['POST'])
+def index_products():
+    """
+    Add/update products in the visual feature index
+    Dipanggil backend saat produk dibuat atau diubah.
+    
+    Expected JSON body:
+    {
+        "products": [
+            { "id": "abc", "image_url": "http://..." },
+            { "id": "def", "image": "data:image/jpeg;base64,..." }
+        ]
+    }
+    """
+    try:
+        data = request.get_json() or {}
+        products = data.get('products')
+        if products is None and 'id' in data:
+            products = [data]
+
+        if not products or not isinstance(products, list):
+            return jsonify({
+                'success': False,
+                'error': 'No products provided',
+                'message': 'Mohon kirim daftar produk di field products'
+            }), 400
+
+        import numpy as np
+        from PIL import Image
+        from io import BytesIO
+        from models.image_pipeline import image_bytes_from
+
+        product_analyzer = registry.get('product_analyzer')
+        product_index = registry.get('product_index')
+
+        results = []
+        items = []
+        for product in products:
+            product_id = product.get('id') if isinstance(product, dict) else None
+            if product_id is None:
+                results.append({'id': None, 'success': False, 'error': 'Missing id'})
+                continue
+            try:
+                url = product_analyzer.normalize_url(product.get('image_url'))
+                if product.get('image'):
+                    img_bytes = image_bytes_from(product['image'])
+                    img_array = np.array(Image.open(BytesIO(img_bytes)).convert('RGB'))
+                elif url:
+                    img_array = product_analyzer.download_image(url)
+                else:
+                    img_array = None
+
+                if img_array is None:
+                    results.append({'id': product_id, 'success': False, 'error': 'Image not available'})
+                    continue
+
+                vector = product_analyzer.extract_features(img_array)
+                if vector is None:
+                    results.append({'id': product_id, 'success': False, 'error': 'Feature extraction failed'})
+                    continue
+
+                items.append((product_id, vector, url))
+                results.append({'id': product_id, 'success': True})
+            except Exception as e:
+                results.append({'id': product_id, 'success': False, 'error': str(e)})
+
+        product_index.upsert_many(items)
+
+        return jsonify({
+            'success': True,
+            'indexed': len(items),
+            'results': results,
+            'index': product_index.stats()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Gagal mengindeks produk'
+        }), 500
+
+
+@app.route('/api/index/products/<product_id>', methods=['DELETE'])
+def remove_indexed_product(product_id):
+    """Remove a product from the visual feature index (produk dihapus)"""
+    try:
+        removed = registry.get('product_index').remove(product_id)
+        return jsonify({'success': True, 'removed': removed})
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Gagal menghapus produk dari index'
+        }), 500
+
+
 # ... (sisa endpoint lain dipertahankan)
 @app.route('/api/predict/health', methods=['POST'])
 def predict_health():
@@ -167,8 +781,12 @@ def predict_health():
         "aktivitas": "aktif",     // aktif, normal, lesu, sangat_lesu
         "riwayat_sakit": "tidak", // ya, tidak
         "vaksinasi_lengkap": "ya", // ya, tidak
-        "jenis_hewan": "sapi"     // sapi, kambing, ayam
+        "jenis_hewan": "sapi",    // sapi, kambing, ayam
+        "animal_id": "SAPI-001",  // opsional: pakai & perbarui baseline tersimpan
+        "history": [...]          // opsional: riwayat lengkap (cara lama)
     }
+    Dengan animal_id, client cukup mengirim pembacaan saat ini: baseline
+    pribadi dibaca dari server lalu diperbarui dengan pembacaan ini.
     """
     try:
         data = request.get_json()
@@ -190,9 +808,24 @@ def predict_health():
                     'message': f'Field {field} wajib diisi'
                 }), 400
         
-        # Make prediction with history if available
+        health_predictor = registry.get('health_predictor')
+        
         history = data.get('history', [])
-        if history and isinstance(history, list):
+        has_history = bool(history) and isinstance(history, list)
+        animal_id = data.get('animal_id')
+
+        if animal_id is not None and str(animal_id) != '':
+            baseline_store = registry.get('animal_baselines')
+            baseline = baseline_store.get(animal_id)
+            # Riwayat dari client jadi sumber kebenaran kalau jumlahnya berbeda
+            if has_history and (baseline is None or baseline.readings != len(history)):
+                baseline = baseline_store.seed(animal_id, history)
+
+            result = health_predictor.predict_with_baseline(data, baseline)
+            baseline = baseline_store.update(animal_id, data.get('suhu_celcius'), data.get('berat_kg'))
+            result['baseline'] = baseline.to_dict()
+        elif has_history:
+            # Make prediction with history if available
             result = health_predictor.predict_with_history(data, history)
         else:
             result = health_predictor.predict(data)
@@ -210,6 +843,59 @@ def predict_health():
         }), 500
 
 
+@app.route('/api/predict/health/batch', methods=['POST'])
+def predict_health_batch():
+    """
+    Predict health status for many animals in one request
+
+    Expected JSON body:
+    {
+        "records": [
+            { "jenis_hewan": "sapi", "suhu_celcius": 39.0, ... },
+            ...
+        ]
+    }
+    Hasil dikembalikan per record sesuai urutan input. Record yang tidak
+    valid dilaporkan di 'error' tanpa menggagalkan seluruh batch.
+    Record boleh membawa "history" (format sama dengan /api/predict/health);
+    tren semua hewan dihitung sekaligus (predict_many_with_history).
+    """
+    try:
+        data = request.get_json()
+        records = data.get('records') if isinstance(data, dict) else data
+
+        if not records or not isinstance(records, list):
+            return jsonify({
+                'success': False,
+                'error': 'No records provided',
+                'message': 'Mohon kirim daftar data kesehatan hewan di field records'
+            }), 400
+
+        if len(records) > MAX_BATCH_SIZE:
+            return jsonify({
+                'success': False,
+                'error': f'Too many records (max {MAX_BATCH_SIZE})',
+                'message': f'Maksimal {MAX_BATCH_SIZE} hewan per request'
+            }), 400
+
+        results = registry.get('health_predictor').predict_many_with_history(records)
+        failed = sum(1 for r in results if not r['success'])
+
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'failed': failed,
+            'results': results
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Terjadi kesalahan saat memproses prediksi batch'
+        }), 500
+
+
 @app.route('/api/predict/disease', methods=['POST'])
 def predict_disease():
     """
@@ -218,11 +904,10 @@ def predict_disease():
     try:
         image_data = None
         
-        # Check for file upload
-        if 'image' in request.files:
-            file = request.files['image']
-            if file.filename != '':
-                image_data = file.read()
+        # Binary body (application/octet-stream, image/*) atau file upload
+        upload = _read_upload()
+        if upload is not None:
+            image_data = upload.data
         
         # Check for base64 in JSON
         elif request.is_json:
@@ -241,21 +926,63 @@ def predict_disease():
                 'message': 'Mohon upload gambar hewan untuk dianalisis'
             }), 400
         
-        # 1. Google Vision Analysis (Optional)
-        gcv_result = None
+        from models.image_pipeline import image_bytes_from
+        disease_detector = registry.get('disease_detector')
+        google_vision = registry.get('google_vision')
+        
+        # Decode sekali, dipakai GCV (bytes asli) dan analisis lokal
         try:
-            gcv_result = google_vision.analyze_image(image_data)
-            if gcv_result:
-                print(f"INFO: GCV Labels: {gcv_result.get('labels')}")
+            image_bytes = image_bytes_from(image_data)
+            
+            # Cache berbasis isi gambar (cek sebelum decode pixel)
+            cache_key = result_cache.make_key('disease', image_bytes, disease_detector.model_version, {
+                'gcv': google_vision.enabled
+            })
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return _json_with_cache_status(cached, hit=True)
+            
+            image = disease_detector.preprocess_image(image_bytes)
         except Exception as e:
-            print(f"WARN: GCV Disease analysis failed: {e}")
+            return jsonify({
+                'success': False,
+                'error': f'Invalid image: {e}',
+                'message': 'Gambar tidak dapat dibaca'
+            }), 400
+        
+        # 1. Google Vision Analysis (Optional), berjalan paralel dengan CV lokal
+        pending_gcv = _submit_gcv(google_vision, image.raw_bytes)
 
-        # 2. Hybrid Prediction (Local + GCV info)
-        # Kita kirim data GCV ke detector agar bisa digabung dengan analisis lokal
-        result = disease_detector.predict(image_data, gcv_data=gcv_result)
+        # 2. Local feature extraction langsung dimulai
+        try:
+            scores = _run_image_task('disease.analyze_features', image.rgb,
+                                     lambda: disease_detector.analyze_features(image),
+                                     original_size=image.original_size)
+        except ServiceOverloaded:
+            if pending_gcv is not None:
+                pending_gcv[0].cancel()
+            raise
+        except Exception as e:
+            print(f"Error predicting: {e}")
+            return jsonify({
+                'success': False,
+                'error': str(e),
+                'message': 'Gagal menganalisis gambar.'
+            })
+
+        # 3. Hybrid Prediction: boost GCV hanya kalau datang sebelum deadline
+        gcv_result, gcv_status = _collect_gcv(pending_gcv)
+        if gcv_result:
+            print(f"INFO: GCV Labels: {gcv_result.get('labels')}")
+        result = disease_detector.predict(image, gcv_data=gcv_result, scores=scores)
+        result['gcv_status'] = gcv_status
+        if result.get('success') and gcv_status not in ('timeout', 'error'):
+            result_cache.set(cache_key, result)
         
-        return jsonify(result)
+        return _json_with_cache_status(result, hit=False)
         
+    except (RequestEntityTooLarge, ServiceOverloaded, InvalidUpload):
+        raise
     except Exception as e:
         print(f"Error predict disease: {e}")
         return jsonify({
@@ -265,23 +992,299 @@ def predict_disease():
         }), 500
 
 
+def _read_disease_images():
+    """
+    Foto-foto satu hewan dari request: list of (part, bytes).
+    - multipart: semua file, nama field = bagian tubuh (eyes, hooves, ...);
+      field 'image'/'images' berarti tanpa label
+    - JSON: {"images": ["<base64>", {"image": "<base64>", "part": "eyes"}]}
+    """
+    from models.image_pipeline import image_bytes_from
+
+    images = []
+    if request.mimetype == 'multipart/form-data':
+        for field, file in request.files.items(multi=True):
+            if file.filename == '':
+                continue
+            images.append((None if field in ('image', 'images') else field, file.read()))
+    elif request.is_json:
+        data = request.get_json() or {}
+        for item in data.get('images') or []:
+            if isinstance(item, dict):
+                images.append((item.get('part'), image_bytes_from(item.get('image'))))
+            else:
+                images.append((None, image_bytes_from(item)))
+    return images
+
+
+def _disease_image_result(index, part, future, disease_detector):
+    """Hasil satu foto dari pool: skor + prediksi ringkas (tanpa detail penanganan)"""
+    item = {'index': index, 'part': part}
+    try:
+        analyzed = future.result()
+    except Exception as e:
+        item.update(success=False, error=str(e), message='Gambar tidak dapat dibaca')
+        return item, None
+
+    scores = analyzed['scores']
+    prediction = disease_detector.predict(None, scores=scores)
+    item.update(
+        success=True,
+        prediction=prediction['prediction'],
+        scores={c: round(v, 2) for c, v in scores.items()},
+        original_size=analyzed['original_size']
+    )
+    return item, scores
+
+
+def _disease_diagnosis(items, score_list, disease_detector):
+    """Diagnosis tingkat hewan dari skor semua foto yang berhasil dianalisis"""
+    if not score_list:
+        return {
+            'success': False,
+            'error': 'No image could be analyzed',
+            'message': 'Tidak ada gambar yang dapat dianalisis',
+            'images': items
+        }
+    result = disease_detector.predict(None, scores=disease_detector.aggregate_scores(score_list))
+    result.update(
+        mode='multi',
+        image_count=len(items),
+        analyzed=len(score_list),
+        images=sorted(items, key=lambda item: item['index'])
+    )
+    return result
+
+
+@app.route('/api/predict/disease/multi', methods=['POST'])
+def predict_disease_multi():
+    """
+    Detect disease from several photos of one animal (mata, kuku, badan, mulut)
+
+    Semua foto dianalisis paralel di process pool (lihat models/image_executor.py),
+    lalu skor per foto digabung menjadi satu diagnosis hewan. Analisis lokal
+    saja (tanpa Google Vision).
+
+    Dengan ?stream=true atau Accept: application/x-ndjson, hasil per foto
+    dikirim sebagai NDJSON begitu selesai ({"type": "image", ...}), diakhiri
+    satu baris {"type": "diagnosis", ...}.
+    """
+    try:
+        try:
+            images = _read_disease_images()
+        except ClientDisconnected as e:
+            # Body multipart terpotong: 400 seperti burst (lihat _read_upload)
+            raise InvalidUpload(str(e)) from e
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid image: {e}',
+                'message': 'Gambar tidak dapat dibaca'
+            }), 400
+
+        if not images:
+            return jsonify({
+                'success': False,
+                'error': 'No images provided',
+                'message': 'Mohon upload beberapa foto hewan untuk dianalisis'
+            }), 400
+
+        if len(images) > MAX_DISEASE_IMAGES:
+            return jsonify({
+                'success': False,
+                'error': f'Too many images (max {MAX_DISEASE_IMAGES})',
+                'message': f'Maksimal {MAX_DISEASE_IMAGES} foto per hewan'
+            }), 400
+
+        disease_detector = registry.get('disease_detector')
+        image_executor = registry.get('image_executor')
+        futures = {
+            image_executor.submit_bytes('disease.analyze_bytes', image_bytes): (index, part)
+            for index, (part, image_bytes) in enumerate(images)
+        }
+
+        stream = (request.args.get('stream', 'false').lower() == 'true'
+                  or 'application/x-ndjson' in request.headers.get('Accept', ''))
+        if stream:
+            def generate():
+                items, score_list = [], []
+                for future in as_completed(futures):
+                    item, scores = _disease_image_result(*futures[future], future, disease_detector)
+                    items.append(item)
+                    if scores is not None:
+                        score_list.append(scores)
+                    yield app.json.dumps(dict(item, type='image')) + '\n'
+                diagnosis = _disease_diagnosis(items, score_list, disease_detector)
+                diagnosis.pop('images', None)
+                yield app.json.dumps(dict(diagnosis, type='diagnosis')) + '\n'
+
+            return _streaming_response(generate(), 'application/x-ndjson')
+
+        items, score_list = [], []
+        for future in as_completed(futures):
+            item, scores = _disease_image_result(*futures[future], future, disease_detector)
+            items.append(item)
+            if scores is not None:
+                score_list.append(scores)
+
+        result = _disease_diagnosis(items, score_list, disease_detector)
+        return jsonify(result), 200 if result['success'] else 400
+
+    except (RequestEntityTooLarge, ServiceOverloaded, InvalidUpload):
+        raise
+    except Exception as e:
+        print(f"Error predict disease multi: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Terjadi kesalahan saat memproses gambar'
+        }), 500
+
+
+def _read_burst_sources():
+    """
+    Sumber frame burst, berurutan. Tiap sumber boleh berisi beberapa frame.
+    - multipart: semua file sesuai urutan upload
+    - body biner: satu container multi-frame (GIF, TIFF, MPO, WebP animasi)
+    - JSON: {"frames": ["<base64>", ...]} atau {"image": "<base64 container>"}
+    """
+    if request.mimetype == 'multipart/form-data':
+        return [file for _, file in request.files.items(multi=True) if file.filename != '']
+
+    upload = _read_upload()
+    if upload is not None:
+        return [upload.data]
+
+    if request.is_json:
+        data = request.get_json() or {}
+        if data.get('frames'):
+            return list(data['frames'])
+        if data.get('image'):
+            return [data['image']]
+    return []
+
+
+def _burst_frames(sources, disease_detector):
+    """Generator DecodedImage: frame berikutnya baru di-decode kalau diminta"""
+    for source in sources:
+        yield from disease_detector.preprocess_frames(source)
+
+
+@app.route('/api/predict/disease/burst', methods=['POST'])
+def predict_disease_burst():
+    """
+    Detect disease from a camera burst with early stopping
+
+    Frame dianalisis berurutan (analyze_features) dan skornya dirata-rata.
+    Begitu ranking kelas dan confidence stabil selama stable_frames frame
+    berturut-turut, frame sisanya dilewati. frames_processed melaporkan
+    jumlah frame yang benar-benar dianalisis.
+
+    Optional: ?stable_frames=2 (atau field JSON stable_frames)
+    """
+    try:
+        try:
+            sources = _read_burst_sources()
+        except (ValueError, ClientDisconnected) as e:
+            # Body terpotong (utils/uploads.py / werkzeug) atau data tidak valid
+            return jsonify({
+                'success': False,
+                'error': f'Invalid request body: {e}',
+                'message': 'Data gambar tidak dapat dibaca'
+            }), 400
+        if not sources:
+            return jsonify({
+                'success': False,
+                'error': 'No frames provided',
+                'message': 'Mohon upload frame burst hewan untuk dianalisis'
+            }), 400
+
+        stable_frames = request.args.get('stable_frames')
+        if stable_frames is None and request.is_json:
+            stable_frames = (request.get_json() or {}).get('stable_frames')
+        try:
+            stable_frames = int(stable_frames) if stable_frames is not None else BURST_STABLE_FRAMES
+        except (TypeError, ValueError):
+            stable_frames = 0
+        if stable_frames < 1:
+            return jsonify({
+                'success': False,
+                'error': 'stable_frames must be an integer >= 1',
+                'message': 'stable_frames harus bilangan bulat minimal 1'
+            }), 400
+
+        disease_detector = registry.get('disease_detector')
+        try:
+            result, history, converged = disease_detector.analyze_burst(
+                _burst_frames(sources, disease_detector),
+                stable_frames=stable_frames,
+                confidence_tolerance=BURST_CONFIDENCE_TOLERANCE,
+                max_frames=BURST_MAX_FRAMES
+            )
+        except (ValueError, OSError) as e:
+            return jsonify({
+                'success': False,
+                'error': f'Invalid image: {e}',
+                'message': 'Gambar tidak dapat dibaca'
+            }), 400
+
+        result.update(
+            mode='burst',
+            frames_processed=len(history),
+            converged=converged,
+            stable_frames=stable_frames,
+            frames=history
+        )
+        return jsonify(result)
+
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        print(f"Error predict disease burst: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Terjadi kesalahan saat memproses gambar'
+        }), 500
+
+
 @app.route('/api/train/health', methods=['POST'])
 def train_health_model():
     """
-    Train the health prediction model
+    Start training the health prediction model as a background job
     Optional: Provide custom data path in JSON body
+    
+    Training berjalan di proses terpisah; response 202 berisi job_id.
+    Progress dibaca di GET /api/train/health/<job_id>. Versi baru yang
+    lolos validasi langsung diaktifkan tanpa mengganggu prediksi.
     """
     try:
-        data = request.get_json() or {}
+        data = request.get_json(silent=True) or {}
         data_path = data.get('data_path', None)
         
-        accuracy = health_predictor.train(data_path)
+        if data_path and not os.path.exists(data_path):
+            return jsonify({
+                'success': False,
+                'error': f'Data file not found: {data_path}',
+                'message': 'File data training tidak ditemukan'
+            }), 400
+        
+        job, running = training_jobs.start(data_path)
+        if job is None:
+            return jsonify({
+                'success': False,
+                'error': 'Training already running',
+                'message': 'Training model kesehatan masih berjalan',
+                'job_id': running
+            }), 409
         
         return jsonify({
             'success': True,
-            'message': 'Health prediction model trained successfully',
-            'accuracy': accuracy
-        })
+            'message': 'Health model training started',
+            'job_id': job['job_id'],
+            'status_url': f"/api/train/health/{job['job_id']}",
+            'job': job
+        }), 202
         
     except Exception as e:
         return jsonify({
@@ -291,6 +1294,24 @@ def train_health_model():
         }), 500
 
 
+@app.route('/api/train/health/<job_id>', methods=['GET'])
+def train_health_status(job_id):
+    """Status dan progress job training (queued, running, succeeded, failed, rejected)"""
+    job = training_jobs.status(job_id)
+    if job is None:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found',
+            'message': 'Job training tidak ditemukan'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job,
+        'active_version': health_models.current_version()
+    })
+
+
 @app.route('/api/train/disease', methods=['POST'])
 def train_disease_model():
     """
@@ -303,7 +1324,7 @@ def train_disease_model():
         epochs = data.get('epochs', 50)
         batch_size = data.get('batch_size', 32)
         
-        history = disease_detector.train(data_dir, epochs, batch_size)
+        history = registry.get('disease_detector').train(data_dir, epochs, batch_size)
         
         if history is None:
             return jsonify({
@@ -328,25 +1349,94 @@ def train_disease_model():
 
 @app.route('/api/model/status', methods=['GET'])
 def model_status():
-    """Check status of loaded models"""
+    """Check status of loaded models (tidak memicu loading model)"""
+    health_predictor = registry.peek('health_predictor')
+    disease_detector = registry.peek('disease_detector')
+    product_index = registry.peek('product_index')
+    product_ann = registry.peek('product_ann')
+    animal_baselines = registry.peek('animal_baselines')
+    image_executor = registry.peek('image_executor')
+
+    health_status = {'loaded': False}
+    if health_predictor is not None:
+        health_status = {
+            'loaded': health_predictor.model is not None,
+            'model_path': health_predictor.model_path,
+            'model_exists': os.path.exists(health_predictor.model_path),
+            'compiled_forest': health_predictor.compiled_forest is not None,
+            'cache': health_predictor.cache_stats(),
+            'version': health_model_watcher.loaded_version,
+            'active_version': health_models.current_version(),
+            'reload_error': health_model_watcher.last_error,
+            'training_job': health_models.running_job()
+        }
+
+    disease_status = {'loaded': False}
+    if disease_detector is not None:
+        disease_status = {
+            # Rule-based CV (scikit-image), tidak ada file model
+            'loaded': True,
+            'classes': disease_detector.classes
+        }
+
     return jsonify({
         'success': True,
         'models': {
-            'health_predictor': {
-                'loaded': health_predictor.model is not None,
-                'model_path': health_predictor.model_path,
-                'model_exists': os.path.exists(health_predictor.model_path)
-            },
-            'disease_detector': {
-                'loaded': disease_detector.model is not None,
-                'model_path': disease_detector.model_path,
-                'model_exists': os.path.exists(disease_detector.model_path),
-                'classes': disease_detector.classes
-            }
+            'health_predictor': health_status,
+            'disease_detector': disease_status
+        },
+        'result_cache': result_cache.stats(),
+        'admission': admission.stats(),
+        'product_index': product_index.stats() if product_index is not None else {'loaded': False},
+        'product_ann': product_ann.stats() if product_ann is not None else {'loaded': False},
+        'animal_baselines': animal_baselines.stats() if animal_baselines is not None else {'loaded': False},
+        'image_executor': image_executor.stats() if image_executor is not None else {'loaded': False},
+        'startup': {
+            'app_import_seconds': APP_IMPORT_SECONDS,
+            'models': registry.report()
         }
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Histogram latency per tahap dan per endpoint + antrean admission (format teks Prometheus)"""
+    body = metrics.REGISTRY.render() + admission.render()
+    return app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/model/warmup', methods=['POST'])
+def warmup_models():
+    """
+    Load models ahead of traffic
+    Optional JSON body: { "models": ["health_predictor", "disease_detector"] }
+    """
+    data = request.get_json(silent=True) or {}
+    names = data.get('models') or registry.names()
+
+    unknown = [name for name in names if name not in registry.names()]
+    if unknown:
+        return jsonify({
+            'success': False,
+            'error': f'Unknown models: {unknown}',
+            'message': 'Nama model tidak dikenal'
+        }), 400
+
+    try:
+        registry.warm_up(names)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Gagal memuat model'
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'models': registry.report()
+    })
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({
@@ -356,6 +1446,39 @@ def not_found(error):
     }), 404
 
 
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({
+        'success': False,
+        'error': 'Payload too large',
+        'message': f'Ukuran gambar melebihi batas {MAX_CONTENT_LENGTH // (1024 * 1024)} MB'
+    }), 413
+
+
+@app.errorhandler(InvalidUpload)
+def invalid_upload(error):
+    return jsonify({
+        'success': False,
+        'error': f'Invalid request body: {error}',
+        'message': 'Data gambar tidak dapat dibaca'
+    }), 400
+
+
+@app.errorhandler(ServiceOverloaded)
+def service_overloaded(error):
+    response = jsonify({
+        'success': False,
+        'error': 'Service overloaded',
+        'reason': error.reason,
+        'message': 'Server sedang sibuk, coba lagi sebentar lagi',
+        'detail': str(error)
+    })
+    # Deadline lewat: client sudah tidak menunggu, tidak perlu saran retry
+    if error.retry_after is not None:
+        response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({
@@ -365,6 +1488,12 @@ def internal_error(error):
     }), 500
 
 
+if WARMUP_MODELS:
+    registry.warm_up(None if WARMUP_MODELS == 'all' else [n.strip() for n in WARMUP_MODELS.split(',') if n.strip()])
+
+APP_IMPORT_SECONDS = round(time.perf_counter() - _APP_IMPORT_STARTED, 4)
+
+
 if __name__ == '__main__':
     print(f"""
 ╔════════════════════════════════════════════════════════════╗
@@ -376,14 +1505,20 @@ if __name__ == '__main__':
 ║  Endpoints:                                                ║
 ║  - GET  /                      Health check                ║
 ║  - POST /api/predict/health    Predict animal health       ║
+║  - POST /api/predict/health/batch  Predict whole herd      ║
 ║  - POST /api/predict/disease   Detect disease from image   ║
-║  - POST /api/train/health      Train health model          ║
+║  - POST /api/predict/disease/multi  Photos of one animal   ║
+║  - POST /api/predict/disease/burst  Camera burst frames    ║
+║  - POST /api/train/health      Train health model (job)    ║
+║  - GET  /api/train/health/<id> Training job status         ║
 ║  - POST /api/train/disease     Train disease model         ║
 ║  - GET  /api/model/status      Check model status          ║
+║  - POST /api/model/warmup      Load models before traffic  ║
 ╚════════════════════════════════════════════════════════════╝
     """)
     
     # Auto-train health model if not exists
+    health_predictor = registry.get('health_predictor')
     if not os.path.exists(health_predictor.model_path):
         print("Training health prediction model...")
         health_predictor.train()
@@ -0,0 +1,140 @@
+"""
+Benchmark: Google Vision paralel dengan CV lokal di bawah deadline
+Memakai stub ImageAnnotatorClient dengan delay yang bisa diatur
+(lihat bench_vision_annotate.py) lewat endpoint Flask asli, lalu
+membandingkan latency dengan alur lama (GCV selesai dulu, baru CV lokal)
+dan memeriksa bahwa boost GCV hanya dipakai kalau datang sebelum deadline.
+Terakhir, beberapa request produk bersamaan dengan GCV yang menggantung:
+semua harus selesai dalam ~deadline + CV lokal dengan gcv_status=timeout
+(fallback lokal tidak boleh antre di belakang panggilan GCV).
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_gcv_overlap.py --deadline 1.0 --delays 100 600 3000
+    python benchmarks/bench_gcv_overlap.py --concurrency 10 --hang 6000 --workers 4
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bench_vision_annotate import FakeImageAnnotatorClient, make_response
+
+
+def make_jpeg(seed=0):
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (60, 80, 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(small).resize((1600, 1200), Image.BILINEAR).save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--deadline', type=float, default=1.0, help='ML_SERVICE_GCV_DEADLINE (detik)')
+    parser.add_argument('--delays', type=float, nargs='+', default=[100, 600, 3000], help='delay stub GCV (ms)')
+    parser.add_argument('--concurrency', type=int, default=10, help='request produk bersamaan saat GCV menggantung')
+    parser.add_argument('--hang', type=float, default=6000, help='delay stub GCV yang menggantung (ms)')
+    parser.add_argument('--workers', type=int, default=4, help='ML_SERVICE_GCV_WORKERS (< concurrency)')
+    args = parser.parse_args()
+
+    os.environ['ML_SERVICE_GCV_DEADLINE'] = str(args.deadline)
+    os.environ['ML_SERVICE_GCV_WORKERS'] = str(args.workers)
+    os.environ['ML_SERVICE_RESULT_CACHE_SIZE'] = '0'
+    # Yang diukur deadline GCV, bukan load shedding
+    os.environ['ML_SERVICE_ADMISSION'] = 'false'
+    import app as ml_app
+    from models.google_vision_client import GoogleVisionClient
+    logging.disable(logging.CRITICAL)
+
+    # Stub GCV: label 'wound' memicu boost skin_disease di DiseaseDetector
+    fake = FakeImageAnnotatorClient(latency=0)
+    fake.response = make_response()
+    fake.response.label_annotations = [SimpleNamespace(description=d) for d in ('Cattle', 'Wound', 'Skin')]
+    ml_app.registry.register('google_vision', 'models.google_vision_client',
+                             lambda m: GoogleVisionClient(client=fake, retries=0))
+
+    client = ml_app.app.test_client()
+    body = {'image': base64.b64encode(make_jpeg()).decode()}
+
+    def post(endpoint):
+        # Print debug endpoint tidak ikut ke output benchmark
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = client.post(endpoint, json=body).get_json()
+        return result, time.perf_counter() - started
+
+    print(f"GCV deadline {args.deadline:.1f}s")
+    local_times = {}
+    for endpoint in ('/api/predict/disease', '/api/analyze/product'):
+        # Waktu CV lokal saja: endpoint dengan GCV dimatikan
+        vision = ml_app.registry.get('google_vision')
+        vision.enabled = False
+        post(endpoint)
+        local = min(post(endpoint)[1] for _ in range(3))
+        vision.enabled = True
+        local_times[endpoint] = local
+        print(f"{endpoint} (local ~{local * 1e3:.0f} ms)")
+
+        for delay in args.delays:
+            fake.latency = delay / 1000
+            result, elapsed = post(endpoint)
+            # Alur lama: tunggu GCV sampai selesai, lalu CV lokal (disease);
+            # produk hanya menjalankan CV lokal kalau GCV gagal
+            sequential = delay / 1000 + (local if 'disease' in endpoint else 0)
+            if 'prediction' in result:
+                hybrid = 'Google' in result['note']
+                label = f"{result['prediction']['class']} (hybrid={hybrid})"
+            else:
+                label = result.get('source')
+            print(f"  gcv {delay:>6.0f} ms  total {elapsed * 1e3:6.0f} ms  (sequential ~{sequential * 1e3:5.0f} ms)"
+                  f"  gcv_status={result.get('gcv_status'):<8} result={label}")
+
+
+    # GCV menggantung di semua worker pool GCV (concurrency > --workers)
+    fake.latency = args.hang / 1000
+    endpoint = '/api/analyze/product'
+    results = [None] * args.concurrency
+    start = threading.Barrier(args.concurrency)
+
+    def worker(i):
+        start.wait()
+        started = time.perf_counter()
+        results[i] = client.post(endpoint, json=body).get_json(), time.perf_counter() - started
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    # sys.stdout global: dialihkan sekali untuk semua thread
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    # Di satu core, CV lokal request bersamaan saling bergiliran
+    bound = args.deadline + args.concurrency * local_times[endpoint] + 0.5
+    slowest = max(elapsed for _, elapsed in results)
+    statuses = {result.get('gcv_status') for result, _ in results}
+    print(f"{args.concurrency} concurrent {endpoint}, gcv {args.hang:.0f} ms:"
+          f"  slowest {slowest * 1e3:.0f} ms (bound {bound * 1e3:.0f} ms)  gcv_status={sorted(statuses)}")
+    assert statuses == {'timeout'}, statuses
+    assert all(result.get('source') == 'Local AI' for result, _ in results)
+    assert slowest < bound, f"Fallback lokal melewati deadline: {slowest:.2f}s > {bound:.2f}s"
+    print("OK")
+    # Panggilan GCV yang menggantung dibiarkan selesai di background
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
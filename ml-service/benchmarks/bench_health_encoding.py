@@ -0,0 +1,97 @@
+"""
+Microbenchmark: encoding kategori HealthPredictor
+Membandingkan LabelEncoder.transform per nilai (cara lama) dengan
+lookup table hasil _compile_encoders, untuk single-row dan batch.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_health_encoding.py
+"""
+
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.health_predictor import HealthPredictor, UNKNOWN_CATEGORY_CODE
+
+warnings.filterwarnings('ignore')
+
+
+def legacy_encode_row(predictor, input_data):
+    """Encoding lama: satu LabelEncoder.transform per kolom"""
+    encoded = {}
+    for col in predictor.categorical_cols:
+        try:
+            encoded[col] = predictor.label_encoders[col].transform([input_data[col]])[0]
+        except ValueError:
+            encoded[col] = UNKNOWN_CATEGORY_CODE
+    return encoded
+
+
+def lookup_encode_row(predictor, input_data):
+    """Encoding baru: dict lookup"""
+    return {col: predictor._encode_value(col, input_data[col]) for col in predictor.categorical_cols}
+
+
+def timeit(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def report(name, legacy, new):
+    print(f"{name:<32} legacy={legacy * 1e6:10.1f}us  lookup={new * 1e6:10.1f}us  speedup={legacy / new:6.1f}x")
+
+
+def main():
+    predictor = HealthPredictor()
+    if not predictor.load_model():
+        predictor.train()
+
+    data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'health_training_data.csv')
+    rows = pd.read_csv(data_path).drop(columns='hasil').to_dict('records')
+    row = predictor._prepare_input(rows[0])
+
+    # Pastikan kedua cara memberi hasil yang sama
+    for r in rows:
+        r = predictor._prepare_input(r)
+        assert legacy_encode_row(predictor, r) == lookup_encode_row(predictor, r)
+
+    print("Single row encoding")
+    report("encode 1 row",
+           timeit(lambda: legacy_encode_row(predictor, row), 2000),
+           timeit(lambda: lookup_encode_row(predictor, row), 2000))
+
+    for batch_size in (100, 1000):
+        batch = [predictor._prepare_input(rows[i % len(rows)]) for i in range(batch_size)]
+
+        def legacy_batch():
+            for col in predictor.categorical_cols:
+                encoder = predictor.label_encoders[col]
+                values = np.asarray([r[col] for r in batch], dtype=object)
+                known = np.isin(values, encoder.classes_)
+                codes = np.zeros(len(values), dtype=np.int64)
+                codes[known] = encoder.transform(values[known])
+
+        def lookup_batch():
+            for col in predictor.categorical_cols:
+                predictor._encode_column(col, [r[col] for r in batch])
+
+        report(f"encode batch of {batch_size}", timeit(legacy_batch, 50), timeit(lookup_batch, 50))
+
+    print("\nEnd-to-end prediction (setelah encoding dipercepat)")
+    single = timeit(lambda: predictor.predict(row), 50)
+    batch = [rows[i % len(rows)] for i in range(1000)]
+    many = timeit(lambda: predictor.predict_many(batch), 5)
+    print(f"predict (1 row)            {single * 1e3:8.2f} ms")
+    print(f"predict_many (1000 rows)   {many * 1e3:8.2f} ms  ({many / 1000 * 1e6:.1f} us/row)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: analisis gambar inline (thread) vs SharedMemoryExecutor (proses)
+Mengukur overhead per panggilan (salin ke shared memory + IPC) dan
+throughput beberapa thread request yang menganalisis gambar bersamaan.
+Inline, thread-thread itu bergantian memegang GIL; lewat executor,
+analisis berjalan paralel di proses worker.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_image_executor.py
+    python benchmarks/bench_image_executor.py --processes 4 --threads 8
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.image_executor import SharedMemoryExecutor
+from models.product_analyzer import ProductAnalyzer
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+SIZES = {'3MP': (1536, 2048), '12MP': (3000, 4000)}
+
+
+def make_images(count, shape, seed=0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        array = np.clip(rng.normal((150, 120, 90), 20, (*shape, 3)), 0, 255).astype(np.uint8)
+        y, x = shape[0] // 4, shape[1] // 4
+        array[y:3 * y, x:3 * x] = rng.integers(0, 255, 3)
+        images.append(array)
+    return images
+
+
+def timed(fn, items, threads):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(fn, items))
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=os.cpu_count(), help='proses worker executor')
+    parser.add_argument('--threads', type=int, default=4, help='thread request bersamaan')
+    parser.add_argument('--count', type=int, default=8, help='jumlah gambar per ukuran')
+    parser.add_argument('--tier', default='fast', choices=list(ProductAnalyzer.TIERS))
+    args = parser.parse_args()
+
+    analyzer = ProductAnalyzer()
+    executor = SharedMemoryExecutor(processes=args.processes, blocks=2 * args.threads,
+                                    block_bytes=40 * 1024 * 1024).start()
+    print(f"processes={executor.processes} threads={args.threads} tier={args.tier} cpu={os.cpu_count()}")
+    print(f"\n{'size':<6} {'mode':<9} {'latency ms':>11} {'throughput img/s':>17}")
+
+    try:
+        for label, shape in SIZES.items():
+            images = make_images(args.count, shape)
+            inline = lambda img: analyzer.analyze(img, args.tier)
+            offloaded = lambda img: executor.run('product.analyze', img, tier=args.tier)
+
+            for mode, fn in (('inline', inline), ('executor', offloaded)):
+                fn(images[0])
+                latency = min(timed(fn, images[:1], 1) for _ in range(3))
+                total = timed(fn, images, args.threads)
+                print(f"{label:<6} {mode:<9} {latency * 1e3:>11.1f} {len(images) / total:>17.1f}")
+    finally:
+        print(f"\nexecutor: {executor.stats()}")
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Microbenchmark: overhead instrumentasi utils.metrics
+Mengukur biaya satu `with stage(...)` saat metrics aktif dan dimatikan,
+serta HealthPredictor.predict end-to-end (3 tahap per panggilan:
+encode/forest/format) dengan dan tanpa metrics.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_metrics_overhead.py
+"""
+
+import os
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.health_predictor import HealthPredictor
+from utils import metrics
+from utils.metrics import stage
+
+warnings.filterwarnings('ignore')
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def empty_stage():
+    with stage('bench.empty'):
+        pass
+
+
+def main():
+    predictor = HealthPredictor(use_compiled_forest=True)
+    if not predictor.load_model():
+        predictor.train()
+    row = {'jenis_hewan': 'sapi', 'suhu_celcius': 39.6, 'nafsu_makan': 'menurun'}
+
+    print(f"{'':<28} {'disabled':>12} {'enabled':>12}")
+    results = {}
+    for enabled in (False, True):
+        metrics.set_enabled(enabled)
+        token = metrics.begin_request()
+        results[enabled] = (
+            timeit(empty_stage, 200000),
+            timeit(lambda: predictor.predict(row), 5000)
+        )
+        metrics.end_request(token)
+
+    print(f"{'with stage(): pass':<28} {results[False][0] * 1e9:>10.0f}ns {results[True][0] * 1e9:>10.0f}ns")
+    print(f"{'HealthPredictor.predict':<28} {results[False][1] * 1e6:>10.1f}us {results[True][1] * 1e6:>10.1f}us")
+
+
+if __name__ == '__main__':
+    main()
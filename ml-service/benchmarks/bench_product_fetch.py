@@ -0,0 +1,101 @@
+"""
+Benchmark: download kandidat ProductAnalyzer.find_matches
+Server HTTP lokal menyajikan N gambar produk dengan latency buatan
+(dan beberapa URL "mati" yang sangat lambat), lalu membandingkan
+fetch berurutan (1 worker) dengan session pool + thread pool.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_product_fetch.py --products 50 --latency 100 --dead 2
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.product_analyzer import ProductAnalyzer
+
+logging.disable(logging.CRITICAL)
+
+
+def make_images(count, seed=0):
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        base = rng.integers(0, 255, 3)
+        img = np.clip(base + rng.normal(0, 30, (60, 80, 3)), 0, 255).astype(np.uint8)
+        buf = io.BytesIO()
+        Image.fromarray(img).resize((640, 480), Image.BILINEAR).save(buf, format='JPEG', quality=85)
+        images.append(buf.getvalue())
+    return images
+
+
+def start_server(images, latency, dead_latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            name = self.path.strip('/').split('.')[0]
+            if name.startswith('dead'):
+                time.sleep(dead_latency)
+                self.send_error(504)
+                return
+            time.sleep(latency)
+            body = images[int(name[1:])]
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=100, help='latency per gambar (ms)')
+    parser.add_argument('--dead', type=int, default=2, help='jumlah URL lambat/mati')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--deadline', type=float, default=3.0, help='deadline find_matches (detik)')
+    args = parser.parse_args()
+
+    images = make_images(args.products)
+    server = start_server(images, args.latency / 1000, dead_latency=args.deadline + 2)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    candidates = [{'id': f'p{i}', 'image_url': f"{base_url}/p{i}.jpg"} for i in range(args.products)]
+    candidates += [{'id': f'dead{i}', 'image_url': f"{base_url}/dead{i}.jpg"} for i in range(args.dead)]
+    query = np.array(Image.open(io.BytesIO(images[0])).convert('RGB'))
+
+    print(f"{args.products} products, latency {args.latency:.0f} ms, {args.dead} dead URLs")
+    configs = [
+        ('sequential (1 worker, no deadline)', ProductAnalyzer(fetch_workers=1, match_deadline=3600)),
+        (f'pooled ({args.workers} workers, {args.deadline}s deadline)',
+         ProductAnalyzer(fetch_workers=args.workers, match_deadline=args.deadline)),
+    ]
+    for name, analyzer in configs:
+        started = time.perf_counter()
+        matches = analyzer.find_matches(query, candidates)
+        elapsed = time.perf_counter() - started
+        top = matches[0]['id'] if matches else None
+        print(f"{name:<40} {elapsed:7.2f} s  matches={len(matches):2d}  top={top}")
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark: tier analisis produk lokal (fast / balanced / accurate)
+Untuk setiap gambar, hasil tier dibandingkan dengan tier accurate (logika
+lama): kesepakatan kategori, warna dan is_man_made, plus latency per tier.
+
+Korpus default adalah foto produk sintetis deterministik (botol/kotak di
+latar polos, alat dengan garis lurus, tekstur bulu/rumput/pakan) di
+beberapa resolusi. Folder foto asli bisa dipakai dengan --images.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_product_tiers.py
+    python benchmarks/bench_product_tiers.py --count 200 --images ~/foto_produk
+"""
+
+import argparse
+import io
+import logging
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.product_analyzer import ProductAnalyzer
+
+logging.disable(logging.CRITICAL)
+warnings.filterwarnings('ignore')
+
+SIZES = ((640, 480), (1024, 768), (2048, 1536))
+KINDS = ('bottle', 'box', 'tool', 'fur', 'grass', 'feed', 'bird')
+
+
+def _texture(rng, height, width, scale, colors):
+    """Noise halus (bulu/rumput/pakan) dalam palet warna tertentu"""
+    small = rng.random((max(2, height // scale), max(2, width // scale)))
+    field = np.asarray(Image.fromarray((small * 255).astype(np.uint8)).resize((width, height), Image.BICUBIC)) / 255.0
+    colors = np.asarray(colors, dtype=np.float64)
+    idx = np.clip(field * (len(colors) - 1), 0, len(colors) - 1.001)
+    low = np.floor(idx).astype(int)
+    frac = (idx - low)[..., None]
+    return colors[low] * (1 - frac) + colors[low + 1] * frac
+
+
+def make_scene(kind, seed, size):
+    """Satu foto produk sintetis (JPEG bytes)"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    w, h = 320, 240
+
+    if kind in ('bottle', 'box', 'tool'):
+        background = rng.choice([[245, 245, 245], [230, 225, 215], [200, 210, 220], [60, 60, 60]])
+        img = Image.new('RGB', (w, h), tuple(int(c) for c in background))
+        draw = ImageDraw.Draw(img)
+        for _ in range(int(rng.integers(1, 4))):
+            fill = tuple(int(c) for c in rng.integers(0, 255, 3))
+            x0, y0 = int(rng.integers(20, w // 2)), int(rng.integers(20, h // 2))
+            if kind == 'bottle':
+                bw, bh = int(rng.integers(30, 70)), int(rng.integers(90, 180))
+                draw.rectangle([x0, y0, x0 + bw, min(h - 5, y0 + bh)], fill=fill)
+                draw.rectangle([x0 + bw // 3, y0 - 20, x0 + 2 * bw // 3, y0], fill=fill)
+                draw.rectangle([x0 + 4, y0 + bh // 3, x0 + bw - 4, y0 + bh // 2], fill=(250, 250, 250))
+            elif kind == 'box':
+                bw, bh = int(rng.integers(60, 160)), int(rng.integers(50, 120))
+                draw.rectangle([x0, y0, min(w - 5, x0 + bw), min(h - 5, y0 + bh)], fill=fill, outline=(20, 20, 20))
+                draw.line([x0, y0 + bh // 2, x0 + bw, y0 + bh // 2], fill=(30, 30, 30), width=2)
+            else:
+                angle = rng.uniform(0, np.pi)
+                length = rng.integers(80, 220)
+                x1, y1 = x0 + length * np.cos(angle), y0 + length * np.sin(angle)
+                draw.line([x0, y0, x1, y1], fill=fill, width=int(rng.integers(4, 12)))
+                draw.line([x0 + 10, y0, x1 + 10, y1], fill=fill, width=3)
+        array = np.asarray(img, dtype=np.float64) / 255.0
+    elif kind == 'fur':
+        palette = rng.choice([
+            [[0.35, 0.2, 0.1], [0.55, 0.35, 0.2], [0.75, 0.6, 0.45]],
+            [[0.1, 0.1, 0.1], [0.4, 0.4, 0.4], [0.95, 0.95, 0.95]],
+            [[0.5, 0.3, 0.15], [0.8, 0.55, 0.3], [0.9, 0.8, 0.6]],
+        ])
+        array = _texture(rng, h, w, int(rng.integers(4, 20)), palette)
+    elif kind == 'grass':
+        array = _texture(rng, h, w, int(rng.integers(2, 8)), [[0.1, 0.3, 0.05], [0.3, 0.55, 0.15], [0.6, 0.75, 0.3]])
+        # Batang rumput: goresan vertikal
+        array[:, ::int(rng.integers(3, 9))] *= 0.7
+    elif kind == 'feed':
+        array = _texture(rng, h, w, int(rng.integers(1, 4)), [[0.45, 0.3, 0.1], [0.7, 0.55, 0.25], [0.85, 0.75, 0.45]])
+    else:
+        # Ayam: blob putih/coklat di atas tanah
+        array = _texture(rng, h, w, 12, [[0.4, 0.35, 0.25], [0.55, 0.5, 0.4]])
+        yy, xx = np.mgrid[0:h, 0:w]
+        body = rng.choice([[0.95, 0.95, 0.9], [0.6, 0.35, 0.15], [0.2, 0.2, 0.2]])
+        cy, cx = rng.integers(80, 160), rng.integers(100, 220)
+        mask = ((yy - cy) / rng.uniform(40, 70)) ** 2 + ((xx - cx) / rng.uniform(50, 90)) ** 2 < 1
+        array[mask] = body
+
+    array = np.clip(array + rng.normal(0, rng.uniform(0.005, 0.04), array.shape), 0, 1)
+    img = Image.fromarray((array * 255).astype(np.uint8))
+    if rng.random() < 0.5:
+        img = img.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.5)))
+    img = img.resize((width, height), Image.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=int(rng.integers(70, 95)))
+    return buf.getvalue()
+
+
+def load_corpus(count, images_dir=None, seed=0):
+    """List of (name, RGB ndarray)"""
+    corpus = []
+    if images_dir:
+        for name in sorted(os.listdir(images_dir)):
+            try:
+                img = Image.open(os.path.join(images_dir, name)).convert('RGB')
+            except Exception:
+                continue
+            corpus.append((name, np.asarray(img)))
+        return corpus
+
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        size = SIZES[(i // len(KINDS)) % len(SIZES)]
+        jpeg = make_scene(kind, seed + i, size)
+        corpus.append((f"{kind}-{i}", np.asarray(Image.open(io.BytesIO(jpeg)).convert('RGB'))))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=105, help='jumlah gambar sintetis')
+    parser.add_argument('--images', help='folder foto produk asli (menggantikan korpus sintetis)')
+    parser.add_argument('--repeat', type=int, default=3, help='pengulangan per gambar untuk latency')
+    args = parser.parse_args()
+
+    analyzer = ProductAnalyzer()
+    corpus = load_corpus(args.count, args.images)
+    print(f"Corpus: {len(corpus)} images")
+
+    results = {tier: [] for tier in ProductAnalyzer.TIERS}
+    latencies = {tier: [] for tier in ProductAnalyzer.TIERS}
+    for name, img_array in corpus:
+        for tier in ProductAnalyzer.TIERS:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                result = analyzer.analyze(img_array, tier=tier)
+                timings.append(time.perf_counter() - started)
+            results[tier].append(result['detected_features'])
+            latencies[tier].append(min(timings))
+
+    reference = results['accurate']
+    print(f"\n{'tier':<10} {'category':>9} {'color':>7} {'man_made':>9} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    base_p50 = np.percentile(latencies['accurate'], 50)
+    for tier in ProductAnalyzer.TIERS:
+        features = results[tier]
+        agreement = {
+            key: np.mean([a[key] == b[key] for a, b in zip(features, reference)])
+            for key in ('category', 'color', 'is_man_made')
+        }
+        p50 = np.percentile(latencies[tier], 50)
+        p95 = np.percentile(latencies[tier], 95)
+        print(f"{tier:<10} {agreement['category']:>8.1%} {agreement['color']:>7.1%} "
+              f"{agreement['is_man_made']:>9.1%} {p50 * 1e3:>8.1f} {p95 * 1e3:>8.1f} {base_p50 / p50:>7.1f}x")
+
+    categories = sorted({f['category'] for f in reference})
+    print(f"\nKategori accurate: " + ', '.join(
+        f"{c}={sum(f['category'] == c for f in reference)}" for c in categories))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""
+Benchmark suite: semua hot path model + endpoint Flask, dengan regression gate
+Korpus gambar sintetis deterministik (seed tetap) di beberapa resolusi
+(0.3MP - 12MP). Untuk setiap kasus dicatat latency p50/p95/p99 dan peak
+memory (tracemalloc, diukur di run terpisah agar tidak memengaruhi waktu),
+lalu disimpan sebagai baseline JSON. Mode compare menjalankan ulang suite
+(atau membaca file hasil kedua) dan menandai regresi di atas threshold.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_suite.py run --output benchmarks/results/baseline.json
+    python benchmarks/bench_suite.py run --filter disease --quick
+    python benchmarks/bench_suite.py compare benchmarks/results/baseline.json --threshold 0.15
+    python benchmarks/bench_suite.py compare baseline.json candidate.json
+
+Exit code compare: 1 kalau p50 atau peak memory naik di atas threshold
+(bisa dipakai sebagai gate di CI).
+"""
+
+import argparse
+import atexit
+import base64
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+warnings.filterwarnings('ignore')
+
+# Resolusi korpus: nama -> (lebar, tinggi)
+RESOLUTIONS = {
+    '0.3MP': (640, 480),
+    '1MP': (1152, 864),
+    '3MP': (2048, 1536),
+    '12MP': (4000, 3000),
+}
+
+# Metrik yang dibandingkan di mode compare. p95 dari puluhan run terlalu
+# berisik untuk gate, jadi hanya ditampilkan.
+GATED_METRICS = ('p50_ms', 'peak_kb')
+REPORTED_METRICS = ('p50_ms', 'p95_ms', 'peak_kb')
+
+
+def make_image(width, height, seed):
+    """
+    Foto sintetis deterministik: gradasi warna halus + blob "lesi" + noise.
+    Dibuat di resolusi rendah lalu di-resize agar 12MP tetap cepat dibuat.
+    """
+    rng = np.random.default_rng(seed)
+    small_w, small_h = max(8, width // 16), max(8, height // 16)
+    yy, xx = np.mgrid[0:small_h, 0:small_w] / max(small_h, small_w)
+    base = np.stack([
+        0.5 + 0.3 * np.sin(xx * 3 + seed),
+        0.4 + 0.3 * np.cos(yy * 4 + seed),
+        0.3 + 0.2 * np.sin((xx + yy) * 5),
+    ], axis=-1)
+    for _ in range(6):
+        cy, cx, r = rng.random(3) * [small_h, small_w, min(small_h, small_w) / 6]
+        mask = (np.mgrid[0:small_h, 0:small_w][0] - cy) ** 2 + (np.mgrid[0:small_h, 0:small_w][1] - cx) ** 2 < r ** 2
+        base[mask] = rng.random(3)
+    base = np.clip(base + rng.normal(0, 0.04, base.shape), 0, 1)
+    img = Image.fromarray((base * 255).astype(np.uint8)).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+class Corpus:
+    """Lazy, cached synthetic images per resolution"""
+
+    def __init__(self):
+        self._jpeg = {}
+        self._rgb = {}
+
+    def jpeg(self, name, seed=0):
+        key = (name, seed)
+        if key not in self._jpeg:
+            self._jpeg[key] = make_image(*RESOLUTIONS[name], seed=seed)
+        return self._jpeg[key]
+
+    def rgb(self, name, seed=0):
+        key = (name, seed)
+        if key not in self._rgb:
+            self._rgb[key] = np.asarray(Image.open(io.BytesIO(self.jpeg(name, seed))).convert('RGB'))
+        return self._rgb[key]
+
+
+def measure(fn, min_runs, max_runs, min_time):
+    """Latency percentiles (ms) + peak tracemalloc (KB) untuk satu kasus"""
+    fn()  # warmup
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    samples = np.asarray(samples)
+    return {
+        'runs': int(len(samples)),
+        'mean_ms': round(float(samples.mean()), 4),
+        'p50_ms': round(float(np.percentile(samples, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples, 99)), 4),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def _temp_dir(prefix):
+    path = tempfile.mkdtemp(prefix=prefix)
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def build_cases(corpus, quick=False):
+    """Return list (name, callable). Objek model dibuat sekali di sini."""
+    from models.health_predictor import HealthPredictor
+    from models.disease_detector import DiseaseDetector
+    from models.product_analyzer import ProductAnalyzer
+    from models.product_index import ProductFeatureIndex
+    from models.product_ann import ProductANN
+    from skimage.color import rgb2gray
+    from skimage.transform import resize
+
+    resolutions = ['0.3MP', '3MP'] if quick else list(RESOLUTIONS)
+    cases = []
+
+    # --- HealthPredictor ---
+    health = HealthPredictor(use_compiled_forest=True)
+    if not health.load_model():
+        health.train()
+    row = {'jenis_hewan': 'sapi', 'umur_bulan': 30, 'berat_kg': 320, 'suhu_celcius': 39.8,
+           'nafsu_makan': 'menurun', 'aktivitas': 'lesu'}
+    rng = np.random.default_rng(0)
+    history = [{'temperature': float(38.5 + rng.normal(0, 0.3)), 'weight': float(320 + rng.normal(0, 5))}
+               for _ in range(30)]
+    batch = [dict(row, umur_bulan=int(a), suhu_celcius=float(t))
+             for a, t in zip(rng.integers(1, 120, 1000), rng.normal(39, 0.8, 1000))]
+    cases += [
+        ('health.predict', lambda: health.predict(row)),
+        ('health.predict_with_history[30]', lambda: health.predict_with_history(row, history)),
+        ('health.predict_many[1000]', lambda: health.predict_many(batch)),
+        ('health.predict_many_with_history[1000x30]',
+         lambda: health.predict_many_with_history(batch, [history] * len(batch))),
+    ]
+
+    # --- DiseaseDetector ---
+    detector = DiseaseDetector()
+    for res in resolutions:
+        jpeg = corpus.jpeg(res)
+        cases.append((f'disease.preprocess_image[{res}]', lambda jpeg=jpeg: detector.preprocess_image(jpeg)))
+    decoded = corpus.jpeg('3MP')
+
+    def analyze_decoded():
+        # DecodedImage baru setiap kali agar HSV (lazy) ikut terukur
+        detector.analyze_features(detector.preprocess_image(decoded))
+
+    cases += [
+        ('disease.analyze_features[decoded]', analyze_decoded),
+        ('disease.analyze_features[rgb 0.3MP]', lambda: detector.analyze_features(corpus.rgb('0.3MP'))),
+    ]
+
+    # --- ProductAnalyzer ---
+    analyzer = ProductAnalyzer()
+    for res in resolutions:
+        rgb = corpus.rgb(res)
+        cases.append((f'product.analyze[{res}]', lambda rgb=rgb: analyzer.analyze(rgb)))
+        for tier in ('fast', 'balanced'):
+            cases.append((f'product.analyze[{tier} {res}]', lambda rgb=rgb, tier=tier: analyzer.analyze(rgb, tier)))
+    gray = rgb2gray(resize(corpus.rgb('0.3MP'), (200, 200), anti_aliasing=True))
+    cases.append(('product._check_man_made_features', lambda: analyzer._check_man_made_features(gray)))
+
+    # Index sintetis untuk find_matches (exact dan ANN)
+    index_dir = _temp_dir('bench_index_')
+    index = ProductFeatureIndex(index_dir)
+    n_products = 2000 if quick else 10000
+    base = np.stack([analyzer.extract_features(corpus.rgb('0.3MP', seed=s)) for s in range(20)])
+    noise = rng.normal(0, 0.05, (n_products, base.shape[1])).astype(np.float32)
+    vectors = np.clip(base[rng.integers(0, len(base), n_products)] + noise, 0, None)
+    index.upsert_many((f"p{i}", v, None) for i, v in enumerate(vectors))
+    ann = ProductANN(index, min_train_size=1000)
+    ann.rebuild()
+    query = corpus.rgb('0.3MP', seed=3)
+    logging.disable(logging.CRITICAL)
+    cases += [
+        (f'product.find_matches[exact {n_products}]', lambda: analyzer.find_matches(query, None, index=index)),
+        (f'product.find_matches[ann {n_products}]', lambda: analyzer.find_matches(query, None, index=index, ann=ann)),
+    ]
+
+    # --- Endpoint Flask (test client, cache hasil dimatikan) ---
+    os.environ['ML_SERVICE_RESULT_CACHE_SIZE'] = '0'
+    os.environ['ML_SERVICE_PRODUCT_INDEX_DIR'] = _temp_dir('bench_app_index_')
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app as ml_app
+    logging.disable(logging.CRITICAL)
+    client = ml_app.app.test_client()
+    jpeg = corpus.jpeg('3MP')
+    disease_json = {'image': 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode()}
+    product_json = {'image': base64.b64encode(corpus.jpeg('0.3MP')).decode()}
+
+    def post(path, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.post(path, **kwargs)
+        assert response.status_code == 200, (path, response.status_code)
+
+    cases += [
+        ('endpoint./api/predict/health', lambda: post('/api/predict/health', json=row)),
+        ('endpoint./api/predict/health/batch[1000]',
+         lambda: post('/api/predict/health/batch', json={'records': batch})),
+        ('endpoint./api/predict/disease[json 3MP]', lambda: post('/api/predict/disease', json=disease_json)),
+        ('endpoint./api/predict/disease[binary 3MP]',
+         lambda: post('/api/predict/disease', data=jpeg, content_type='image/jpeg')),
+        ('endpoint./api/analyze/product[0.3MP]', lambda: post('/api/analyze/product', json=product_json)),
+    ]
+    return cases
+
+
+def run_suite(args):
+    corpus = Corpus()
+    cases = build_cases(corpus, quick=args.quick)
+    if args.filter:
+        cases = [(name, fn) for name, fn in cases if args.filter in name]
+
+    results = {}
+    for name, fn in cases:
+        stats = measure(fn, args.min_runs, args.max_runs, args.min_time)
+        results[name] = stats
+        print(f"{name:<48} p50={stats['p50_ms']:9.2f}ms  p95={stats['p95_ms']:9.2f}ms  "
+              f"peak={stats['peak_kb']:9.1f}KB  runs={stats['runs']}", flush=True)
+
+    return {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, candidate, threshold):
+    """Return list regresi: (case, metric, base, new, ratio)"""
+    regressions = []
+    print(f"\n{'case':<48} {'metric':<8} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, base_stats in baseline['results'].items():
+        new_stats = candidate['results'].get(name)
+        if new_stats is None:
+            continue
+        for metric in REPORTED_METRICS:
+            base, new = base_stats[metric], new_stats[metric]
+            if base <= 0:
+                continue
+            change = new / base - 1
+            flag = ''
+            if change > threshold:
+                if metric in GATED_METRICS:
+                    flag = '  REGRESSION'
+                    regressions.append((name, metric, base, new, change))
+                else:
+                    flag = '  (info)'
+            elif change < -threshold:
+                flag = '  faster' if metric != 'peak_kb' else '  smaller'
+            print(f"{name:<48} {metric:<8} {base:>10.2f} {new:>10.2f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_run_args(p):
+        p.add_argument('--filter', help='hanya kasus yang namanya mengandung teks ini')
+        p.add_argument('--quick', action='store_true', help='resolusi 0.3MP dan 3MP saja, index lebih kecil')
+        p.add_argument('--min-runs', type=int, default=5)
+        p.add_argument('--max-runs', type=int, default=200)
+        p.add_argument('--min-time', type=float, default=1.0, help='waktu minimum per kasus (detik)')
+
+    run_parser = sub.add_parser('run', help='jalankan suite dan simpan hasil')
+    add_run_args(run_parser)
+    run_parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             'results', 'baseline.json'))
+
+    compare_parser = sub.add_parser('compare', help='bandingkan dengan baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate', nargs='?', help='file hasil; kosong = jalankan suite sekarang')
+    compare_parser.add_argument('--threshold', type=float, default=0.15, help='batas regresi relatif (0.15 = 15%%)')
+    compare_parser.add_argument('--output', help='simpan hasil run saat ini')
+    add_run_args(compare_parser)
+
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        result = run_suite(args)
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {len(result['results'])} results to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.candidate:
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+    else:
+        # Nama kasus bergantung pada --quick, ikuti baseline
+        args.quick = args.quick or baseline['meta'].get('quick', False)
+        candidate = run_suite(args)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(candidate, f, indent=2)
+
+    regressions = compare(baseline, candidate, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1
+    print(f"\nNo regressions above {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark: bytes yang disalin per request saat menerima gambar
+Membandingkan cara lama (JSON base64, multipart file.read()) dengan
+upload biner (application/octet-stream) dan multipart via utils.uploads,
+dari body WSGI mentah sampai buffer siap dibaca PIL.
+
+- wire: ukuran body di jaringan
+- heap peak: puncak alokasi Python (tracemalloc) selama ingest
+- mmap: buffer mmap (tidak terlihat oleh tracemalloc)
+- copied: heap peak + mmap, dalam kelipatan ukuran gambar
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_upload_copies.py --megapixels 0.3 3 12
+"""
+
+import argparse
+import base64
+import io
+import logging
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask, request
+
+from models.image_pipeline import image_bytes_from, open_image
+from utils.uploads import UploadRequest, read_request_image
+
+logging.disable(logging.CRITICAL)
+
+app = Flask(__name__)
+app.request_class = UploadRequest
+
+
+def make_jpeg(megapixels, seed=0):
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def legacy_json():
+    return image_bytes_from(request.get_json()['image'])
+
+
+def legacy_multipart():
+    return request.files['image'].read()
+
+
+def upload_buffer():
+    return read_request_image(request)
+
+
+def measure(ingest, **request_kwargs):
+    with app.test_request_context('/', method='POST', **request_kwargs):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        result = ingest()
+        data = getattr(result, 'data', result)
+        open_image(data).verify()
+        _, heap_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        mapped = len(data) if not isinstance(data, bytes) else 0
+        if hasattr(result, 'close'):
+            result.close()
+    return heap_peak, mapped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[0.3, 3, 12])
+    args = parser.parse_args()
+
+    print(f"{'image':>8} {'mode':<26} {'wire':>9} {'heap peak':>10} {'mmap':>9} {'copied':>8}")
+    for mp in args.megapixels:
+        jpeg = make_jpeg(mp)
+        size = len(jpeg)
+        b64 = base64.b64encode(jpeg).decode()
+        modes = [
+            ('json base64 (lama)', legacy_json,
+             dict(json={'image': f"data:image/jpeg;base64,{b64}"}), len(b64) + 40),
+            ('multipart read() (lama)', legacy_multipart,
+             dict(data={'image': (io.BytesIO(jpeg), 'a.jpg')}, content_type='multipart/form-data'), size),
+            ('multipart -> buffer', upload_buffer,
+             dict(data={'image': (io.BytesIO(jpeg), 'a.jpg')}, content_type='multipart/form-data'), size),
+            ('octet-stream -> mmap', upload_buffer,
+             dict(data=jpeg, content_type='application/octet-stream'), size),
+        ]
+        for name, ingest, kwargs, wire in modes:
+            heap_peak, mapped = measure(ingest, **kwargs)
+            copied = (heap_peak + mapped) / size
+            print(f"{mp:>6.1f}MP {name:<26} {wire / 1e6:>7.2f}MB {heap_peak / 1e6:>8.2f}MB "
+                  f"{mapped / 1e6:>7.2f}MB {copied:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: GoogleVisionClient dengan fake ImageAnnotatorClient lokal
+Membandingkan alur lama (label_detection + image_properties, dua round
+trip, str(response) setiap panggilan) dengan satu annotate_image.
+Fake client mensimulasikan latency per RPC dan error sementara (503)
+sehingga timeout/retry bisa diuji tanpa kredensial Google.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_vision_annotate.py --latency 80 --calls 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from models.google_vision_client import GoogleVisionClient
+
+
+def make_response(n_labels=15, n_colors=10):
+    labels = [SimpleNamespace(description=f"Label {i}", score=1 - i / 100, mid=f"/m/{i:05d}")
+              for i in range(n_labels)]
+    colors = [SimpleNamespace(color=SimpleNamespace(red=10 * i, green=5 * i, blue=i),
+                              score=0.1, pixel_fraction=(i * 7 % 10) / 10)
+              for i in range(n_colors)]
+    return SimpleNamespace(
+        label_annotations=labels,
+        image_properties_annotation=SimpleNamespace(dominant_colors=SimpleNamespace(colors=colors)),
+        error=SimpleNamespace(message='')
+    )
+
+
+class FakeImageAnnotatorClient:
+    """Meniru method ImageAnnotatorClient yang dipakai, dengan latency buatan"""
+
+    def __init__(self, latency=0.08, fail_first=0):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.calls = 0
+        self.response = make_response()
+
+    def _rpc(self, timeout=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.calls <= self.fail_first:
+            raise ConnectionError('503 Service Unavailable (fake)')
+        if timeout is not None and self.latency > timeout:
+            raise TimeoutError('Deadline exceeded (fake)')
+        return self.response
+
+    def annotate_image(self, request, retry=None, timeout=None):
+        # Dengan google-cloud-vision terpasang, type_ berupa enum vision.Feature.Type
+        features = {getattr(f['type_'], 'name', f['type_']) for f in request['features']}
+        assert features == {'LABEL_DETECTION', 'IMAGE_PROPERTIES'}, features
+        return self._rpc(timeout)
+
+    def label_detection(self, image=None):
+        return self._rpc()
+
+    def image_properties(self, image=None):
+        return self._rpc()
+
+
+def legacy_analyze(client, content):
+    """Alur lama: dua RPC dan raw_response di-stringify setiap kali"""
+    response = client.label_detection(image=content)
+    labels = [label.description for label in response.label_annotations]
+    props = client.image_properties(image=content)
+    colors = props.image_properties_annotation.dominant_colors.colors
+    c = sorted(colors, key=lambda c: c.pixel_fraction, reverse=True)[0].color
+    return {'labels': labels, 'color': f"RGB({int(c.red)},{int(c.green)},{int(c.blue)})",
+            'raw_response': str(response)}
+
+
+def timed(fn, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return result, samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=80, help='latency per RPC (ms)')
+    parser.add_argument('--calls', type=int, default=20)
+    args = parser.parse_args()
+    latency = args.latency / 1000
+    content = os.urandom(200_000)
+
+    fake = FakeImageAnnotatorClient(latency)
+    legacy, legacy_p50, legacy_p95 = timed(lambda: legacy_analyze(fake, content), args.calls)
+    legacy_rpcs = fake.calls
+
+    fake = FakeImageAnnotatorClient(latency)
+    client = GoogleVisionClient(client=fake)
+    result, p50, p95 = timed(lambda: client.analyze_image(content), args.calls)
+
+    assert result['labels'] == legacy['labels'] and result['color'] == legacy['color']
+    assert 'raw_response' not in result and result['raw_response'] == legacy['raw_response']
+
+    print(f"RPC latency {args.latency:.0f} ms, {args.calls} calls")
+    print(f"{'two RPCs + str(response)':<30} p50={legacy_p50 * 1e3:7.1f} ms  p95={legacy_p95 * 1e3:7.1f} ms  rpcs={legacy_rpcs}")
+    print(f"{'annotate_image (1 RPC)':<30} p50={p50 * 1e3:7.1f} ms  p95={p95 * 1e3:7.1f} ms  rpcs={fake.calls}")
+
+    # Retry: dua error 503 lalu sukses
+    fake = FakeImageAnnotatorClient(latency, fail_first=2)
+    client = GoogleVisionClient(client=fake, retries=2, retry_backoff=0.05)
+    started = time.perf_counter()
+    ok = client.analyze_image(content) is not None
+    print(f"{'retry after 2x 503':<30} ok={ok} rpcs={fake.calls} {(time.perf_counter() - started) * 1e3:.1f} ms")
+
+    # Timeout: RPC lebih lambat dari batas -> None (endpoint memakai analisis lokal)
+    fake = FakeImageAnnotatorClient(latency)
+    client = GoogleVisionClient(client=fake, timeout=latency / 2, retries=0)
+    print(f"{'timeout, no retry':<30} result={client.analyze_image(content)} rpcs={fake.calls}")
+
+    # Deadline total: retry yang tidak muat lagi dilewati
+    fake = FakeImageAnnotatorClient(latency, fail_first=5)
+    client = GoogleVisionClient(client=fake, retries=2, retry_backoff=latency, deadline=latency * 1.5)
+    started = time.perf_counter()
+    result = client.analyze_image(content)
+    elapsed = time.perf_counter() - started
+    print(f"{'deadline, 503s':<30} result={result} rpcs={fake.calls} {elapsed * 1e3:.1f} ms")
+    assert result is None and fake.calls == 1 and elapsed < latency * 1.5
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: throughput mode produksi (serve.py) terhadap jumlah worker
+Menjalankan serve.py dengan beberapa jumlah worker, lalu mengirim
+request /api/predict/disease (CPU-bound) secara paralel.
+
+Jalankan dari folder ml-service:
+    python benchmarks/bench_wsgi_scaling.py --workers 1 2 4 --requests 200
+"""
+
+import argparse
+import base64
+import io
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from PIL import Image
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def make_jpeg(width=1600, height=1200, seed=0):
+    """Deterministic synthetic 'hide' texture as JPEG bytes"""
+    rng = np.random.default_rng(seed)
+    base = np.array([150, 90, 60], dtype=np.float64)
+    noise = rng.normal(0, 25, (height // 8, width // 8, 3))
+    img = np.clip(base + noise, 0, 255).astype(np.uint8)
+    img = Image.fromarray(img).resize((width, height), Image.BILINEAR)
+    buf = io.BytesIO()
+    img.save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
+
+
+def wait_ready(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    return False
+
+
+def run_load(base_url, image_bytes, total, concurrency):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=concurrency)
+    session.mount('http://', adapter)
+
+    # Format yang dikirim aplikasi mobile: data URI base64 di JSON
+    payload = {'image': 'data:image/jpeg;base64,' + base64.b64encode(image_bytes).decode()}
+
+    def one(_):
+        started = time.perf_counter()
+        resp = session.post(f"{base_url}/api/predict/disease", json=payload, timeout=60)
+        ok = resp.status_code == 200 and resp.json().get('success')
+        return ok, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = np.array([lat for _, lat in results])
+    errors = sum(1 for ok, _ in results if not ok)
+    return total / elapsed, np.percentile(latencies, 50), np.percentile(latencies, 95), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    image_bytes = make_jpeg()
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"CPU cores: {os.cpu_count()}, image: {len(image_bytes) / 1024:.0f} KB, requests: {args.requests}")
+    print(f"{'workers':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+
+    for workers in args.workers:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(BASE_DIR, 'serve.py'), '--workers', str(workers), '--port', str(args.port)],
+            cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            if not wait_ready(f"{base_url}/api/model/status"):
+                print(f"{workers:>8}  server gagal start")
+                continue
+            # Pemanasan
+            run_load(base_url, image_bytes, workers * 2, workers * 2)
+            rps, p50, p95, errors = run_load(base_url, image_bytes, args.requests, workers * 2)
+            print(f"{workers:>8} {rps:8.1f} {p50 * 1e3:8.1f} {p95 * 1e3:8.1f} {errors:7d}")
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Konfigurasi Gunicorn untuk ML Service
+Semua nilai bisa diatur lewat environment variable.
+"""
+
+import gc
+import multiprocessing
+import os
+
+# Satu thread BLAS/OpenMP per worker, paralelisme datang dari jumlah proses
+for _var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(_var, '1')
+
+bind = f"0.0.0.0:{os.environ.get('ML_SERVICE_PORT', 5001)}"
+# setdefault: app.py membagi core dengan jumlah worker untuk ukuran process pool
+os.environ.setdefault('ML_SERVICE_WORKERS', str(multiprocessing.cpu_count()))
+workers = int(os.environ['ML_SERVICE_WORKERS'])
+# Admission control (utils/admission.py) butuh thread: dengan worker sync
+# (threads=1) hanya satu request per proses yang sampai ke Flask, sisanya
+# menunggu di backlog socket, jadi antrean per endpoint dan 503 queue_full
+# tidak pernah terjadi. Saat admission aktif defaultnya gthread 16 thread;
+# app.py menurunkan konkurensi:antrean per endpoint dari ML_SERVICE_THREADS
+# (setdefault: nilai yang sama terlihat oleh app saat preload).
+_admission = os.environ.get('ML_SERVICE_ADMISSION', 'true').lower() == 'true'
+os.environ.setdefault('ML_SERVICE_THREADS', '16' if _admission else '1')
+threads = int(os.environ['ML_SERVICE_THREADS'])
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('ML_SERVICE_TIMEOUT', 60))
+
+# Muat model sekali di proses induk sebelum fork (copy-on-write)
+preload_app = True
+
+
+def when_ready(server):
+    # Pindahkan objek model ke generasi permanen GC agar siklus GC di
+    # worker tidak menyentuh (dan menyalin) halaman memori milik induk
+    gc.freeze()
+    server.log.info(f"ML Service ready with {workers} workers (models preloaded)")
+
+
+def post_fork(server, worker):
+    # Process pool dibuat di sini, saat worker baru di-fork dan belum punya
+    # thread (gthread, Google Vision), bukan lazy dari thread request
+    from wsgi import start_worker_pools
+    start_worker_pools()
@@ -1,8 +1,17 @@
 """
 ML Models Package
+Model di-import secara lazy agar "import models" tidak ikut memuat
+pandas/sklearn/scikit-image.
 """
 
-from .health_predictor import HealthPredictor
-from .disease_detector import DiseaseDetector
-
 __all__ = ['HealthPredictor', 'DiseaseDetector']
+
+
+def __getattr__(name):
+    if name == 'HealthPredictor':
+        from .health_predictor import HealthPredictor
+        return HealthPredictor
+    if name == 'DiseaseDetector':
+        from .disease_detector import DiseaseDetector
+        return DiseaseDetector
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
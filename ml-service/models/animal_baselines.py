@@ -0,0 +1,256 @@
+"""
+Animal Baselines - statistik vital pribadi per animal_id di sisi server
+Rerata dan varians suhu diperbarui secara incremental (algoritma Welford)
+setiap kali ada pembacaan baru, bersama berat terakhir, sehingga
+predict_with_baseline cukup menerima pembacaan saat ini + animal_id.
+
+Disimpan di SQLite (satu baris kecil per hewan, tanpa rowid): lookup dan
+update O(1), aman dipakai beberapa worker gunicorn sekaligus.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS baselines (
+    animal_id TEXT PRIMARY KEY,
+    readings INTEGER NOT NULL,
+    temp_n INTEGER NOT NULL,
+    temp_sum REAL NOT NULL,
+    temp_mean REAL NOT NULL,
+    temp_m2 REAL NOT NULL,
+    last_weight REAL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID
+"""
+
+
+class AnimalBaseline(namedtuple('AnimalBaseline', 'animal_id readings temp_n temp_sum temp_m2 last_weight_raw')):
+    """
+    Running statistics for one animal.
+    Properti mengikuti semantik pandas di predict_with_history:
+    mean/std (ddof=1) hanya dari suhu yang valid, NaN kalau belum cukup data.
+    Rerata dihitung sum / n (seperti pandas), bukan dari mean Welford, agar
+    pembulatan di pesan anomali sama.
+    """
+
+    @property
+    def temp_mean(self):
+        return self.temp_sum / self.temp_n if self.temp_n > 0 else math.nan
+
+    @property
+    def temp_std(self):
+        if self.temp_n < 2:
+            return math.nan
+        return math.sqrt(max(self.temp_m2, 0.0) / (self.temp_n - 1))
+
+    @property
+    def last_weight(self):
+        return self.last_weight_raw if self.last_weight_raw is not None else math.nan
+
+    def to_dict(self):
+        return {
+            'animal_id': self.animal_id,
+            'readings': self.readings,
+            'temperature_mean': None if self.temp_n == 0 else round(self.temp_mean, 3),
+            'temperature_std': None if self.temp_n < 2 else round(self.temp_std, 3),
+            'last_weight': self.last_weight_raw,
+        }
+
+
+def to_float(value):
+    """Seperti pd.to_numeric(errors='coerce'): angka / string angka, selain itu None"""
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def welford_update(stats, temperature):
+    """Tambah satu suhu ke statistik berjalan (n, sum, mean, m2)"""
+    temp_n, temp_sum, temp_mean, temp_m2 = stats
+    temp_n += 1
+    delta = temperature - temp_mean
+    temp_mean += delta / temp_n
+    temp_m2 += delta * (temperature - temp_mean)
+    return temp_n, temp_sum + temperature, temp_mean, temp_m2
+
+
+class AnimalBaselineStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(_SCHEMA)
+
+    def _connect(self):
+        """Satu koneksi per thread (sqlite3 tidak boleh dipakai lintas thread)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # ==================== READ ====================
+
+    def get(self, animal_id):
+        row = self._connect().execute(
+            'SELECT readings, temp_n, temp_sum, temp_m2, last_weight FROM baselines WHERE animal_id = ?',
+            (str(animal_id),)
+        ).fetchone()
+        if row is None:
+            return None
+        return AnimalBaseline(str(animal_id), *row)
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM baselines').fetchone()[0]
+
+    def stats(self):
+        return {
+            'animals': len(self),
+            'db_path': self.db_path,
+            'size_bytes': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        }
+
+    # ==================== WRITE ====================
+
+    def update(self, animal_id, temperature=None, weight=None):
+        """Tambahkan satu pembacaan (Welford), return AnimalBaseline terbaru"""
+        temperature, weight = to_float(temperature), to_float(weight)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT readings, temp_n, temp_sum, temp_mean, temp_m2 FROM baselines WHERE animal_id = ?',
+                (str(animal_id),)
+            ).fetchone()
+            readings, stats = (row[0], row[1:]) if row is not None else (0, (0, 0.0, 0.0, 0.0))
+
+            readings += 1
+            if temperature is not None:
+                stats = welford_update(stats, temperature)
+
+            # Berat terakhir = berat pembacaan terakhir (NULL kalau tidak ada), seperti iloc[-1]
+            self._write(conn, animal_id, readings, stats, weight)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return self._baseline(animal_id, readings, stats, weight)
+
+    def seed(self, animal_id, history):
+        """Bangun ulang baseline dari riwayat lengkap (list of {'temperature', 'weight'})"""
+        readings, stats = 0, (0, 0.0, 0.0, 0.0)
+        weight = None
+        for record in history:
+            readings += 1
+            temperature = to_float(record.get('temperature')) if isinstance(record, dict) else None
+            if temperature is not None:
+                stats = welford_update(stats, temperature)
+            weight = to_float(record.get('weight')) if isinstance(record, dict) else None
+
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._write(conn, animal_id, readings, stats, weight)
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return self._baseline(animal_id, readings, stats, weight)
+
+    def remove(self, animal_id):
+        cursor = self._connect().execute('DELETE FROM baselines WHERE animal_id = ?', (str(animal_id),))
+        return cursor.rowcount > 0
+
+    def _write(self, conn, animal_id, readings, stats, weight):
+        conn.execute(
+            'INSERT OR REPLACE INTO baselines '
+            '(animal_id, readings, temp_n, temp_sum, temp_mean, temp_m2, last_weight, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (str(animal_id), readings, *stats, weight, time.time())
+        )
+
+    @staticmethod
+    def _baseline(animal_id, readings, stats, weight):
+        temp_n, temp_sum, _, temp_m2 = stats
+        return AnimalBaseline(str(animal_id), readings, temp_n, temp_sum, temp_m2, weight)
+
+
+# Parity check: baseline incremental vs predict_with_history (pandas)
+if __name__ == "__main__":
+    import re
+    import sys
+    import tempfile
+    import warnings
+
+    import numpy as np
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from models.health_predictor import HealthPredictor
+
+    warnings.filterwarnings('ignore')
+    predictor = HealthPredictor()
+    if not predictor.load_model():
+        predictor.train()
+
+    def split_mean(factors):
+        """Pisahkan angka 'rerata X°C' dari pesan (pandas menjumlah pairwise, bisa beda 1 ulp)"""
+        means = [float(m) for f in factors for m in re.findall(r'rerata (-?[\d.]+)', f)]
+        return sorted(re.sub(r'rerata -?[\d.]+', 'rerata _', f) for f in factors), means
+
+    rng = np.random.default_rng(7)
+    mismatches = 0
+    checked = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AnimalBaselineStore(os.path.join(tmp, 'baselines.sqlite3'))
+        for animal in range(100):
+            base_temp, base_weight = rng.normal(38.8, 0.4), rng.uniform(20, 400)
+            history = []
+            for step in range(int(rng.integers(1, 40))):
+                reading = {
+                    'jenis_hewan': 'sapi',
+                    'suhu_celcius': round(float(base_temp + rng.normal(0, 0.3 if rng.random() > 0.1 else 1.5)), 1),
+                    'berat_kg': round(float(base_weight * (1 - (0.08 if rng.random() < 0.1 else 0.0))), 1),
+                }
+                baseline = store.get(animal)
+                expected = predictor.predict_with_history(reading, history)
+                actual = predictor.predict_with_baseline(reading, baseline)
+                for key in ('status', 'status_key', 'risk_score', 'has_historical_context'):
+                    if expected.get(key) != actual.get(key):
+                        mismatches += 1
+                expected_factors, expected_means = split_mean(expected['risk_factors'])
+                actual_factors, actual_means = split_mean(actual['risk_factors'])
+                if expected_factors != actual_factors or any(
+                        abs(a - b) > 0.1 + 1e-9 for a, b in zip(expected_means, actual_means)):
+                    mismatches += 1
+                checked += 1
+
+                # Sesekali suhu/berat tidak valid, seperti data lapangan
+                record = {'temperature': reading['suhu_celcius'], 'weight': reading['berat_kg']}
+                if rng.random() < 0.05:
+                    record['temperature'] = 'n/a'
+                if rng.random() < 0.05:
+                    record['weight'] = None
+                history.append(record)
+                store.update(animal, record['temperature'], record['weight'])
+
+            seeded = store.seed(f"seed-{animal}", history)
+            stored = store.get(animal)
+            assert seeded.readings == stored.readings and seeded.temp_n == stored.temp_n
+            assert abs(seeded.temp_mean - stored.temp_mean) < 1e-9
+
+        print(f"Predictions checked: {checked}, mismatches: {mismatches}")
+        print(f"Store: {store.stats()}")
+        assert mismatches == 0, "Baseline incremental tidak sama dengan predict_with_history"
+        print("OK")
@@ -0,0 +1,133 @@
+"""
+Compiled Forest - Inference RandomForest tanpa overhead sklearn
+Semua pohon dari RandomForestClassifier digabung menjadi array NumPy
+kontigu (feature/threshold/children/value) lalu dievaluasi level demi
+level untuk satu batch baris sekaligus dengan vectorized indexing.
+"""
+
+import numpy as np
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_proba = leaf_proba
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = None
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Build a compiled forest from a fitted RandomForestClassifier"""
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            is_leaf = tree.children_left == -1
+
+            # Leaf menunjuk ke dirinya sendiri, jadi semua baris bisa
+            # diiterasi sebanyak max_depth tanpa cek "sudah di leaf?"
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            feature = np.where(is_leaf, 0, tree.feature)
+
+            # Probabilitas per leaf (value dinormalisasi seperti tree.predict_proba)
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1.0
+
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            lefts.append(left)
+            rights.append(right)
+            probas.append(value / totals)
+            roots.append(offset)
+
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        forest = cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int64),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int64),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int64),
+            leaf_proba=np.ascontiguousarray(np.concatenate(probas)),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+            classes=model.classes_
+        )
+        forest.n_features_in_ = model.n_features_in_
+        return forest
+
+    def apply(self, X):
+        """Return leaf node index per (row, tree), shape (n_rows, n_trees)"""
+        # sklearn membandingkan fitur dalam float32, samakan agar hasil identik
+        X = np.ascontiguousarray(X, dtype=np.float32).astype(np.float64)
+        n_rows, n_features = X.shape
+        X_flat = X.ravel()
+        row_offset = (np.arange(n_rows, dtype=np.int64) * n_features)[:, None]
+
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            values = X_flat.take(row_offset + self.feature.take(nodes))
+            go_left = values <= self.threshold.take(nodes)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        return nodes
+
+    def predict_proba(self, X):
+        """Same output as RandomForestClassifier.predict_proba"""
+        leaves = self.apply(X)
+        proba = self.leaf_proba.take(leaves[:, 0], axis=0)
+        for t in range(1, leaves.shape[1]):
+            proba += self.leaf_proba.take(leaves[:, t], axis=0)
+        return proba / leaves.shape[1]
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+# Parity check terhadap sklearn
+if __name__ == "__main__":
+    import os
+    import sys
+    import warnings
+    import pandas as pd
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from models.health_predictor import HealthPredictor
+
+    warnings.filterwarnings('ignore')
+
+    predictor = HealthPredictor()
+    if not predictor.load_model():
+        predictor.train()
+
+    data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'health_training_data.csv')
+    df = pd.read_csv(data_path).drop(columns='hasil')
+    for col in predictor.categorical_cols:
+        df[col] = predictor._encode_column(col, df[col].tolist())
+    X = df[predictor.feature_cols].to_numpy(dtype=np.float64)
+
+    # Tambahkan baris acak di sekitar data asli untuk menguji banyak cabang
+    rng = np.random.default_rng(42)
+    noisy = X[rng.integers(0, len(X), 2000)] + rng.normal(0, 1.0, (2000, X.shape[1])) * [6, 50, 0.8, 0, 0, 0, 0, 0]
+    X = np.vstack([X, noisy])
+
+    forest = CompiledForest.from_sklearn(predictor.model)
+    expected = predictor.model.predict_proba(X)
+    actual = forest.predict_proba(X)
+
+    max_diff = float(np.abs(expected - actual).max())
+    same_label = bool((expected.argmax(axis=1) == actual.argmax(axis=1)).all())
+    print(f"Trees: {len(forest.roots)}, nodes: {len(forest.feature)}, depth: {forest.max_depth}")
+    print(f"Rows checked: {len(X)}, max |diff| = {max_diff:.2e}, labels identical: {same_label}")
+    assert np.allclose(expected, actual, atol=1e-12) and same_label, "Compiled forest tidak sama dengan sklearn"
+    print("OK")
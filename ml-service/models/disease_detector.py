@@ -6,9 +6,6 @@ Analisis meliputi: Tekstur (Entropy), Warna (HSV), dan Segmentasi Lesi
 
 import os
 import numpy as np
-from PIL import Image
-import io
-import base64
 
 # Import scikit-image modules for feature extraction
 try:
@@ -21,10 +18,31 @@ except ImportError:
     SKIMAGE_AVAILABLE = False
     print("Warning: Scikit-Image not available. Features will be limited.")
 
+try:
+    from .image_pipeline import DecodedImage
+except ImportError:
+    from image_pipeline import DecodedImage
+
+try:
+    from utils.metrics import stage
+except ImportError:
+    # Tanpa paket utils (script langsung): instrumentasi no-op
+    from contextlib import nullcontext as stage
+
 class DiseaseDetector:
-    def __init__(self):
+    MODEL_VERSION = 'cv-grid-1'
+
+    def __init__(self, grid_size=10):
         self.img_size = (224, 224)
         
+        # Resolusi analisis dan jumlah blok grid per sisi (grid_size x grid_size)
+        self.analysis_size = 200
+        self.grid_size = grid_size
+        
+        # Versi logika analisis, bagian dari key cache hasil.
+        # Naikkan MODEL_VERSION setiap kali aturan/skor diubah.
+        self.model_version = f"{self.MODEL_VERSION}-grid{grid_size}-{self.analysis_size}px"
+        
         # Disease classes
         self.classes = [
             'healthy',           # Sehat
@@ -136,67 +154,154 @@ class DiseaseDetector:
         }
 
     def preprocess_image(self, image_data):
-        """Standardize image to numpy array"""
-        if isinstance(image_data, str) and image_data.startswith('data:image'):
-            base64_data = image_data.split(',')[1]
-            img_bytes = base64.b64decode(base64_data)
-            img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-        else:
-            # Fallback for paths or bytes
-            img = Image.open(image_data).convert('RGB')
-        
-        img = img.resize((300, 300)) # Good size for analysis
-        return np.array(img)
+        """
+        Decode image once, directly at analysis resolution.
+        Menerima bytes, base64/data URI, file-like, atau DecodedImage.
+        """
+        if isinstance(image_data, DecodedImage):
+            return image_data
+        return DecodedImage.from_request_data(image_data, self.analysis_size)
+
+    def preprocess_frames(self, image_data):
+        """Decode frame demi frame (burst / container multi-frame), lazy"""
+        return DecodedImage.frames_from_request_data(image_data, self.analysis_size)
+
+    def analyze_burst(self, frames, stable_frames=2, confidence_tolerance=5.0, max_frames=None):
+        """
+        Analisis burst frame satu per satu dengan early stopping.
+
+        Skor dirata-rata atas frame yang sudah diproses. Analisis berhenti
+        begitu ranking kelas (top 3) tidak berubah dan confidence bergeser
+        paling banyak confidence_tolerance poin selama stable_frames frame
+        berturut-turut; frame sisanya tidak di-decode sama sekali.
 
-    def analyze_features(self, img_array):
+        Args:
+            frames: iterable DecodedImage / array RGB (sebaiknya generator)
+        Returns: (hasil predict dari skor rata-rata, ringkasan per frame, converged)
+        """
+        totals = None
+        processed = 0
+        stable = 0
+        previous = None
+        history = []
+        result = None
+        converged = False
+
+        for frame in frames:
+            scores = self.analyze_features(frame)
+            processed += 1
+            if totals is None:
+                totals = dict(scores)
+            else:
+                for cls_name, score in scores.items():
+                    totals[cls_name] += score
+
+            result = self.predict(None, scores={c: v / processed for c, v in totals.items()})
+            if not result.get('success'):
+                break
+            ranking = [p['class'] for p in result['all_predictions']]
+            confidence = result['prediction']['confidence']
+            history.append({'frame': processed - 1, 'class': ranking[0], 'confidence': confidence})
+
+            if previous is not None and ranking == previous[0] and abs(confidence - previous[1]) <= confidence_tolerance:
+                stable += 1
+            else:
+                stable = 0
+            previous = (ranking, confidence)
+
+            if stable >= stable_frames:
+                converged = True
+                break
+            if max_frames and processed >= max_frames:
+                break
+
+        if result is None:
+            raise ValueError('Burst tidak berisi frame')
+        return result, history, converged
+
+    @staticmethod
+    def aggregate_scores(score_list):
+        """
+        Gabungkan skor beberapa foto satu hewan.
+        Bukti penyakit cukup terlihat di satu foto (lesi di kuku tidak tampak
+        di foto mata), jadi skor kelas penyakit memakai nilai maksimum dan
+        skor sehat nilai minimum: hewan dianggap sehat kalau semua foto sehat,
+        foto-foto bersih tidak boleh menutupi temuan di satu foto.
+        """
+        if not score_list:
+            raise ValueError('Tidak ada skor untuk digabung')
+        classes = list(score_list[0])
+        aggregated = {c: max(scores.get(c, 0.0) for scores in score_list) for c in classes}
+        if 'healthy' in aggregated:
+            aggregated['healthy'] = min(scores.get('healthy', 0.0) for scores in score_list)
+        return aggregated
+
+    def analyze_features(self, img_array, grid_size=None):
         """
         Melakukan analisis Grid-Based Anomaly Detection dengan Confidence REALISTIS.
+        
+        Statistik semua blok grid dihitung sekaligus lewat block view
+        (rows, cols, 3, h, w), lalu aturan anomali dievaluasi sebagai mask.
+        
+        Args:
+            img_array: DecodedImage (HSV sudah siap) atau array RGB ukuran bebas
         """
-        # Resize
-        from skimage.transform import resize
-        img_resized = resize(img_array, (200, 200), anti_aliasing=True)
-        img_hsv = color.rgb2hsv(img_resized)
+        size = self.analysis_size
+        with stage('disease.hsv'):
+            if isinstance(img_array, DecodedImage) and img_array.size == size:
+                img_hsv = img_array.hsv
+            else:
+                # Resize
+                from skimage.transform import resize
+                img_resized = resize(img_array, (size, size), anti_aliasing=True)
+                img_hsv = color.rgb2hsv(img_resized)
         
+        with stage('disease.grid'):
+            return self._scan_grid(img_hsv, grid_size)
+
+    def _scan_grid(self, img_hsv, grid_size=None):
+        """Grid scan dan aturan anomali di atas citra HSV (analysis_size x analysis_size)"""
+        size = self.analysis_size
+
         # Grid parameters
-        rows, cols = 10, 10
-        h_step, w_step = 20, 20
+        rows = cols = grid_size or self.grid_size
+        if not 1 <= rows <= size:
+            raise ValueError(f"grid_size harus antara 1 dan {size}")
+        h_step, w_step = size // rows, size // cols
         total_blocks = rows * cols
         
-        anomalies = {
-            'red_spots': 0, 'pus_spots': 0, 'dark_spots': 0
-        }
-        
         # Hitung global stats
         global_hue = np.mean(img_hsv[:,:,0])
         global_sat = np.mean(img_hsv[:,:,1])
         
         print(f"DEBUG AI: Global Hue={global_hue:.2f}, Sat={global_sat:.2f}")
 
-        # Scan Grid
-        for r in range(rows):
-            for c in range(cols):
-                patch_hsv = img_hsv[r*h_step:(r+1)*h_step, c*w_step:(c+1)*w_step]
-                p_hue = np.mean(patch_hsv[:,:,0])
-                p_sat = np.mean(patch_hsv[:,:,1])
-                p_val = np.mean(patch_hsv[:,:,2])
-                
-                # Logic Anomali yang ketat (Strict)
-                # Merah Radang
-                is_red = (p_hue < 0.04 or p_hue > 0.96) and (p_sat > 0.45) and (p_val < 0.85)
-                # Koreksi: Jika sapi coklat (global sat tinggi), patch harus LEBIH merah
-                if global_sat > 0.25:
-                    if is_red and (p_sat > global_sat + 0.15):
-                         anomalies['red_spots'] += 1
-                else:
-                    if is_red: anomalies['red_spots'] += 1
-
-                # Nanah / Infeksi (Kuning Pucat)
-                if (0.13 < p_hue < 0.22) and (p_sat > 0.25) and (p_val > 0.5):
-                     anomalies['pus_spots'] += 1
-                     
-                # Gelap / Koreng
-                if p_val < 0.2 and global_sat < 0.6: 
-                     anomalies['dark_spots'] += 1
+        # Scan Grid: tiap blok dibuat kontigu (h, w) agar urutan penjumlahan
+        # np.mean sama persis dengan perhitungan per patch (bit-compatible)
+        blocks = img_hsv[:rows*h_step, :cols*w_step].reshape(rows, h_step, cols, w_step, 3)
+        block_means = np.ascontiguousarray(blocks.transpose(0, 2, 4, 1, 3)).mean(axis=(3, 4))
+        p_hue = block_means[:, :, 0]
+        p_sat = block_means[:, :, 1]
+        p_val = block_means[:, :, 2]
+        
+        # Logic Anomali yang ketat (Strict)
+        # Merah Radang
+        is_red = ((p_hue < 0.04) | (p_hue > 0.96)) & (p_sat > 0.45) & (p_val < 0.85)
+        # Koreksi: Jika sapi coklat (global sat tinggi), patch harus LEBIH merah
+        if global_sat > 0.25:
+            is_red &= p_sat > global_sat + 0.15
+        
+        # Nanah / Infeksi (Kuning Pucat)
+        is_pus = (0.13 < p_hue) & (p_hue < 0.22) & (p_sat > 0.25) & (p_val > 0.5)
+        
+        # Gelap / Koreng
+        is_dark = (p_val < 0.2) & (global_sat < 0.6)
+        
+        anomalies = {
+            'red_spots': int(is_red.sum()),
+            'pus_spots': int(is_pus.sum()),
+            'dark_spots': int(is_dark.sum())
+        }
 
         print(f"DEBUG AI: Anomalies -> {anomalies}")
 
@@ -250,13 +355,20 @@ class DiseaseDetector:
 
         return scores
 
-    def predict(self, image_data, gcv_data=None):
+    def predict(self, image_data, gcv_data=None, scores=None):
+        """
+        scores: hasil analyze_features yang sudah dihitung (mis. paralel
+            dengan panggilan Google Vision); None = dihitung di sini
+        """
         try:
-            # 1. Image Processing
-            img = self.preprocess_image(image_data)
-            
-            # 2. Extract & Analyze Features (Physics/Math based)
-            scores = self.analyze_features(img)
+            if scores is None:
+                # 1. Image Processing (decode sekali)
+                img = self.preprocess_image(image_data)
+                
+                # 2. Extract & Analyze Features (Physics/Math based)
+                scores = self.analyze_features(img)
+            else:
+                scores = dict(scores)
             
             # 3. Incorporate Google Vision Data (Hybrid Intelligence)
             if gcv_data and 'labels' in gcv_data:
@@ -1,15 +1,79 @@
-
 import os
+import time
 try:
     from google.cloud import vision
 except ImportError:
     vision = None
 
+try:
+    from google.api_core import exceptions as google_exceptions
+    RETRYABLE_ERRORS = (
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+        google_exceptions.TooManyRequests,
+        TimeoutError,
+        ConnectionError,
+    )
+except ImportError:
+    RETRYABLE_ERRORS = (TimeoutError, ConnectionError)
+
+try:
+    from utils.metrics import stage
+except ImportError:
+    # Tanpa paket utils (script langsung): instrumentasi no-op
+    from contextlib import nullcontext as stage
+
+# Fitur yang diminta dalam satu annotate_image (label + warna dominan)
+FEATURE_TYPES = ('LABEL_DETECTION', 'IMAGE_PROPERTIES')
+
+
+class VisionResult(dict):
+    """
+    Hasil analisis GCV (dict biasa untuk pemanggil).
+    'raw_response' baru di-stringify dari protobuf saat benar-benar diakses.
+    """
+
+    def __init__(self, response, **fields):
+        super().__init__(**fields)
+        self._response = response
+
+    def __missing__(self, key):
+        if key == 'raw_response':
+            self[key] = str(self._response)
+            return self[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key == 'raw_response':
+            return self[key]
+        return super().get(key, default)
+
+
 class GoogleVisionClient:
-    def __init__(self, credential_path="credentials.json"):
+    def __init__(self, credential_path="credentials.json", client=None, timeout=5.0, retries=2, retry_backoff=0.2,
+                 deadline=None):
+        """
+        client: ImageAnnotatorClient (atau fake dengan method annotate_image
+            untuk pengujian lokal); None = dibuat dari credential_path
+        timeout: batas waktu per panggilan RPC (detik)
+        retries: jumlah percobaan ulang untuk error sementara (503, timeout, dll)
+        deadline: batas total semua percobaan + backoff (detik); timeout per
+            RPC dipotong ke sisa waktu dan retry yang tidak muat dilewati.
+            None = tanpa batas total
+        """
         self.client = None
         self.enabled = False
-        
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.deadline = deadline
+
+        if client is not None:
+            self.client = client
+            self.enabled = True
+            return
+
         # Cek apakah library terinstall
         if vision is None:
             print("WARNING: google-cloud-vision not installed.")
@@ -30,36 +94,70 @@ class GoogleVisionClient:
     def analyze_image(self, img_content):
         """
         img_content: Binary image data
-        Returns: { 'labels': ['Cow', 'Grass'], 'text': '...', 'safe_search': ... }
+        Returns: { 'labels': ['Cow', 'Grass'], 'color': 'RGB(...)', 'raw_response' (lazy) }
         """
         if not self.enabled or not self.client:
             return None
 
         try:
-            image = vision.Image(content=img_content)
-            
-            # Request fitur: Label (Objek) dan Text (Merek/Warna)
-            response = self.client.label_detection(image=image)
+            if not isinstance(img_content, bytes):
+                img_content = bytes(img_content)  # mmap dari upload biner
+
+            # Label dan warna dominan dalam satu round trip
+            with stage('gcv.annotate'):
+                response = self._annotate(img_content)
+            if response.error.message:
+                raise RuntimeError(response.error.message)
+
             labels = [label.description for label in response.label_annotations]
-            
+
             # Deteksi warna dominan
-            props = self.client.image_properties(image=image)
-            colors = props.image_properties_annotation.dominant_colors.colors
+            colors = response.image_properties_annotation.dominant_colors.colors
             dominant_color = "Unknown"
             if colors:
-                # Ambil warna paling dominan (score tertinggi)
-                # Sort by pixel_fraction
-                sorted_colors = sorted(colors, key=lambda c: c.pixel_fraction, reverse=True)
-                c = sorted_colors[0].color
+                # Ambil warna paling dominan (pixel_fraction tertinggi)
+                c = max(colors, key=lambda c: c.pixel_fraction).color
                 dominant_color = f"RGB({int(c.red)},{int(c.green)},{int(c.blue)})"
 
-            return {
-                'success': True,
-                'source': 'Google Cloud Vision',
-                'labels': labels, # e.g. ['Cattle', 'Working animal', 'Grass']
-                'color': dominant_color,
-                'raw_response': str(response)
-            }
+            return VisionResult(
+                response,
+                success=True,
+                source='Google Cloud Vision',
+                labels=labels, # e.g. ['Cattle', 'Working animal', 'Grass']
+                color=dominant_color
+            )
         except Exception as e:
             print(f"Google Vision API Error: {e}")
             return None
+
+    def _annotate(self, img_content):
+        """Satu annotate_image dengan timeout dan retry (backoff eksponensial)"""
+        request = {
+            'image': {'content': img_content},
+            'features': [{'type_': self._feature_type(name)} for name in FEATURE_TYPES]
+        }
+        give_up = None if self.deadline is None else time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            timeout = self.timeout
+            if give_up is not None:
+                timeout = min(timeout, max(0.0, give_up - time.monotonic()))
+            try:
+                # retry=None: retry bawaan client (deadline 600 detik) dimatikan, diatur di sini
+                return self.client.annotate_image(request, retry=None, timeout=timeout)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                if give_up is not None and time.monotonic() + delay >= give_up:
+                    # Retry tidak muat lagi dalam deadline: pemanggil sudah memakai hasil lokal
+                    raise
+                print(f"WARN: Google Vision retry {attempt + 1}/{self.retries} in {delay:.2f}s: {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    @staticmethod
+    def _feature_type(name):
+        if vision is not None:
+            return vision.Feature.Type[name]
+        return name
@@ -11,14 +11,54 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import os
+import threading
+from collections import OrderedDict
+
+try:
+    from .compiled_forest import CompiledForest
+    from . import health_trends
+except ImportError:
+    # Dijalankan langsung sebagai script (python models/health_predictor.py)
+    from compiled_forest import CompiledForest
+    import health_trends
+
+try:
+    from utils.metrics import stage
+except ImportError:
+    # Tanpa paket utils (script langsung): instrumentasi no-op
+    from contextlib import nullcontext as stage
+
+# Kode untuk kategori yang tidak dikenal encoder (sama dengan perilaku lama: 0)
+UNKNOWN_CATEGORY_CODE = 0
 
 class HealthPredictor:
-    def __init__(self):
+    def __init__(self, cache_size=0, use_compiled_forest=False, model_dir=None):
         self.model = None
+        # Versi array dari self.model untuk inference cepat (opsional)
+        self.use_compiled_forest = use_compiled_forest
+        self.compiled_forest = None
         self.label_encoders = {}
         self.target_encoder = None
-        self.model_path = os.path.join(os.path.dirname(__file__), '..', 'saved_models', 'health_model.pkl')
-        self.encoders_path = os.path.join(os.path.dirname(__file__), '..', 'saved_models', 'health_encoders.pkl')
+        # Lookup table {kolom: {kategori: kode}} hasil kompilasi label_encoders
+        self.category_tables = {}
+        # model_dir: folder artifact (None = saved_models/, lokasi lama)
+        if model_dir is None:
+            model_dir = os.path.join(os.path.dirname(__file__), '..', 'saved_models')
+        self.model_path = os.path.join(model_dir, 'health_model.pkl')
+        self.encoders_path = os.path.join(model_dir, 'health_encoders.pkl')
+        
+        # Urutan kolom fitur harus sama dengan data training
+        self.numeric_cols = ['umur_bulan', 'berat_kg', 'suhu_celcius']
+        self.categorical_cols = ['nafsu_makan', 'aktivitas', 'riwayat_sakit', 'vaksinasi_lengkap', 'jenis_hewan']
+        self.feature_cols = self.numeric_cols + self.categorical_cols
+        
+        # LRU cache hasil prediksi, key = tuple fitur yang sudah di-encode.
+        # Opt-in: cache_size=0 berarti cache nonaktif.
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
         
         # Mapping untuk output
         self.result_mapping = {
@@ -79,21 +119,28 @@ class HealthPredictor:
             }
         }
     
-    def train(self, data_path=None):
-        """Train the model with training data"""
+    def train(self, data_path=None, progress=None):
+        """
+        Train the model with training data
+        progress: callback opsional progress(stage), dipanggil di awal setiap
+            tahap (loading_data, fitting, evaluating, saving)
+        """
+        if progress is None:
+            progress = lambda stage_name: None
         if data_path is None:
             data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'health_training_data.csv')
         
         # Load data
+        progress('loading_data')
         df = pd.read_csv(data_path)
         
         # Encode categorical variables
-        categorical_cols = ['nafsu_makan', 'aktivitas', 'riwayat_sakit', 'vaksinasi_lengkap', 'jenis_hewan']
-        
-        for col in categorical_cols:
+        for col in self.categorical_cols:
             self.label_encoders[col] = LabelEncoder()
             df[col] = self.label_encoders[col].fit_transform(df[col])
         
+        self._compile_encoders()
+        
         # Encode target
         self.target_encoder = LabelEncoder()
         df['hasil'] = self.target_encoder.fit_transform(df['hasil'])
@@ -106,6 +153,7 @@ class HealthPredictor:
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
         # Train Random Forest
+        progress('fitting')
         self.model = RandomForestClassifier(
             n_estimators=100,
             max_depth=10,
@@ -114,6 +162,7 @@ class HealthPredictor:
         self.model.fit(X_train, y_train)
         
         # Evaluate
+        progress('evaluating')
         y_pred = self.model.predict(X_test)
         accuracy = accuracy_score(y_test, y_pred)
         
@@ -121,7 +170,12 @@ class HealthPredictor:
         print("\nClassification Report:")
         print(classification_report(y_test, y_pred, target_names=self.target_encoder.classes_))
         
+        # Model berubah, hasil lama di cache tidak berlaku lagi
+        self._compile_forest()
+        self.clear_cache()
+        
         # Save model
+        progress('saving')
         self.save_model()
         
         return accuracy
@@ -143,9 +197,44 @@ class HealthPredictor:
             encoders = joblib.load(self.encoders_path)
             self.label_encoders = encoders['label_encoders']
             self.target_encoder = encoders['target_encoder']
+            self._compile_encoders()
+            self._compile_forest()
+            self.clear_cache()
             return True
         return False
     
+    def _compile_encoders(self):
+        """
+        Compile fitted LabelEncoders into plain dict lookup tables.
+        LabelEncoder.transform terlalu mahal untuk dipanggil per nilai
+        (validasi input sklearn + pencarian di classes_).
+        """
+        self.category_tables = {
+            col: {category: code for code, category in enumerate(encoder.classes_.tolist())}
+            for col, encoder in self.label_encoders.items()
+        }
+    
+    def _compile_forest(self):
+        """Build the compiled forest from self.model if enabled"""
+        if self.use_compiled_forest and self.model is not None:
+            self.compiled_forest = CompiledForest.from_sklearn(self.model)
+        else:
+            self.compiled_forest = None
+    
+    def _predict_proba(self, features):
+        """predict_proba via compiled forest if available, else sklearn"""
+        if self.compiled_forest is not None:
+            return self.compiled_forest.predict_proba(features)
+        return self.model.predict_proba(features)
+    
+    def _encode_value(self, col, value):
+        """Encode one categorical value, unknown categories -> UNKNOWN_CATEGORY_CODE"""
+        try:
+            return self.category_tables[col].get(value, UNKNOWN_CATEGORY_CODE)
+        except TypeError:
+            # Nilai unhashable (list/dict dari JSON)
+            return UNKNOWN_CATEGORY_CODE
+    
     def predict(self, data):
         """
         Predict health status from input data
@@ -169,8 +258,136 @@ class HealthPredictor:
                 # Train if no model exists
                 self.train()
         
-        # Prepare input
-        input_data = {
+        with stage('health.encode'):
+            input_data = self._prepare_input(data)
+            
+            # Encode categorical variables
+            encoded_data = input_data.copy()
+            for col in self.categorical_cols:
+                encoded_data[col] = self._encode_value(col, input_data[col])
+            
+            # Create feature tuple (juga dipakai sebagai key cache)
+            features = tuple(float(encoded_data[col]) for col in self.feature_cols)
+        
+        # Predict
+        with stage('health.forest'):
+            result_key, confidence = self._predict_features(features)
+        
+        with stage('health.format'):
+            return self._format_result(input_data, result_key, confidence)
+    
+    def predict_many(self, records):
+        """
+        Predict health status for many animals at once (batch scoring)
+        
+        Semua record di-encode per kolom dalam satu langkah, lalu model
+        dipanggil sekali (predict_proba) untuk seluruh matriks fitur.
+        
+        Args:
+            records: list of dicts (format sama dengan predict)
+        
+        Returns:
+            list of dicts, urutan sama dengan input:
+                - {'index': i, 'success': True, 'data': {...}}
+                - {'index': i, 'success': False, 'error': '...'}
+        """
+        if self.model is None:
+            if not self.load_model():
+                self.train()
+        
+        results = [None] * len(records)
+        valid_indices = []
+        valid_inputs = []
+        
+        # 1. Validasi per record (error tidak menggagalkan seluruh batch)
+        for i, record in enumerate(records):
+            try:
+                input_data = self._validate_input(record)
+            except ValueError as e:
+                results[i] = {'index': i, 'success': False, 'error': str(e)}
+                continue
+            valid_indices.append(i)
+            valid_inputs.append(input_data)
+        
+        if not valid_inputs:
+            return results
+        
+        # 2. Encode kolom demi kolom
+        with stage('health.batch_encode'):
+            features = np.empty((len(valid_inputs), len(self.feature_cols)), dtype=np.float64)
+            for j, col in enumerate(self.feature_cols):
+                values = [row[col] for row in valid_inputs]
+                if col in self.categorical_cols:
+                    features[:, j] = self._encode_column(col, values)
+                else:
+                    features[:, j] = np.asarray(values, dtype=np.float64)
+        
+        # 3. Satu kali predict_proba, label diambil dari argmax
+        with stage('health.batch_forest'):
+            probabilities = self._predict_proba(features)
+            best = probabilities.argmax(axis=1)
+            result_keys = self.target_encoder.classes_[self.model.classes_[best]]
+            confidences = probabilities[np.arange(len(best)), best]
+        
+        with stage('health.batch_format'):
+            for i, input_data, result_key, confidence in zip(valid_indices, valid_inputs, result_keys, confidences):
+                results[i] = {
+                    'index': i,
+                    'success': True,
+                    'data': self._format_result(input_data, result_key, float(confidence))
+                }
+        
+        return results
+    
+    def _predict_features(self, features):
+        """
+        Predict one encoded feature tuple, returns (result_key, confidence).
+        Forest hanya dijalankan sekali (predict_proba), label diambil dari
+        argmax probabilitas - sama dengan hasil model.predict.
+        """
+        if self.cache_size > 0:
+            with self._cache_lock:
+                cached = self._cache.get(features)
+                if cached is not None:
+                    self._cache.move_to_end(features)
+                    self._cache_hits += 1
+                    return cached
+                self._cache_misses += 1
+        
+        probabilities = self._predict_proba(np.array([features]))[0]
+        best = int(probabilities.argmax())
+        result = (
+            self.target_encoder.classes_[self.model.classes_[best]],
+            float(probabilities[best])
+        )
+        
+        if self.cache_size > 0:
+            with self._cache_lock:
+                self._cache[features] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        return result
+    
+    def clear_cache(self):
+        """Drop all cached predictions (dipanggil saat model berganti)"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def cache_stats(self):
+        """Cache counters for /api/model/status"""
+        with self._cache_lock:
+            return {
+                'enabled': self.cache_size > 0,
+                'max_size': self.cache_size,
+                'size': len(self._cache),
+                'hits': self._cache_hits,
+                'misses': self._cache_misses
+            }
+    
+    def _prepare_input(self, data):
+        """Fill missing fields with default values"""
+        return {
             'umur_bulan': data.get('umur_bulan', 12),
             'berat_kg': data.get('berat_kg', 100),
             'suhu_celcius': data.get('suhu_celcius', 38.5),
@@ -180,39 +397,46 @@ class HealthPredictor:
             'vaksinasi_lengkap': data.get('vaksinasi_lengkap', 'ya'),
             'jenis_hewan': data.get('jenis_hewan', 'sapi')
         }
-        
-        # Encode categorical variables
-        encoded_data = input_data.copy()
-        for col in ['nafsu_makan', 'aktivitas', 'riwayat_sakit', 'vaksinasi_lengkap', 'jenis_hewan']:
+    
+    def _validate_input(self, data):
+        """Validate a single record for batch prediction, raises ValueError"""
+        if not isinstance(data, dict):
+            raise ValueError('Record harus berupa object')
+        if 'jenis_hewan' not in data:
+            raise ValueError('Missing required field: jenis_hewan')
+        
+        input_data = self._prepare_input(data)
+        
+        for col in self.numeric_cols:
+            value = input_data[col]
+            if isinstance(value, bool):
+                raise ValueError(f'Field {col} harus berupa angka')
             try:
-                encoded_data[col] = self.label_encoders[col].transform([input_data[col]])[0]
-            except ValueError:
-                # Handle unknown categories
-                encoded_data[col] = 0
-        
-        # Create feature array
-        features = np.array([[
-            encoded_data['umur_bulan'],
-            encoded_data['berat_kg'],
-            encoded_data['suhu_celcius'],
-            encoded_data['nafsu_makan'],
-            encoded_data['aktivitas'],
-            encoded_data['riwayat_sakit'],
-            encoded_data['vaksinasi_lengkap'],
-            encoded_data['jenis_hewan']
-        ]])
+                number = float(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'Field {col} harus berupa angka')
+            if isinstance(value, str):
+                input_data[col] = number
         
-        # Predict
-        prediction = self.model.predict(features)[0]
-        probabilities = self.model.predict_proba(features)[0]
+        for col in self.categorical_cols:
+            if not isinstance(input_data[col], str):
+                raise ValueError(f'Field {col} harus berupa teks')
         
-        # Get result
-        result_key = self.target_encoder.inverse_transform([prediction])[0]
+        return input_data
+    
+    def _encode_column(self, col, values):
+        """Encode one categorical column for many rows"""
+        table = self.category_tables[col]
+        return np.fromiter(
+            (table.get(value, UNKNOWN_CATEGORY_CODE) for value in values),
+            dtype=np.int64,
+            count=len(values)
+        )
+    
+    def _format_result(self, input_data, result_key, confidence):
+        """Build the response dict for one prediction"""
         result_info = self.result_mapping.get(result_key, self.result_mapping['sehat'])
         
-        # Get confidence
-        confidence = float(max(probabilities))
-        
         # Identify risk factors
         risk_factors = self._identify_risk_factors(input_data)
         
@@ -255,6 +479,81 @@ class HealthPredictor:
         temp_std = history_df['temperature'].std()
         weight_recent = history_df.iloc[-1]['weight']
         
+        return self._apply_trends(basic_res, current_data, temp_mean, temp_std, weight_recent)
+
+    def predict_with_baseline(self, current_data, baseline):
+        """
+        Predict health status against a stored per-animal baseline (O(1))
+        Sama dengan predict_with_history, tetapi rerata/std suhu dan berat
+        terakhir diambil dari statistik berjalan (lihat animal_baselines.py)
+        sehingga client tidak perlu mengirim seluruh riwayat.
+        Args:
+            current_data: dict with current vitals
+            baseline: AnimalBaseline atau None
+        """
+        basic_res = self.predict(current_data)
+        
+        if baseline is None or baseline.readings < 2:
+            return basic_res
+        
+        return self._apply_trends(basic_res, current_data, baseline.temp_mean,
+                                  baseline.temp_std, baseline.last_weight)
+
+    def predict_many_with_history(self, records, histories=None):
+        """
+        Batch version of predict_with_history (many animals at once)
+        Prediksi dasar lewat predict_many, lalu baseline pribadi semua hewan
+        dihitung sekaligus oleh kernel NumPy di health_trends.py (riwayat
+        dipadatkan ke array datar + offsets, tanpa DataFrame per hewan).
+        
+        Args:
+            records: list of dicts (format sama dengan predict)
+            histories: list riwayat per record; None = ambil dari record['history']
+        
+        Returns:
+            list of dicts, format sama dengan predict_many
+        """
+        if histories is None:
+            histories = [r.get('history') if isinstance(r, dict) else None for r in records]
+        if len(histories) != len(records):
+            raise ValueError('Jumlah histories harus sama dengan jumlah records')
+        
+        results = self.predict_many(records)
+        
+        # Hanya hewan dengan prediksi sukses dan minimal 2 riwayat
+        selected = [
+            i for i, (result, history) in enumerate(zip(results, histories))
+            if result['success'] and isinstance(history, list) and len(history) >= 2
+        ]
+        if not selected:
+            return results
+        
+        with stage('health.batch_trends'):
+            temperatures, weights, offsets = health_trends.pack_histories([histories[i] for i in selected])
+            temp_mean, temp_std, weight_recent = health_trends.segment_baselines(temperatures, weights, offsets)
+            
+            current = [self._validate_input(records[i]) for i in selected]
+            current_temps = [row['suhu_celcius'] for row in current]
+            current_weights = [row['berat_kg'] for row in current]
+            temp_anomaly, weight_loss, loss_pct, trend_boost = health_trends.trend_scores(
+                np.asarray(current_temps, dtype=np.float64),
+                np.asarray(current_weights, dtype=np.float64),
+                temp_mean, temp_std, weight_recent
+            )
+        
+        with stage('health.batch_format'):
+            for j, i in enumerate(selected):
+                anomalies = []
+                if temp_anomaly[j]:
+                    anomalies.append(self._temperature_anomaly_message(current_temps[j], temp_mean[j]))
+                if weight_loss[j]:
+                    anomalies.append(self._weight_loss_message(loss_pct[j]))
+                self._merge_trends(results[i]['data'], anomalies, float(trend_boost[j]))
+        
+        return results
+
+    def _apply_trends(self, basic_res, current_data, temp_mean, temp_std, weight_recent):
+        """Anomali suhu (z-score) dan penurunan berat terhadap baseline pribadi"""
         # 3. Detect Anomalies (Data Mining Pattern)
         curr_temp = current_data.get('suhu_celcius', 38.5)
         curr_weight = current_data.get('berat_kg', 100)
@@ -265,16 +564,28 @@ class HealthPredictor:
         # Temperature Variance Check (Z-Score concept)
         if temp_std > 0:
             z_score = (curr_temp - temp_mean) / temp_std
-            if abs(z_score) > 2.0:
-                anomalies.append(f"Anomali Suhu: Penyimpangan signifikan dari baseline pribadi ({curr_temp}°C vs rerata {temp_mean:.1f}°C)")
-                trend_boost += 1.5
+            if abs(z_score) > health_trends.Z_SCORE_LIMIT:
+                anomalies.append(self._temperature_anomaly_message(curr_temp, temp_mean))
+                trend_boost += health_trends.TEMPERATURE_BOOST
 
         # Weight Trend Check (Weight Loss is a major red flag)
-        if weight_recent > curr_weight * 1.05: # >5% loss
+        if weight_recent > curr_weight * health_trends.WEIGHT_LOSS_RATIO: # >5% loss
             loss_pct = ((weight_recent - curr_weight) / weight_recent) * 100
-            anomalies.append(f"Penurun Berat Badan: Turun {loss_pct:.1f}% dari pemeriksaan terakhir")
-            trend_boost += 2.0
+            anomalies.append(self._weight_loss_message(loss_pct))
+            trend_boost += health_trends.WEIGHT_LOSS_BOOST
+
+        return self._merge_trends(basic_res, anomalies, trend_boost)
+
+    @staticmethod
+    def _temperature_anomaly_message(curr_temp, temp_mean):
+        return f"Anomali Suhu: Penyimpangan signifikan dari baseline pribadi ({curr_temp}°C vs rerata {temp_mean:.1f}°C)"
+
+    @staticmethod
+    def _weight_loss_message(loss_pct):
+        return f"Penurun Berat Badan: Turun {loss_pct:.1f}% dari pemeriksaan terakhir"
 
+    def _merge_trends(self, basic_res, anomalies, trend_boost):
+        """Tambahkan anomali ke hasil dan naikkan level risiko kalau trennya berat"""
         # 4. Integrate Trends into Result
         if trend_boost > 0:
             # Shift risk level if trends are alarming
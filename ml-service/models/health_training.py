@@ -0,0 +1,369 @@
+"""
+Health Training - training model kesehatan sebagai job background
+Training berjalan di proses terpisah sehingga worker HTTP tidak
+terblokir. Hasilnya disimpan sebagai versi baru, divalidasi, lalu
+diaktifkan dengan mengganti pointer CURRENT secara atomik (os.replace).
+Worker yang melayani prediksi memuat versi baru di thread background dan
+menukar instance HealthPredictor sekaligus (lihat ModelVersionWatcher),
+jadi request yang sedang berjalan tetap memakai model lama yang utuh.
+
+Struktur folder (default saved_models/health):
+- CURRENT                    : nama versi aktif
+- versions/<versi>/          : health_model.pkl, health_encoders.pkl, meta.json
+- jobs/<job_id>.json         : status + progress job (dibaca semua worker)
+- .train.lock                : satu job training dalam satu waktu
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: tanpa lock antar proses (cukup untuk mode single process)
+    fcntl = None
+
+# Progress kasar per tahap (0..1), urutan sesuai alur job
+STAGES = {
+    'queued': 0.0,
+    'loading_data': 0.05,
+    'fitting': 0.15,
+    'evaluating': 0.7,
+    'saving': 0.8,
+    'validating': 0.85,
+    'activating': 0.95,
+    'done': 1.0,
+}
+TERMINAL_STATUSES = ('succeeded', 'failed', 'rejected')
+
+
+def _write_json(path, data):
+    """Tulis JSON secara atomik (tmp + os.replace), pembaca tidak pernah melihat file setengah jadi"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class HealthModelStore:
+    """Folder artifact berversi + pointer versi aktif"""
+
+    def __init__(self, root):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+        self.jobs_dir = os.path.join(root, 'jobs')
+        self.current_path = os.path.join(root, 'CURRENT')
+        self.lock_path = os.path.join(root, '.train.lock')
+        os.makedirs(self.versions_dir, exist_ok=True)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    # ==================== VERSIONS ====================
+
+    def current_version(self):
+        try:
+            with open(self.current_path, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def current_dir(self):
+        """Folder versi aktif, None kalau belum pernah ada training berversi"""
+        version = self.current_version()
+        return self.version_dir(version) if version else None
+
+    def new_version(self, job_id):
+        version = f"{time.strftime('%Y%m%d-%H%M%S')}-{job_id[:8]}"
+        os.makedirs(self.version_dir(version))
+        return version
+
+    def activate(self, version):
+        """Jadikan versi ini aktif (pointer diganti atomik)"""
+        if not os.path.isdir(self.version_dir(version)):
+            raise ValueError(f"Versi {version} tidak ditemukan")
+        fd, tmp_path = tempfile.mkstemp(dir=self.root)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.replace(tmp_path, self.current_path)
+
+    def versions(self):
+        result = []
+        for version in sorted(os.listdir(self.versions_dir)):
+            meta_path = os.path.join(self.version_dir(version), 'meta.json')
+            meta = {}
+            if os.path.exists(meta_path):
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            result.append(dict(meta, version=version))
+        return result
+
+    def prune(self, keep):
+        """Hapus versi lama, sisakan `keep` terbaru (versi aktif tidak pernah dihapus)"""
+        current = self.current_version()
+        versions = sorted(os.listdir(self.versions_dir))
+        for version in versions[:max(0, len(versions) - keep)]:
+            if version != current:
+                shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+    # ==================== JOBS ====================
+
+    def job_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def read_job(self, job_id):
+        try:
+            with open(self.job_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def update_job(self, job_id, **fields):
+        job = self.read_job(job_id) or {'job_id': job_id, 'created_at': time.time()}
+        job.update(fields, updated_at=time.time())
+        if 'stage' in fields:
+            job['progress'] = STAGES.get(fields['stage'], job.get('progress', 0.0))
+        _write_json(self.job_path(job_id), job)
+        return job
+
+    def try_lock(self, job_id):
+        """Ambil lock training (non-blocking): file terkunci, atau None kalau job lain memegangnya"""
+        lock_file = open(self.lock_path, 'a+')
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                return None
+        lock_file.truncate(0)
+        lock_file.write(job_id)
+        lock_file.flush()
+        return lock_file
+
+    def running_job(self):
+        """Job yang sedang berjalan (lock training dipegang), atau None"""
+        if fcntl is None:
+            return None
+        with open(self.lock_path, 'a+') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.seek(0)
+                return lock_file.read().strip() or 'unknown'
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return None
+
+
+def run_training_job(root, job_id, data_path=None, min_accuracy=0.0, keep_versions=5, lock_fd=None):
+    """
+    Entry point proses training (python -m models.health_training run ...).
+    Train ke folder versi baru, validasi dengan memuat ulang artifact, lalu
+    aktifkan. Status dan progress ditulis ke jobs/<job_id>.json.
+    lock_fd: lock training yang sudah diambil proses induk (diwariskan);
+        None = ambil sendiri
+    """
+    import warnings
+    from models.health_predictor import HealthPredictor
+
+    warnings.filterwarnings('ignore')
+    store = HealthModelStore(root)
+
+    if lock_fd is not None:
+        lock_file = os.fdopen(lock_fd, 'a+')
+    else:
+        lock_file = store.try_lock(job_id)
+        if lock_file is None:
+            store.update_job(job_id, status='rejected', error='Training lain sedang berjalan')
+            return
+
+    try:
+        store.update_job(job_id, status='running', stage='queued', pid=os.getpid(), started_at=time.time())
+        version = store.new_version(job_id)
+        version_dir = store.version_dir(version)
+        store.update_job(job_id, version=version)
+
+        trainer = HealthPredictor(model_dir=version_dir)
+        accuracy = trainer.train(data_path, progress=lambda stage: store.update_job(job_id, stage=stage))
+
+        # Validasi: artifact dimuat ulang dari disk seperti di worker
+        store.update_job(job_id, stage='validating', accuracy=accuracy)
+        error = validate_version(version_dir, accuracy, min_accuracy, data_path)
+        meta = {
+            'job_id': job_id,
+            'accuracy': accuracy,
+            'data_path': data_path,
+            'created_at': time.time(),
+            'validated': error is None,
+        }
+        _write_json(os.path.join(version_dir, 'meta.json'), meta)
+        if error is not None:
+            store.update_job(job_id, status='rejected', stage='done', error=error)
+            return
+
+        store.update_job(job_id, stage='activating')
+        store.activate(version)
+        store.prune(keep_versions)
+        store.update_job(job_id, status='succeeded', stage='done', finished_at=time.time())
+    except Exception as e:
+        traceback.print_exc()
+        store.update_job(job_id, status='failed', error=str(e), finished_at=time.time())
+    finally:
+        # Menutup fd terakhir melepas lock
+        lock_file.close()
+
+
+def validate_version(version_dir, accuracy, min_accuracy, data_path=None):
+    """Return pesan error, atau None kalau versi layak diaktifkan"""
+    import numpy as np
+    import pandas as pd
+    from models.health_predictor import HealthPredictor
+
+    if accuracy < min_accuracy:
+        return f"Akurasi {accuracy:.2%} di bawah batas minimum {min_accuracy:.2%}"
+
+    candidate = HealthPredictor(use_compiled_forest=True, model_dir=version_dir)
+    if not candidate.load_model():
+        return "Artifact model tidak lengkap"
+
+    # Compiled forest harus sama dengan sklearn, dan batch scoring jalan
+    if data_path is None:
+        data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'health_training_data.csv')
+    records = pd.read_csv(data_path).drop(columns='hasil').head(500).to_dict('records')
+    results = candidate.predict_many(records)
+    failed = [r for r in results if not r['success']]
+    if failed:
+        return f"Prediksi gagal untuk {len(failed)} record: {failed[0]['error']}"
+
+    df = pd.DataFrame(records)
+    for col in candidate.categorical_cols:
+        df[col] = candidate._encode_column(col, df[col].tolist())
+    features = df[candidate.feature_cols].to_numpy(dtype=np.float64)
+    if not np.allclose(candidate.compiled_forest.predict_proba(features),
+                       candidate.model.predict_proba(features), atol=1e-9):
+        return "Compiled forest tidak sama dengan model sklearn"
+    return None
+
+
+class TrainingJobs:
+    """Memulai job training di proses terpisah dan membaca statusnya"""
+
+    def __init__(self, store, min_accuracy=0.0, keep_versions=5):
+        self.store = store
+        self.min_accuracy = min_accuracy
+        self.keep_versions = keep_versions
+
+    def start(self, data_path=None):
+        """Return (job, None) atau (None, job_id yang sedang berjalan)"""
+        job_id = uuid.uuid4().hex
+        # Lock diambil di sini lalu fd-nya diwariskan ke proses training,
+        # jadi dua request bersamaan tidak bisa memulai dua job
+        lock_file = self.store.try_lock(job_id)
+        if lock_file is None:
+            return None, self.store.running_job()
+
+        job = self.store.update_job(job_id, status='queued', stage='queued', data_path=data_path)
+        # Interpreter baru (bukan fork dari worker multi-thread), tanpa
+        # meng-import ulang app.py seperti multiprocessing spawn
+        command = [sys.executable, '-m', 'models.health_training', 'run', self.store.root, job_id,
+                   '--min-accuracy', str(self.min_accuracy), '--keep-versions', str(self.keep_versions)]
+        if data_path:
+            command += ['--data-path', data_path]
+        pass_fds = ()
+        if fcntl is not None:
+            command += ['--lock-fd', str(lock_file.fileno())]
+            pass_fds = (lock_file.fileno(),)
+        try:
+            process = subprocess.Popen(command, pass_fds=pass_fds,
+                                       cwd=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+        finally:
+            # Lock tetap dipegang oleh fd milik proses training
+            lock_file.close()
+        threading.Thread(target=self._reap, args=(process, job_id), daemon=True).start()
+        return job, None
+
+    def status(self, job_id):
+        return self.store.read_job(job_id)
+
+    def _reap(self, process, job_id):
+        """Tunggu proses selesai; tandai gagal kalau mati tanpa menulis status akhir"""
+        exit_code = process.wait()
+        job = self.store.read_job(job_id) or {}
+        if job.get('status') not in TERMINAL_STATUSES:
+            self.store.update_job(job_id, status='failed',
+                                  error=f"Proses training berhenti (exit code {exit_code})",
+                                  finished_at=time.time())
+
+
+class ModelVersionWatcher:
+    """
+    Cek pointer CURRENT paling sering setiap poll_seconds. Kalau berubah,
+    versi baru dimuat di thread background lalu on_swap(instance, version)
+    dipanggil; request tidak pernah menunggu loading.
+    """
+
+    def __init__(self, store, load, on_swap, poll_seconds=2.0, loaded_version=None):
+        self.store = store
+        self.load = load
+        self.on_swap = on_swap
+        self.poll_seconds = poll_seconds
+        self.loaded_version = loaded_version
+        self.last_error = None
+        # Versi yang gagal dimuat tidak dicoba ulang setiap poll
+        self._failed_version = None
+        self._next_check = 0.0
+        self._loading = threading.Lock()
+
+    def check(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.poll_seconds
+
+        version = self.store.current_version()
+        if version is None or version in (self.loaded_version, self._failed_version):
+            return
+        if not self._loading.acquire(blocking=False):
+            return
+        threading.Thread(target=self._swap, args=(version,), name='model-swap', daemon=True).start()
+
+    def _swap(self, version):
+        try:
+            instance = self.load(self.store.version_dir(version))
+            self.on_swap(instance, version)
+            self.loaded_version = version
+            self.last_error = None
+            print(f"INFO: Health model switched to version {version}")
+        except Exception as e:
+            self._failed_version = version
+            self.last_error = str(e)
+            print(f"ERROR: Failed to load health model {version}: {e}")
+        finally:
+            self._loading.release()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+    parser = argparse.ArgumentParser(description='Health model training job')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run_parser = sub.add_parser('run', help='jalankan satu job training (dipanggil oleh TrainingJobs)')
+    run_parser.add_argument('root')
+    run_parser.add_argument('job_id')
+    run_parser.add_argument('--data-path')
+    run_parser.add_argument('--min-accuracy', type=float, default=0.0)
+    run_parser.add_argument('--keep-versions', type=int, default=5)
+    run_parser.add_argument('--lock-fd', type=int)
+    args = parser.parse_args()
+
+    run_training_job(args.root, args.job_id, args.data_path, args.min_accuracy, args.keep_versions, args.lock_fd)
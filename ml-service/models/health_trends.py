@@ -0,0 +1,193 @@
+"""
+Health Trends - kernel NumPy untuk skor tren riwayat banyak hewan sekaligus
+Riwayat yang panjangnya berbeda-beda (ragged) dipadatkan menjadi array datar
++ offsets (seperti CSR), lalu rerata/std suhu per hewan dan berat terakhir
+dihitung untuk semua segmen sekaligus tanpa membuat DataFrame per hewan.
+
+Semantik mengikuti predict_with_history (pandas):
+- nilai yang tidak bisa diubah ke angka menjadi NaN (pd.to_numeric coerce)
+- rerata/std (ddof=1) hanya dari suhu yang valid
+- berat terakhir = berat baris terakhir riwayat (boleh NaN)
+- jumlah per segmen memakai np.add.reduceat (berurutan), sedangkan pandas
+  menjumlah pairwise: hasilnya bisa beda beberapa ulp, jadi rerata yang
+  dibulatkan di pesan anomali bisa beda 0.1 pada kasus batas
+"""
+
+import math
+
+import numpy as np
+
+try:
+    from .animal_baselines import to_float
+except ImportError:
+    # Dijalankan langsung sebagai script (python models/health_trends.py)
+    from animal_baselines import to_float
+
+# Ambang yang sama dengan HealthPredictor._apply_trends
+Z_SCORE_LIMIT = 2.0
+WEIGHT_LOSS_RATIO = 1.05
+TEMPERATURE_BOOST = 1.5
+WEIGHT_LOSS_BOOST = 2.0
+
+
+def _field(record, key):
+    value = to_float(record.get(key)) if isinstance(record, dict) else None
+    return math.nan if value is None else value
+
+
+def pack_histories(histories):
+    """
+    Padatkan list riwayat menjadi (temperatures, weights, offsets).
+    Riwayat ke-i ada di [offsets[i], offsets[i + 1]).
+    """
+    lengths = np.fromiter((len(h) for h in histories), dtype=np.int64, count=len(histories))
+    offsets = np.zeros(len(histories) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    total = int(offsets[-1])
+
+    temperatures = np.fromiter(
+        (_field(record, 'temperature') for history in histories for record in history),
+        dtype=np.float64, count=total
+    )
+    weights = np.fromiter(
+        (_field(record, 'weight') for history in histories for record in history),
+        dtype=np.float64, count=total
+    )
+    return temperatures, weights, offsets
+
+
+def segment_sums(values, offsets):
+    """Jumlah per segmen [offsets[i], offsets[i + 1]); segmen kosong = 0.0"""
+    lengths = np.diff(offsets)
+    sums = np.zeros(len(lengths), dtype=np.float64)
+    non_empty = lengths > 0
+    if non_empty.any():
+        # Segmen kosong dilewati: awal segmen berikutnya tetap jadi batasnya
+        sums[non_empty] = np.add.reduceat(values, offsets[:-1][non_empty])
+    return sums
+
+
+def segment_baselines(temperatures, weights, offsets):
+    """
+    Baseline pribadi per segmen: (temp_mean, temp_std, weight_recent).
+    Semua segmen harus berisi minimal satu baris (reduceat tidak
+    menangani segmen kosong).
+    """
+    lengths = np.diff(offsets)
+
+    valid = ~np.isnan(temperatures)
+    counts = np.add.reduceat(valid.astype(np.int64), offsets[:-1])
+    # Seperti nanops pandas: NaN diisi 0 di tempat, lalu dijumlah
+    filled = np.where(valid, temperatures, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        temp_mean = segment_sums(filled, offsets) / counts
+        temp_mean[counts == 0] = np.nan
+
+        # Dua lintasan (jumlah kuadrat deviasi dari rerata), ddof=1
+        deviation = np.where(valid, temperatures - np.repeat(temp_mean, lengths), 0.0)
+        squares = segment_sums(deviation * deviation, offsets)
+        temp_std = np.sqrt(squares / (counts - 1))
+        temp_std[counts < 2] = np.nan
+
+    weight_recent = weights[offsets[1:] - 1]
+    return temp_mean, temp_std, weight_recent
+
+
+def trend_scores(current_temperatures, current_weights, temp_mean, temp_std, weight_recent):
+    """
+    Anomali suhu (z-score) dan penurunan berat untuk semua hewan sekaligus.
+    Returns: (temperature_anomaly, weight_loss, loss_pct, trend_boost)
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z_score = (current_temperatures - temp_mean) / temp_std
+        # temp_std NaN/0 -> tidak dicek, sama dengan "if temp_std > 0"
+        temperature_anomaly = (temp_std > 0) & (np.abs(z_score) > Z_SCORE_LIMIT)
+
+        weight_loss = weight_recent > current_weights * WEIGHT_LOSS_RATIO
+        loss_pct = ((weight_recent - current_weights) / weight_recent) * 100
+
+    trend_boost = temperature_anomaly * TEMPERATURE_BOOST + weight_loss * WEIGHT_LOSS_BOOST
+    return temperature_anomaly, weight_loss, loss_pct, trend_boost
+
+
+# Parity check: kernel batch vs predict_with_history (pandas) per hewan
+if __name__ == "__main__":
+    import os
+    import re
+    import sys
+    import time
+    import warnings
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from models.health_predictor import HealthPredictor
+
+    def split_mean(factors):
+        """Pisahkan angka 'rerata X°C' dari pesan (jumlah pairwise vs berurutan, bisa beda 0.1)"""
+        means = [float(m) for f in factors for m in re.findall(r'rerata (-?[\d.]+)', f)]
+        return sorted(re.sub(r'rerata -?[\d.]+', 'rerata _', f) for f in factors), means
+
+    warnings.filterwarnings('ignore')
+    predictor = HealthPredictor(use_compiled_forest=True)
+    if not predictor.load_model():
+        predictor.train()
+
+    rng = np.random.default_rng(11)
+    records, histories = [], []
+    for animal in range(3000):
+        base_temp, base_weight = rng.normal(38.8, 0.4), rng.uniform(20, 400)
+        history = []
+        # Sebagian kecil riwayat panjang (ratusan baris)
+        for step in range(int(rng.integers(0, 60 if rng.random() > 0.02 else 400))):
+            record = {
+                'temperature': round(float(base_temp + rng.normal(0, 0.3 if rng.random() > 0.1 else 1.5)), 1),
+                'weight': round(float(base_weight * (1 + rng.normal(0, 0.02))), 1),
+            }
+            # Data lapangan: string angka, nilai kosong/tidak valid
+            if rng.random() < 0.05:
+                record['temperature'] = rng.choice(['n/a', None, str(record['temperature'])])
+            if rng.random() < 0.05:
+                record['weight'] = rng.choice([None, '', str(record['weight'])])
+            history.append(record)
+        records.append({
+            'jenis_hewan': str(rng.choice(['sapi', 'kambing', 'ayam'])),
+            'umur_bulan': int(rng.integers(1, 120)),
+            'suhu_celcius': round(float(base_temp + rng.normal(0, 0.8)), 1),
+            'berat_kg': round(float(base_weight * (1 - (0.1 if rng.random() < 0.15 else 0.0))), 1),
+            'nafsu_makan': str(rng.choice(['normal', 'menurun'])),
+        })
+        histories.append(history)
+
+    started = time.perf_counter()
+    expected = [predictor.predict_with_history(r, h) for r, h in zip(records, histories)]
+    per_animal = time.perf_counter() - started
+
+    started = time.perf_counter()
+    actual = predictor.predict_many_with_history(records, histories)
+    batched = time.perf_counter() - started
+
+    mismatches = 0
+    for exp, act in zip(expected, actual):
+        act = act['data']
+        for key in ('status', 'status_key', 'risk_score', 'color', 'has_historical_context'):
+            if exp.get(key) != act.get(key):
+                mismatches += 1
+        if sorted(exp['recommendations']) != sorted(act['recommendations']):
+            mismatches += 1
+        expected_factors, expected_means = split_mean(exp['risk_factors'])
+        actual_factors, actual_means = split_mean(act['risk_factors'])
+        if expected_factors != actual_factors or not np.allclose(expected_means, actual_means, rtol=0, atol=0.1 + 1e-9):
+            mismatches += 1
+
+    print(f"Animals: {len(records)}, history rows: {sum(len(h) for h in histories)}")
+    print(f"predict_with_history loop:  {per_animal * 1e3:8.1f} ms")
+    print(f"predict_many_with_history:  {batched * 1e3:8.1f} ms")
+    # Kernel: reduceat vs ndarray.sum per segmen (toleransi pembulatan float)
+    temperatures, weights, offsets = pack_histories([h for h in histories if h])
+    expected_sums = [temperatures[a:b].sum() for a, b in zip(offsets[:-1], offsets[1:])]
+    assert np.allclose(segment_sums(temperatures, offsets), expected_sums, equal_nan=True)
+    assert np.array_equal(segment_sums(np.ones(3), np.array([0, 0, 2, 2, 3])), [0.0, 2.0, 0.0, 1.0])
+
+    print(f"Mismatches: {mismatches}")
+    assert mismatches == 0, "Kernel tren tidak sama dengan predict_with_history"
+    print("OK")
@@ -0,0 +1,361 @@
+"""
+Image Executor - analisis gambar CPU-bound di proses worker lewat shared memory
+Thread request yang memanggil analyze_features / analyze saling menunggu
+GIL di bagian Python murni. Mem-pickle array hasil decode (12MP = 36MB) ke
+ProcessPoolExecutor biasa justru lebih mahal dari analisisnya, jadi:
+
+- Beberapa blok multiprocessing.shared_memory dibuat sekali di awal dan
+  dipakai ulang (free list). Array gambar disalin ke satu blok, yang
+  dikirim ke worker hanya (nama tugas, indeks blok, shape, dtype).
+- Worker (proses hangat, model sudah dimuat di initializer) membuat view
+  ndarray di atas blok tanpa menyalin, lalu mengembalikan dict kecil.
+- Blok kembali ke free list saat hasil datang. Kalau semua blok terpakai,
+  submit menunggu paling lama acquire_timeout lalu melempar ExecutorBusy
+  (backpressure: antrean kerja CPU tidak tumbuh tanpa batas).
+
+Thread request hanya menunggu future (tanpa GIL), jadi tetap bebas
+melayani I/O seperti Google Vision dan upload.
+
+Foto multi-gambar (/api/predict/disease/multi) memakai pool yang sama
+lewat submit_bytes: yang dikirim bytes terkompresi apa adanya (kecil,
+pickle lebih murah dari satu blok), decode terjadi di worker.
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    from .disease_detector import DiseaseDetector
+    from .image_pipeline import DecodedImage
+    from .product_analyzer import ProductAnalyzer
+except ImportError:
+    # Dijalankan langsung sebagai script (python models/image_executor.py)
+    from disease_detector import DiseaseDetector
+    from image_pipeline import DecodedImage
+    from product_analyzer import ProductAnalyzer
+
+
+class ExecutorBusy(Exception):
+    """Semua blok shared memory sedang dipakai (antrean penuh)"""
+
+
+# ==================== WORKER ====================
+
+# Milik proses worker (diisi _init_worker)
+_blocks = []
+_models = {}
+
+
+def _init_worker(block_names, settings):
+    _blocks[:] = [shared_memory.SharedMemory(name=name) for name in block_names]
+    _models['disease_detector'] = DiseaseDetector(grid_size=settings.get('disease_grid', 10))
+    # Tanpa thread fetch: worker hanya menjalankan analyze()
+    _models['product_analyzer'] = ProductAnalyzer(
+        fetch_workers=1,
+        default_tier=settings.get('product_tier', 'accurate')
+    )
+
+
+def _ping():
+    return os.getpid()
+
+
+def _disease_features(array, original_size=None):
+    image = DecodedImage(None, array, original_size)
+    return _models['disease_detector'].analyze_features(image)
+
+
+def _product_analyze(array, tier=None):
+    return _models['product_analyzer'].analyze(array, tier)
+
+
+def _disease_bytes(image_bytes):
+    """Decode + grid scan satu foto terkompresi"""
+    detector = _models['disease_detector']
+    image = detector.preprocess_image(image_bytes)
+    return {
+        'scores': detector.analyze_features(image),
+        'original_size': image.original_size,
+    }
+
+
+TASKS = {
+    'disease.analyze_features': _disease_features,
+    'product.analyze': _product_analyze,
+}
+
+# Tugas dengan input bytes terkompresi (tanpa blok shared memory)
+BYTES_TASKS = {
+    'disease.analyze_bytes': _disease_bytes,
+}
+
+
+def _run_task(task, block_index, shape, dtype, kwargs):
+    """Jalankan satu tugas di atas view blok (tanpa salinan)"""
+    count = int(np.prod(shape))
+    array = np.ndarray(shape, dtype=dtype, buffer=_blocks[block_index].buf[:count * np.dtype(dtype).itemsize])
+    try:
+        return TASKS[task](array, **kwargs)
+    finally:
+        # Tidak ada view yang boleh tersisa setelah blok dikembalikan
+        del array
+
+
+def _run_bytes_task(task, data, kwargs):
+    return BYTES_TASKS[task](data, **kwargs)
+
+
+# ==================== PARENT ====================
+
+class SharedMemoryExecutor:
+    """
+    Process pool with preloaded models fed through recycled shared memory blocks.
+    Milik satu proses; kalau PID berubah (gunicorn preload + fork) blok dan
+    pool dibuat ulang milik proses baru. Di Gunicorn executor dijalankan di
+    post_fork (lihat wsgi.py), sebelum worker punya thread lain.
+
+    processes: per pemakai; setiap worker Gunicorn punya executor sendiri,
+    jadi default kecil (1) supaya total proses tidak menjadi core x worker.
+    """
+
+    # Pemanggil bisa menangkap executor.Busy tanpa meng-import modul ini
+    Busy = ExecutorBusy
+
+    def __init__(self, processes=1, blocks=None, block_bytes=40 * 1024 * 1024,
+                 acquire_timeout=5.0, settings=None):
+        self.processes = max(1, processes or 1)
+        self.block_count = max(1, blocks or 2 * self.processes)
+        self.block_bytes = block_bytes
+        self.acquire_timeout = acquire_timeout
+        self.settings = dict(settings or {})
+
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pid = None
+        self._executor = None
+        self._blocks = []
+        self._free = None
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'busy': 0, 'restarts': 0}
+
+    # ---------- lifecycle ----------
+
+    def _context(self):
+        # fork: worker tidak meng-import ulang modul __main__ (app.py)
+        if 'fork' in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context('fork')
+        return multiprocessing.get_context('spawn')
+
+    def _ensure_started(self):
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    # Blok milik proses induk (sebelum fork) tidak disentuh
+                    self._blocks = [shared_memory.SharedMemory(create=True, size=self.block_bytes)
+                                    for _ in range(self.block_count)]
+                    self._free = queue.Queue()
+                    for index in range(self.block_count):
+                        self._free.put(index)
+                    atexit.register(self.shutdown)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=self._context(),
+                    initializer=_init_worker,
+                    initargs=([block.name for block in self._blocks], self.settings)
+                )
+                self._pid = os.getpid()
+        return self._executor
+
+    def start(self):
+        """Buat blok dan jalankan semua worker sekarang (warm-up)"""
+        executor = self._ensure_started()
+        for future in [executor.submit(_ping) for _ in range(self.processes)]:
+            future.result()
+        return self
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                for block in self._blocks:
+                    block.close()
+                    block.unlink()
+            self._executor = None
+            self._blocks = []
+            self._pid = None
+
+    # ---------- submit ----------
+
+    def fits(self, array):
+        return array.nbytes <= self.block_bytes
+
+    def submit(self, task, array, **kwargs):
+        """
+        Salin array ke blok bebas lalu jalankan TASKS[task](array, **kwargs) di worker.
+        Raises ExecutorBusy kalau tidak ada blok bebas dalam acquire_timeout,
+        ValueError kalau array lebih besar dari satu blok (pakai fits()).
+        """
+        if task not in TASKS:
+            raise ValueError(f"Tugas tidak dikenal: {task}")
+        if not self.fits(array):
+            raise ValueError(f"Array {array.nbytes} bytes melebihi blok {self.block_bytes} bytes")
+
+        self._ensure_started()
+        try:
+            index = self._free.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            self._count('busy')
+            raise ExecutorBusy(f"Semua {self.block_count} blok shared memory sedang dipakai")
+
+        try:
+            array = np.ascontiguousarray(array)
+            target = np.ndarray(array.shape, dtype=array.dtype, buffer=self._blocks[index].buf[:array.nbytes])
+            target[...] = array
+            del target
+            future = self._submit(_run_task, task, index, array.shape, array.dtype.str, kwargs)
+        except BaseException:
+            self._free.put(index)
+            raise
+
+        future.add_done_callback(lambda f, index=index: self._release(f, index))
+        return future
+
+    def submit_bytes(self, task, data, **kwargs):
+        """Jalankan BYTES_TASKS[task](data, **kwargs) di worker; data dikirim lewat pickle"""
+        if task not in BYTES_TASKS:
+            raise ValueError(f"Tugas tidak dikenal: {task}")
+        # mmap upload tidak bisa di-pickle; bytes juga aman setelah request ditutup
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        future = self._submit(_run_bytes_task, task, data, kwargs)
+        future.add_done_callback(self._finished)
+        return future
+
+    def run(self, task, array, timeout=None, **kwargs):
+        """submit + tunggu hasil"""
+        return self.submit(task, array, **kwargs).result(timeout=timeout)
+
+    def _submit(self, fn, *args):
+        executor = self._ensure_started()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            future = self._restart(executor).submit(fn, *args)
+        self._count('submitted')
+        return future
+
+    def _finished(self, future):
+        self._count('failed' if future.cancelled() or future.exception() else 'completed')
+
+    def _release(self, future, index):
+        # Worker sudah selesai membaca blok (atau gagal): blok bisa dipakai lagi
+        self._finished(future)
+        self._free.put(index)
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=self._context(),
+                    initializer=_init_worker,
+                    initargs=([block.name for block in self._blocks], self.settings)
+                )
+                self._count('restarts')
+            return self._executor
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        running = self._executor is not None and self._pid == os.getpid()
+        return dict(
+            self._stats,
+            processes=self.processes,
+            running=running,
+            blocks=self.block_count,
+            block_bytes=self.block_bytes,
+            blocks_free=self._free.qsize() if running else self.block_count
+        )
+
+
+# Parity check: hasil worker sama dengan analisis di thread ini
+if __name__ == "__main__":
+    import io
+    import time
+    import warnings
+    from concurrent.futures import as_completed
+
+    from PIL import Image
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(9)
+    detector = DiseaseDetector()
+    analyzer = ProductAnalyzer()
+
+    images = []
+    for i in range(6):
+        array = np.clip(rng.normal((150, 120, 90), 12, (1536, 2048, 3)), 0, 255).astype(np.uint8)
+        for _ in range(int(rng.integers(0, 30))):
+            y, x = int(rng.integers(0, 1400)), int(rng.integers(0, 1900))
+            array[y:y + 120, x:x + 120] = (200, 30, 30)
+        images.append(array)
+    decoded = [DecodedImage(None, np.asarray(Image.fromarray(a).resize((200, 200))), a.shape[1::-1])
+               for a in images]
+
+    executor = SharedMemoryExecutor(processes=2, blocks=2).start()
+    mismatches = 0
+    started = time.perf_counter()
+    for image in decoded:
+        expected = detector.analyze_features(DecodedImage(None, image.rgb, image.original_size))
+        actual = executor.run('disease.analyze_features', image.rgb, original_size=image.original_size)
+        mismatches += expected != actual
+    for array in images:
+        for tier in ProductAnalyzer.TIERS:
+            expected = analyzer.analyze(array, tier)
+            actual = executor.run('product.analyze', array, tier=tier)
+            mismatches += expected != actual
+
+    # Foto terkompresi (multi-gambar): decode + grid scan di worker
+    encoded = []
+    for array in images:
+        buf = io.BytesIO()
+        Image.fromarray(array).save(buf, format='JPEG', quality=90)
+        encoded.append(buf.getvalue())
+    futures = {executor.submit_bytes('disease.analyze_bytes', data): i for i, data in enumerate(encoded)}
+    for future in as_completed(futures):
+        expected = detector.analyze_features(detector.preprocess_image(encoded[futures[future]]))
+        mismatches += future.result()['scores'] != expected
+    bad = executor.submit_bytes('disease.analyze_bytes', b'garbage')
+    bad_failed = bad.exception() is not None
+
+    # Backpressure: blok habis -> ExecutorBusy, lalu pulih setelah hasil datang
+    executor.acquire_timeout = 0.01
+    futures, busy = [], 0
+    for array in images:
+        try:
+            futures.append(executor.submit('product.analyze', array, tier='accurate'))
+        except ExecutorBusy:
+            busy += 1
+    for future in futures:
+        future.result()
+    stats = executor.stats()
+    executor.shutdown()
+
+    print(f"Checked in {time.perf_counter() - started:.2f}s, mismatches: {mismatches}")
+    print(f"Busy rejections: {busy}, stats: {stats}")
+    assert mismatches == 0, "Hasil worker tidak sama dengan analisis langsung"
+    assert busy > 0 and stats['blocks_free'] == stats['blocks'], "Backpressure / recycling blok tidak bekerja"
+    assert bad_failed, "Gambar rusak harus gagal di future, bukan mematikan worker"
+    print("OK")
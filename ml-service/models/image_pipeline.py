@@ -0,0 +1,250 @@
+"""
+Image Pipeline - decode gambar sekali untuk semua tahap analisis
+Gambar dari request (bytes / base64 / data URI) di-decode satu kali,
+langsung ke resolusi analisis memakai decoding tereduksi JPEG
+(Image.draft) dan Image.reduce, lalu dikonversi ke HSV float32 sekali.
+"""
+
+import base64
+import binascii
+import io
+import mmap
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+try:
+    from skimage import color
+    SKIMAGE_AVAILABLE = True
+except ImportError:
+    SKIMAGE_AVAILABLE = False
+
+try:
+    from utils.metrics import stage
+except ImportError:
+    # Tanpa paket utils (script langsung): instrumentasi no-op
+    from contextlib import nullcontext as stage
+
+
+def image_bytes_from(image_data):
+    """
+    Normalize request image payload to raw encoded bytes.
+    Menerima: bytes, mmap (upload biner, lihat utils.uploads), data URI
+    ('data:image/jpeg;base64,...'), string base64 polos, atau file-like object.
+    """
+    if isinstance(image_data, (bytes, mmap.mmap)):
+        return image_data
+
+    if isinstance(image_data, (bytearray, memoryview)):
+        return bytes(image_data)
+
+    if hasattr(image_data, 'read'):
+        return image_data.read()
+
+    if isinstance(image_data, str):
+        if image_data.startswith('data:'):
+            image_data = image_data.split(',', 1)[1]
+        try:
+            return base64.b64decode(image_data)
+        except (binascii.Error, ValueError):
+            raise ValueError('Data gambar base64 tidak valid')
+
+    raise ValueError('Format data gambar tidak dikenali')
+
+
+class _BufferReader(io.RawIOBase):
+    """
+    Read-only file view over a buffer (mmap) without copying it.
+    Seek di luar ukuran buffer diperbolehkan seperti BytesIO (mmap.seek
+    melempar ValueError, yang mengganggu deteksi format di PIL).
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError('negative seek position')
+        self._pos = offset
+        return self._pos
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+def open_image(image_bytes):
+    """PIL Image dari bytes / mmap tanpa menyalin buffer"""
+    if isinstance(image_bytes, mmap.mmap):
+        return Image.open(_BufferReader(image_bytes))
+    return Image.open(io.BytesIO(image_bytes))
+
+
+def decode_rgb(image_bytes, size):
+    """
+    Decode encoded image bytes straight to an RGB uint8 array of (size, size).
+    Untuk JPEG besar, draft() membuat decoder hanya menghasilkan skala
+    1/2, 1/4 atau 1/8 sehingga foto 12MP tidak pernah di-decode penuh.
+    """
+    with stage('image.decode'):
+        img = open_image(image_bytes)
+        original_size = img.size
+
+        # JPEG: decode tereduksi, tetap >= ukuran target
+        img.draft('RGB', (size, size))
+        img.load()
+
+    with stage('image.resize'):
+        return _resize_rgb(img, size), original_size
+
+
+def decode_frames(image_bytes, size):
+    """
+    Decode the frames of a multi-frame container (GIF, TIFF, MPO burst
+    kamera, WebP/PNG animasi) one at a time to RGB uint8 (size, size).
+    Generator: frame berikutnya baru di-decode kalau diminta, jadi
+    pemanggil yang berhenti lebih awal tidak membayar frame sisanya.
+    Gambar biasa menghasilkan satu frame (dengan decode tereduksi JPEG).
+    """
+    img = open_image(image_bytes)
+    original_size = img.size
+    if not getattr(img, 'is_animated', False):
+        yield decode_rgb(image_bytes, size)
+        return
+
+    for frame in ImageSequence.Iterator(img):
+        with stage('image.decode'):
+            frame.load()
+        with stage('image.resize'):
+            yield _resize_rgb(frame, size), original_size
+
+
+def _resize_rgb(img, size):
+    """PIL Image yang sudah di-load -> RGB uint8 (size, size)"""
+    # reduce() hanya menerima mode piksel langsung: palet (P, GIF/PNG),
+    # CMYK, 1, I;16, dll dikonversi dulu
+    if img.mode not in ('RGB', 'L', 'RGBA'):
+        img = img.convert('RGB')
+
+    # Format lain (PNG, dll): kecilkan dengan faktor bulat (box filter, murah)
+    factor = min(img.size[0] // (size * 2), img.size[1] // (size * 2))
+    if factor >= 2:
+        img = img.reduce(factor)
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    img = img.resize((size, size), Image.BILINEAR)
+    return np.asarray(img)
+
+
+class DecodedImage:
+    """
+    One decoded request image, shared across analysis steps.
+    - raw_bytes: bytes asli (untuk Google Vision)
+    - rgb: uint8 (size, size, 3)
+    - hsv: float32 (size, size, 3), dihitung sekali saat pertama dipakai
+    """
+
+    def __init__(self, raw_bytes, rgb, original_size=None):
+        self.raw_bytes = raw_bytes
+        self.rgb = rgb
+        self.original_size = original_size
+        self._rgb_float = None
+        self._hsv = None
+
+    @classmethod
+    def from_request_data(cls, image_data, size):
+        raw_bytes = image_bytes_from(image_data)
+        rgb, original_size = decode_rgb(raw_bytes, size)
+        return cls(raw_bytes, rgb, original_size)
+
+    @classmethod
+    def frames_from_request_data(cls, image_data, size):
+        """Generator DecodedImage per frame (lihat decode_frames)"""
+        raw_bytes = image_bytes_from(image_data)
+        for rgb, original_size in decode_frames(raw_bytes, size):
+            yield cls(raw_bytes, rgb, original_size)
+
+    @property
+    def size(self):
+        return self.rgb.shape[0]
+
+    @property
+    def rgb_float(self):
+        """RGB in [0, 1] as float32"""
+        if self._rgb_float is None:
+            self._rgb_float = self.rgb.astype(np.float32) / np.float32(255.0)
+        return self._rgb_float
+
+    @property
+    def hsv(self):
+        if self._hsv is None:
+            self._hsv = color.rgb2hsv(self.rgb_float).astype(np.float32, copy=False)
+        return self._hsv
+
+
+# Parity check: decode tereduksi vs decode penuh + resize, untuk semua mode
+if __name__ == "__main__":
+    SIZE = 200
+    rng = np.random.default_rng(8)
+    base = np.clip(rng.normal((150, 120, 90), 25, (90, 120, 3)), 0, 255).astype(np.uint8)
+    photo = Image.fromarray(base).resize((1200, 900), Image.BILINEAR)
+
+    def encode(img, fmt, **kwargs):
+        buf = io.BytesIO()
+        img.save(buf, format=fmt, **kwargs)
+        return buf.getvalue()
+
+    def reference(img):
+        return np.asarray(img.convert('RGB').resize((SIZE, SIZE), Image.BILINEAR)).astype(np.int16)
+
+    cases = {
+        'JPEG RGB': (photo, encode(photo, 'JPEG', quality=95)),
+        'PNG RGB': (photo, encode(photo, 'PNG')),
+        'PNG L': (photo.convert('L'), encode(photo.convert('L'), 'PNG')),
+        'PNG RGBA': (photo.convert('RGBA'), encode(photo.convert('RGBA'), 'PNG')),
+        'PNG P': (photo.quantize(64), encode(photo.quantize(64), 'PNG')),
+        'GIF P': (photo.quantize(64), encode(photo.quantize(64), 'GIF')),
+        'TIFF CMYK': (photo.convert('CMYK'), encode(photo.convert('CMYK'), 'TIFF')),
+    }
+    failures = 0
+    for name, (img, data) in cases.items():
+        rgb, original_size = decode_rgb(data, SIZE)
+        diff = np.abs(rgb.astype(np.int16) - reference(img)).mean()
+        ok = rgb.shape == (SIZE, SIZE, 3) and original_size == (1200, 900) and diff < 6
+        failures += not ok
+        print(f"{name:<10} mean abs diff {diff:5.2f}  {'ok' if ok else 'FAIL'}")
+
+    # GIF animasi (frame palet) lewat decode_frames
+    frames = [photo.quantize(64), Image.fromarray(255 - np.asarray(photo)).quantize(64)]
+    data = encode(frames[0], 'GIF', save_all=True, append_images=frames[1:], duration=100)
+    decoded = list(decode_frames(data, SIZE))
+    diffs = [np.abs(rgb.astype(np.int16) - reference(frame)).mean() for (rgb, _), frame in zip(decoded, frames)]
+    ok = len(decoded) == 2 and all(diff < 6 for diff in diffs)
+    failures += not ok
+    print(f"{'GIF anim':<10} frames {len(decoded)}, mean abs diff {max(diffs):5.2f}  {'ok' if ok else 'FAIL'}")
+
+    assert failures == 0, f"{failures} mode gagal"
+    print("OK")
@@ -5,124 +5,294 @@ from io import BytesIO
 from skimage import color, feature
 from skimage.transform import resize, hough_line, hough_line_peaks
 from skimage.feature import canny
+from skimage.filters import sobel_h, sobel_v
 from skimage.measure import shannon_entropy
 from skimage.color import rgb2gray, rgb2hsv
 import urllib3
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+
+try:
+    from utils.metrics import stage
+except ImportError:
+    # Tanpa paket utils (script langsung): instrumentasi no-op
+    from contextlib import nullcontext as stage
 
 # Suppress SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 class ProductAnalyzer:
-    def __init__(self):
-        pass
+    # Versi logika analisis, bagian dari key cache hasil.
+    # Naikkan setiap kali aturan matching/kategori diubah.
+    MODEL_VERSION = 'cv-hist-1'
+
+    # Layout feature vector: histogram HSV (8+4+4) lalu thumbnail 32x32x3
+    HIST_LEN = 16
+    THUMB_SIZE = 32
+    FEATURE_DIM = HIST_LEN + THUMB_SIZE * THUMB_SIZE * 3
+
+    # Tier analisis lokal (analyze): resolusi kerja, pra-resize PIL, deteksi garis
+    # - accurate: logika asli (resize skimage 200x200, Hough 360 sudut)
+    # - balanced: pra-resize box filter PIL, Hough 180 sudut
+    # - fast: 96x96, histogram orientasi gradien sebagai pengganti Hough
+    # Kesepakatan dengan accurate diukur di benchmarks/bench_product_tiers.py
+    TIERS = {
+        'fast': {'size': 96, 'prescale': 2, 'lines': 'orientation'},
+        'balanced': {'size': 200, 'prescale': 2, 'lines': 'hough', 'angles': 180},
+        'accurate': {'size': 200, 'prescale': None, 'lines': 'hough', 'angles': 360},
+    }
+    ORIENTATION_BINS = 36
+    # Tepi minimal (fraksi piksel) sebelum orientasi dianggap bermakna
+    MIN_EDGE_FRACTION = 0.005
+
+    def __init__(self, fetch_workers=8, fetch_timeout=5.0, match_deadline=10.0, default_tier='accurate'):
+        if default_tier not in self.TIERS:
+            raise ValueError(f"Tier tidak dikenal: {default_tier}")
+        self.model_version = self.MODEL_VERSION
+        self.default_tier = default_tier
+
+        # Download kandidat: session keep-alive + thread pool terbatas,
+        # dengan batas waktu total per find_matches
+        self.fetch_workers = fetch_workers
+        self.fetch_timeout = fetch_timeout
+        self.match_deadline = match_deadline
+
+        # Dibuat lazy (di worker, bukan di proses induk sebelum fork)
+        self._session = None
+        self._executor = None
+        self._init_lock = threading.Lock()
 
-    def find_matches(self, query_img_array, candidates):
+    def find_matches(self, query_img_array, candidates=None, index=None, ann=None, nprobe=None):
         """
         Mencari produk yang mirip secara visual.
+        
+        Args:
+            query_img_array: gambar query (RGB array)
+            candidates: list {'id', 'image_url'}; None = seluruh index
+            index: ProductFeatureIndex opsional. Kandidat yang sudah ada di
+                index dinilai sekaligus (vectorized) tanpa download.
+            ann: ProductANN opsional untuk pencarian seluruh index; hanya
+                shortlist dari `nprobe` cluster terdekat yang dinilai exact.
         """
-        logging.info(f"Start finding matches for {len(candidates)} candidates")
-
-        # Helper: Generate Histogram
-        def get_histogram(img_arr):
-            try:
-                # Resize
-                img_small = resize(img_arr, (64, 64), anti_aliasing=True)
-                if img_small.shape[-1] == 4: img_small = img_small[:,:,:3] # Remove Alpha
-                img_hsv = rgb2hsv(img_small)
-                
-                h_hist, _ = np.histogram(img_hsv[:,:,0], bins=8, range=(0, 1))
-                s_hist, _ = np.histogram(img_hsv[:,:,1], bins=4, range=(0, 1))
-                v_hist, _ = np.histogram(img_hsv[:,:,2], bins=4, range=(0, 1))
-                
-                hist = np.concatenate([h_hist, s_hist, v_hist]).astype(np.float32)
-                hist = hist / (hist.sum() + 1e-5)
-                return hist
-            except Exception as e:
-                logging.error(f"Hist Error: {e}")
-                return None
+        logging.info(f"Start finding matches for {len(candidates) if candidates is not None else 'all indexed'} candidates")
 
         # 1. Proses Query Image
-        query_hist = get_histogram(query_img_array)
-        if query_hist is None: return []
+        with stage('product.features'):
+            query_vec = self.extract_features(query_img_array)
+        if query_vec is None: return []
 
         matches = []
-        
-        # 2. Loop Candidates
-        for item in candidates:
-            try:
-                url = item.get('image_url')
-                if not url: continue
-                
-                # Fix Localhost
-                if 'localhost' in url and '127.0.0.1' not in url:
-                    url = url.replace('localhost', '127.0.0.1')
-                
-                # Handling Backslash (Windows Path Fix)
-                url = url.replace('\\', '/')
-
-                logging.debug(f"Downloading: {url}")
-
-                # Download dengan Requests
+        # Kandidat tanpa id tidak bisa dikembalikan sebagai match: lewati saja
+        pending = [item for item in candidates or [] if isinstance(item, dict) and item.get('id') is not None]
+
+        # 2. Kandidat yang sudah di-index: satu perhitungan jarak untuk semua
+        if index is not None:
+            with stage('product.index_score'):
+                if candidates is None:
+                    ids, matrix = ann.shortlist(query_vec, nprobe) if ann is not None else index.all()
+                    result_ids = ids
+                else:
+                    indexed, unindexed = [], []
+                    for item in pending:
+                        url = self.normalize_url(item.get('image_url'))
+                        if index.has(item['id'], url):
+                            indexed.append(item)
+                        else:
+                            unindexed.append(item)
+                    pending = unindexed
+                    ids, matrix = index.get_many([item['id'] for item in indexed])
+                    result_ids = [item['id'] for item in indexed]
+
+                if len(ids) > 0:
+                    scores = self.score_features(query_vec, matrix)
+                    for product_id, score in zip(result_ids, scores):
+                        if score > 10: # ALMOST ANY SIMILARITY OK
+                            matches.append({'id': product_id, 'score': float(score)})
+                logging.info(f"Scored {len(ids)} indexed candidates, {len(pending)} need download")
+
+        # 3. Kandidat yang belum di-index: download paralel (decode + feature
+        #    juga di thread pool), dibatasi deadline total
+        if pending:
+            with stage('product.fetch'):
+                deadline = time.monotonic() + self.match_deadline
+                fetched = []
+                futures = {
+                    self._get_executor().submit(self._fetch_features, item, deadline): item
+                    for item in pending
+                }
                 try:
-                    headers = {'User-Agent': 'Mozilla/5.0'}
-                    dl_url = url.replace('localhost', '127.0.0.1')
-                    
-                    response = requests.get(dl_url, timeout=5, headers=headers, verify=False)
-                    
-                    if response.status_code != 200: 
-                        logging.warning(f"Download failed: {dl_url} status {response.status_code}")
-                        continue
-                    
-                    # Buka dengan PIL
-                    img_pil = Image.open(BytesIO(response.content)).convert('RGB')
-                    img_cand = np.array(img_pil)
-                    
-                    # 1. HISTOGRAM MATCHING
-                    cand_hist = get_histogram(img_cand)
-                    if cand_hist is None: continue
-                    hist_dist = np.linalg.norm(query_hist - cand_hist)
-                    score_hist = max(0, 100 - (hist_dist * 50))
-                    
-                    # 2. PIXEL MSE MATCHING (32x32)
-                    q_small = resize(query_img_array, (32, 32), anti_aliasing=True)
-                    c_small = resize(img_cand, (32, 32), anti_aliasing=True)
-                    mse = np.mean((q_small - c_small) ** 2)
-                    score_mse = max(0, 100 - (mse * 500)) 
-                    
-                    # FINAL SCORE
-                    final_score = (score_mse * 0.7) + (score_hist * 0.3)
-                    
-                    logging.info(f"ID {item['id']} -> MSE={score_mse:.1f}, Hist={score_hist:.1f}, Final={final_score:.1f}")
-
-                    if final_score > 10: # ALMOST ANY SIMILARITY OK
-                        matches.append({'id': item['id'], 'score': final_score})
-                        
-                except Exception as down_err:
-                    logging.error(f"Exception downloading {url}: {down_err}")
-                    continue
-                    
-            except Exception as e:
-                continue
+                    for future in as_completed(futures, timeout=max(0.0, deadline - time.monotonic())):
+                        item = futures[future]
+                        product_id = item.get('id')
+                        try:
+                            url, cand_vec = future.result()
+                            if cand_vec is None: continue
+                            final_score = float(self.score_features(query_vec, cand_vec[None, :])[0])
+                        except Exception as e:
+                            logging.error(f"Exception matching {item.get('image_url')}: {e}")
+                            continue
+                        logging.info(f"ID {product_id} -> Final={final_score:.1f}")
+
+                        if final_score > 10: # ALMOST ANY SIMILARITY OK
+                            matches.append({'id': product_id, 'score': final_score})
+                        fetched.append((product_id, cand_vec, url))
+                except FuturesTimeout:
+                    skipped = sum(1 for f in futures if not f.done())
+                    logging.warning(f"Match deadline {self.match_deadline}s reached, skipped {skipped} candidates")
+                    for f in futures:
+                        f.cancel()
+
+                # Simpan ke index agar pencarian berikutnya tidak download lagi
+                if index is not None and fetched:
+                    index.upsert_many(fetched)
         
         matches.sort(key=lambda x: x['score'], reverse=True)
         logging.info(f"Found {len(matches)} matches")
         return matches[:10]
 
-    def analyze(self, img_array):
+    def get_histogram(self, img_arr):
+        """HSV histogram (8 hue, 4 sat, 4 val bins), dinormalisasi"""
+        try:
+            # Resize
+            img_small = resize(img_arr, (64, 64), anti_aliasing=True)
+            if img_small.shape[-1] == 4: img_small = img_small[:,:,:3] # Remove Alpha
+            img_hsv = rgb2hsv(img_small)
+            
+            h_hist, _ = np.histogram(img_hsv[:,:,0], bins=8, range=(0, 1))
+            s_hist, _ = np.histogram(img_hsv[:,:,1], bins=4, range=(0, 1))
+            v_hist, _ = np.histogram(img_hsv[:,:,2], bins=4, range=(0, 1))
+            
+            hist = np.concatenate([h_hist, s_hist, v_hist]).astype(np.float32)
+            hist = hist / (hist.sum() + 1e-5)
+            return hist
+        except Exception as e:
+            logging.error(f"Hist Error: {e}")
+            return None
+
+    def get_thumbnail(self, img_arr):
+        """32x32 RGB thumbnail in [0, 1] untuk pixel MSE"""
+        if img_arr.shape[-1] == 4: img_arr = img_arr[:,:,:3]
+        return resize(img_arr, (self.THUMB_SIZE, self.THUMB_SIZE), anti_aliasing=True).astype(np.float32)
+
+    def extract_features(self, img_arr):
+        """
+        Feature vector satu gambar: [histogram (16) | thumbnail 32x32x3].
+        Format ini yang disimpan di ProductFeatureIndex.
+        """
+        if img_arr.ndim == 2:
+            img_arr = np.stack([img_arr] * 3, axis=-1)
+        hist = self.get_histogram(img_arr)
+        if hist is None:
+            return None
+        return np.concatenate([hist, self.get_thumbnail(img_arr).ravel()]).astype(np.float32)
+
+    def score_features(self, query_vec, matrix):
+        """
+        Similarity score (0-100) query terhadap banyak feature vector sekaligus.
+        final = 0.7 * skor MSE thumbnail + 0.3 * skor jarak histogram
+        """
+        hist_len = self.HIST_LEN
+        # 1. HISTOGRAM MATCHING
+        hist_dist = np.linalg.norm(matrix[:, :hist_len] - query_vec[:hist_len], axis=1)
+        score_hist = np.maximum(0, 100 - (hist_dist * 50))
+        
+        # 2. PIXEL MSE MATCHING (32x32)
+        mse = np.mean((matrix[:, hist_len:] - query_vec[hist_len:]) ** 2, axis=1)
+        score_mse = np.maximum(0, 100 - (mse * 500))
+        
+        # FINAL SCORE
+        return (score_mse * 0.7) + (score_hist * 0.3)
+
+    def normalize_url(self, url):
+        if not url: return None
+        # Fix Localhost
+        if 'localhost' in url and '127.0.0.1' not in url:
+            url = url.replace('localhost', '127.0.0.1')
+        # Handling Backslash (Windows Path Fix)
+        return url.replace('\\', '/')
+
+    def download_image(self, url, timeout=None):
+        """Download satu gambar kandidat, return RGB array atau None"""
+        logging.debug(f"Downloading: {url}")
+        try:
+            response = self._get_session().get(url, timeout=timeout or self.fetch_timeout, verify=False)
+            
+            if response.status_code != 200: 
+                logging.warning(f"Download failed: {url} status {response.status_code}")
+                return None
+            
+            # Buka dengan PIL
+            img_pil = Image.open(BytesIO(response.content)).convert('RGB')
+            return np.array(img_pil)
+        except Exception as down_err:
+            logging.error(f"Exception downloading {url}: {down_err}")
+            return None
+
+    def _fetch_features(self, item, deadline):
+        """Download + feature extraction satu kandidat (jalan di thread pool)"""
+        url = self.normalize_url(item.get('image_url'))
+        remaining = deadline - time.monotonic()
+        if not url or remaining <= 0:
+            return url, None
+
+        with stage('product.download'):
+            img_cand = self.download_image(url, timeout=min(self.fetch_timeout, remaining))
+        if img_cand is None:
+            return url, None
+        with stage('product.candidate_features'):
+            return url, self.extract_features(img_cand)
+
+    def _get_session(self):
+        if self._session is None:
+            with self._init_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=self.fetch_workers,
+                        pool_maxsize=self.fetch_workers
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    session.headers['User-Agent'] = 'Mozilla/5.0'
+                    self._session = session
+        return self._session
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._init_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.fetch_workers,
+                        thread_name_prefix='product-fetch'
+                    )
+        return self._executor
+
+    def analyze(self, img_array, tier=None):
         """
         Menganalisis gambar.
+        tier: 'fast' | 'balanced' | 'accurate' (None = default_tier)
         """
+        tier = tier or self.default_tier
         try:
-            logging.info("Analyzing generic features...")
-            img_resized = resize(img_array, (200, 200), anti_aliasing=True)
-            gray_img = rgb2gray(img_resized)
+            params = self.TIERS[tier]
+            logging.info(f"Analyzing generic features (tier={tier})...")
+            with stage('product.resize'):
+                img_resized = self._working_image(img_array, params)
+                gray_img = rgb2gray(img_resized)
             
-            color_res = self._detect_dominant_color(img_resized)
+            with stage('product.color'):
+                color_res = self._detect_dominant_color(img_resized)
             color_name = color_res['name']
             is_green = color_res['is_green']
             
-            is_man_made = self._check_man_made_features(gray_img)
+            if params['lines'] == 'hough':
+                with stage('product.hough'):
+                    is_man_made = self._check_man_made_features(gray_img, params['angles'])
+            else:
+                with stage('product.orientation'):
+                    is_man_made = self._check_edge_orientations(gray_img)
             entropy_val = shannon_entropy(gray_img)
             
             logging.info(f"Features: ManMade={is_man_made}, Green={is_green}, Ent={entropy_val:.2f}, Col={color_name}")
@@ -153,22 +323,53 @@ class ProductAnalyzer:
                 'detected_features': {
                     'category': category,
                     'color': color_name,
-                    'is_man_made': is_man_made
-                }
+                    'is_man_made': bool(is_man_made)
+                },
+                'tier': tier
             }
         except Exception as e:
             logging.error(f"Analysis error: {e}")
             print(f"Product Analysis Error: {e}")
             return {'success': False, 'error': str(e)}
 
-    def _check_man_made_features(self, gray_image):
+    def _working_image(self, img_array, params):
+        """Resize ke resolusi kerja tier (persegi, float 0..1)"""
+        size = params['size']
+        prescale = params['prescale']
+        if prescale and img_array.dtype == np.uint8 and min(img_array.shape[:2]) > prescale * size:
+            # Box filter PIL (uint8) membawa gambar besar ke 2x ukuran kerja dengan
+            # murah; sisa faktor 2 tetap lewat resize float anti-aliasing agar nilai
+            # piksel kontinu seperti accurate (shannon_entropy menghitung nilai unik)
+            target = prescale * size
+            img_array = np.asarray(Image.fromarray(img_array).resize((target, target), Image.BOX, reducing_gap=2.0))
+        return resize(img_array, (size, size), anti_aliasing=True)
+
+    def _check_man_made_features(self, gray_image, angles=360):
         edges = canny(gray_image, sigma=2.0)
-        tested_angles = np.linspace(-np.pi / 2, np.pi / 2, 360, endpoint=False)
+        tested_angles = np.linspace(-np.pi / 2, np.pi / 2, angles, endpoint=False)
         h, theta, d = hough_line(edges, theta=tested_angles)
-        peaks = hough_line_peaks(h, theta, d, num_peaks=10, threshold=0.3*np.max(h))
+        # Jarak minimum antar puncak tetap 5 derajat berapa pun jumlah sudutnya
+        peaks = hough_line_peaks(h, theta, d, num_peaks=10, threshold=0.3*np.max(h),
+                                 min_angle=max(1, round(10 * angles / 360)))
         num_lines = len(peaks[0])
         return num_lines >= 3
 
+    def _check_edge_orientations(self, gray_image):
+        """
+        Pengganti Hough yang murah (tier fast): histogram orientasi gradien di
+        piksel tepi. Aturannya meniru Hough: >= 3 orientasi dengan bobot
+        >= 0.3 x maksimum, dan tepi tidak terlalu sedikit.
+        """
+        edges = canny(gray_image, sigma=2.0 * gray_image.shape[0] / 200)
+        if np.count_nonzero(edges) < self.MIN_EDGE_FRACTION * edges.size:
+            return False
+        gy = sobel_h(gray_image)[edges]
+        gx = sobel_v(gray_image)[edges]
+        orientation = np.arctan2(gy, gx) % np.pi
+        bins = (orientation * (self.ORIENTATION_BINS / np.pi)).astype(np.int64) % self.ORIENTATION_BINS
+        hist = np.bincount(bins, weights=np.hypot(gx, gy), minlength=self.ORIENTATION_BINS)
+        return hist.max() > 0 and np.count_nonzero(hist >= 0.3 * hist.max()) >= 3
+
     def _detect_dominant_color(self, img):
         hsv = color.rgb2hsv(img)
         h_mean = np.mean(hsv[:,:,0])
@@ -0,0 +1,299 @@
+"""
+Product ANN - approximate nearest neighbour untuk visual search skala katalog
+IVF (inverted file) dengan centroid k-means di NumPy di atas
+ProductFeatureIndex. Query hanya dibandingkan dengan centroid, lalu
+produk di `nprobe` cluster terdekat di-rerank secara exact dengan
+ProductAnalyzer.score_features. nprobe = knob recall vs latency.
+
+Ruang coarse (untuk clustering) memakai histogram + thumbnail yang
+di-pool 4x4 (8x8x3), diberi bobot agar jarak L2 kira-kira sebanding
+dengan penalti skor matching.
+
+Training k-means (pertama kali, atau saat index tumbuh jauh) berjalan di
+thread background di luar lock; selama itu query memakai exact search
+(belum ada centroid) atau centroid lama.
+"""
+
+import threading
+
+import numpy as np
+
+
+class ProductANN:
+    HIST_LEN = 16
+    THUMB_SIZE = 32
+    POOL = 4
+
+    # Bobot ruang coarse (lihat docstring modul)
+    HIST_WEIGHT = 7.0
+    THUMB_WEIGHT = np.sqrt(350.0 / 192.0)
+
+    def __init__(self, index, nprobe=8, min_train_size=1000, retrain_growth=4.0, seed=42):
+        self.index = index
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.seed = seed
+
+        self._lock = threading.RLock()
+        self._centroids = None
+        self._lists = []            # list id -> set of product keys
+        self._assigned = {}         # product key -> (list id, image_url)
+        self._trained_size = 0
+        self._synced_generation = None
+        self._rebuild_thread = None
+
+    # ==================== SEARCH ====================
+
+    def shortlist(self, query_vec, nprobe=None):
+        """
+        Return (ids, feature matrix) kandidat untuk rerank exact.
+        Sebelum cukup data untuk clustering, kembalikan seluruh index (exact).
+        """
+        with self._lock:
+            self._sync()
+            if self._centroids is None:
+                return self.index.all()
+
+            nprobe = max(1, min(nprobe or self.nprobe, len(self._lists)))
+            coarse_q = self.coarse_vectors(query_vec[None, :])[0]
+            dist = ((self._centroids - coarse_q) ** 2).sum(axis=1)
+            probe = np.argpartition(dist, nprobe - 1)[:nprobe]
+
+            keys = [key for list_id in probe for key in self._lists[list_id]]
+        return self.index.get_many(keys)
+
+    def search(self, query_vec, analyzer, k=10, nprobe=None):
+        """Top-k (id, score) dengan rerank exact di shortlist"""
+        ids, matrix = self.shortlist(query_vec, nprobe)
+        if len(ids) == 0:
+            return []
+        scores = analyzer.score_features(query_vec, matrix)
+        top = np.argsort(-scores, kind='stable')[:k]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def stats(self):
+        with self._lock:
+            sizes = [len(l) for l in self._lists]
+            return {
+                'trained': self._centroids is not None,
+                'rebuilding': self._rebuild_thread is not None and self._rebuild_thread.is_alive(),
+                'nlist': len(self._lists),
+                'nprobe': self.nprobe,
+                'trained_size': self._trained_size,
+                'assigned': len(self._assigned),
+                'max_list_size': max(sizes) if sizes else 0
+            }
+
+    # ==================== BUILD / SYNC ====================
+
+    def coarse_vectors(self, matrix):
+        """Full feature vectors -> vektor coarse (histogram + thumbnail 8x8x3)"""
+        n = matrix.shape[0]
+        hist = matrix[:, :self.HIST_LEN]
+        thumb = matrix[:, self.HIST_LEN:].reshape(n, self.THUMB_SIZE // self.POOL, self.POOL,
+                                                 self.THUMB_SIZE // self.POOL, self.POOL, 3)
+        pooled = thumb.mean(axis=(2, 4)).reshape(n, -1)
+        return np.hstack([hist * self.HIST_WEIGHT, pooled * self.THUMB_WEIGHT]).astype(np.float32)
+
+    def rebuild(self):
+        """Train ulang centroid k-means dan assign semua produk"""
+        # Bagian berat (k-means, assign) di luar lock: query tetap jalan
+        state = self._build()
+        with self._lock:
+            self._centroids, self._lists, self._assigned, self._trained_size, generation = state
+            self._synced_generation = generation
+
+    def _build(self):
+        generation, urls = self.index.snapshot()
+        ids, matrix = self.index.all()
+        n = len(ids)
+        if n < self.min_train_size:
+            return None, [], {}, 0, generation
+
+        nlist = max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * 64)
+        sample_rows = np.sort(rng.choice(n, sample_size, replace=False))
+        sample = self.coarse_vectors(np.asarray(matrix[sample_rows]))
+        centroids = self._kmeans(sample, nlist, rng)
+
+        lists = [set() for _ in range(nlist)]
+        assigned = {}
+        for start in range(0, n, 4096):
+            chunk = np.asarray(matrix[start:start + 4096])
+            labels = self._nearest_centroid(self.coarse_vectors(chunk), centroids)
+            for key, list_id in zip(ids[start:start + 4096], labels):
+                lists[list_id].add(key)
+                assigned[key] = (int(list_id), urls.get(key))
+        return centroids, lists, assigned, n, generation
+
+    def _start_rebuild(self):
+        """Rebuild di thread background (dipanggil di bawah lock); satu per waktu"""
+        if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+            return
+        self._rebuild_thread = threading.Thread(target=self._background_rebuild, name='ann-rebuild', daemon=True)
+        self._rebuild_thread.start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"WARN: ANN rebuild failed: {e}")
+
+    def wait_rebuild(self, timeout=None):
+        """Tunggu rebuild background selesai (warm-up, benchmark)"""
+        thread = self._rebuild_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _sync(self):
+        """Ikuti perubahan ProductFeatureIndex secara incremental (add/update/remove)"""
+        # Cek generation dulu (murah); snapshot O(N) hanya kalau index berubah
+        if self.index.version == self._synced_generation:
+            return
+        generation, urls = self.index.snapshot()
+
+        needs_training = self._centroids is None and len(urls) >= self.min_train_size
+        grew_too_much = self._centroids is not None and len(urls) > self._trained_size * self.retrain_growth
+        if needs_training or grew_too_much:
+            # Sementara: exact search (belum ada centroid) atau centroid lama
+            self._start_rebuild()
+
+        if self._centroids is not None:
+            # Hapus yang sudah tidak ada
+            for key in [key for key in self._assigned if key not in urls]:
+                list_id, _ = self._assigned.pop(key)
+                self._lists[list_id].discard(key)
+
+            # Tambah yang baru / gambarnya berubah
+            changed = [key for key, url in urls.items()
+                       if key not in self._assigned or self._assigned[key][1] != url]
+            if changed:
+                keys, matrix = self.index.get_many(changed)
+                labels = self._nearest_centroid(self.coarse_vectors(matrix))
+                for key, list_id in zip(keys, labels):
+                    old = self._assigned.get(key)
+                    if old is not None:
+                        self._lists[old[0]].discard(key)
+                    self._lists[list_id].add(key)
+                    self._assigned[key] = (int(list_id), urls.get(key))
+
+        self._synced_generation = generation
+
+    def _nearest_centroid(self, vectors, centroids=None):
+        centroids = self._centroids if centroids is None else centroids
+        dist = (
+            (vectors ** 2).sum(axis=1)[:, None]
+            - 2.0 * vectors @ centroids.T
+            + (centroids ** 2).sum(axis=1)[None, :]
+        )
+        return dist.argmin(axis=1)
+
+    def _kmeans(self, data, k, rng, iterations=20):
+        """Lloyd's k-means dengan inisialisasi k-means++ (sederhana)"""
+        centroids = np.empty((k, data.shape[1]), dtype=np.float32)
+        centroids[0] = data[rng.integers(len(data))]
+        closest = ((data - centroids[0]) ** 2).sum(axis=1)
+        for i in range(1, k):
+            probs = closest / closest.sum() if closest.sum() > 0 else None
+            centroids[i] = data[rng.choice(len(data), p=probs)]
+            closest = np.minimum(closest, ((data - centroids[i]) ** 2).sum(axis=1))
+
+        for _ in range(iterations):
+            labels = self._nearest_centroid(data, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, data)
+            counts = np.bincount(labels, minlength=k)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        return centroids
+
+
+# Recall@10 terhadap brute force
+if __name__ == "__main__":
+    import os
+    import sys
+    import tempfile
+    import time
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from models.product_analyzer import ProductAnalyzer
+    from models.product_index import ProductFeatureIndex
+
+    n_products, n_families, n_queries = 20000, 400, 200
+    rng = np.random.default_rng(0)
+    analyzer = ProductAnalyzer()
+
+    # Katalog sintetis: "keluarga" produk yang mirip (foto sejenis) + noise
+    def synthetic(count, family_ids, noise):
+        hist = np.abs(family_hists[family_ids] + rng.normal(0, noise * 0.05, (count, analyzer.HIST_LEN)))
+        hist /= hist.sum(axis=1, keepdims=True)
+        thumb = family_thumbs[family_ids] + rng.normal(0, noise, (count, analyzer.FEATURE_DIM - analyzer.HIST_LEN))
+        return np.hstack([hist, np.clip(thumb, 0, 1)]).astype(np.float32)
+
+    # Kategori -> keluarga -> produk, supaya tetangga tidak terpisah rapi per cluster
+    categories = rng.integers(0, 40, n_families)
+    family_hists = rng.dirichlet(np.ones(analyzer.HIST_LEN), 40)[categories]
+    family_thumbs = rng.random((40, analyzer.FEATURE_DIM - analyzer.HIST_LEN))[categories]
+    family_thumbs += rng.normal(0, 0.12, family_thumbs.shape)
+    families = rng.integers(0, n_families, n_products)
+    vectors = synthetic(n_products, families, 0.2)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = ProductFeatureIndex(tmp)
+        index.upsert_many((f"p{i}", v, None) for i, v in enumerate(vectors))
+        ann = ProductANN(index)
+
+        started = time.perf_counter()
+        ann.rebuild()
+        print(f"Build: {n_products} products, nlist={ann.stats()['nlist']}, {time.perf_counter() - started:.2f}s")
+
+        queries = synthetic(n_queries, rng.integers(0, n_families, n_queries), 0.2)
+        ids, matrix = index.all()
+        matrix = np.asarray(matrix)
+
+        started = time.perf_counter()
+        exact = []
+        for q in queries:
+            scores = analyzer.score_features(q, matrix)
+            exact.append({ids[i] for i in np.argsort(-scores, kind='stable')[:10]})
+        brute_ms = (time.perf_counter() - started) / n_queries * 1e3
+        print(f"Brute force: {brute_ms:.2f} ms/query")
+
+        for nprobe in (1, 2, 4, 8, 16):
+            started = time.perf_counter()
+            found = [{pid for pid, _ in ann.search(q, analyzer, k=10, nprobe=nprobe)} for q in queries]
+            ann_ms = (time.perf_counter() - started) / n_queries * 1e3
+            recall = np.mean([len(f & e) / 10 for f, e in zip(found, exact)])
+            print(f"nprobe={nprobe:<3} recall@10={recall:.3f}  {ann_ms:.2f} ms/query")
+            if nprobe == ann.nprobe:
+                default_recall = recall
+
+        # Incremental add/remove tanpa rebuild
+        index.upsert('new-product', queries[0])
+        index.remove('p0')
+        top = ann.search(queries[0], analyzer, k=1)
+        assert top[0][0] == 'new-product', top
+        assert 'p0' not in {pid for pid, _ in ann.search(vectors[0], analyzer, k=10)}
+        assert default_recall >= 0.9, f"recall@10 terlalu rendah: {default_recall:.3f}"
+
+        # Training pertama di background: query pertama exact, tanpa menunggu k-means
+        fresh = ProductANN(index)
+        snapshots = []
+        original_snapshot = index.snapshot
+        index.snapshot = lambda: snapshots.append(1) or original_snapshot()
+        started = time.perf_counter()
+        first = fresh.search(queries[1], analyzer, k=10)
+        first_ms = (time.perf_counter() - started) * 1e3
+        fresh.wait_rebuild()
+        for q in queries[:20]:
+            fresh.search(q, analyzer, k=10)
+        index.snapshot = original_snapshot
+        print(f"First query during background build: {first_ms:.1f} ms, snapshot calls for 21 queries: {len(snapshots)}")
+        assert {pid for pid, _ in first} == {ids[i] for i in np.argsort(
+            -analyzer.score_features(queries[1], np.asarray(index.all()[1])), kind='stable')[:10]}
+        assert fresh.stats()['trained'] and not fresh.stats()['rebuilding']
+        # 1 snapshot di query pertama + 1 di rebuild; index tidak berubah -> tidak ada lagi
+        assert len(snapshots) == 2, len(snapshots)
+        print("OK")
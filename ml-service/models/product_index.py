@@ -0,0 +1,233 @@
+"""
+Product Feature Index - feature visual produk marketplace yang persisten
+Feature vector (histogram HSV + thumbnail, lihat ProductAnalyzer.extract_features)
+disimpan per product id di satu file .npy yang di-memory-map, sehingga
+find_matches tidak perlu download gambar kandidat setiap pencarian.
+
+File:
+- features.npy : float32 (capacity, dim), baris 0..count-1 terpakai
+- meta.json    : urutan id, url gambar per id, dim, capacity, generation
+"""
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: tanpa lock antar proses (cukup untuk mode single process)
+    fcntl = None
+
+
+class ProductFeatureIndex:
+    def __init__(self, index_dir, initial_capacity=256):
+        self.index_dir = index_dir
+        self.features_path = os.path.join(index_dir, 'features.npy')
+        self.meta_path = os.path.join(index_dir, 'meta.json')
+        self.lock_path = os.path.join(index_dir, '.lock')
+        self.initial_capacity = initial_capacity
+
+        self._lock = threading.RLock()
+        self._features = None
+        self._ids = []
+        self._positions = {}
+        self._urls = {}
+        self._dim = None
+        self._generation = 0
+        self._meta_mtime = None
+
+        os.makedirs(index_dir, exist_ok=True)
+        self._load()
+
+    # ==================== READ ====================
+
+    def __len__(self):
+        with self._lock:
+            self._refresh_if_changed()
+            return len(self._ids)
+
+    @property
+    def version(self):
+        """Berubah setiap kali isi index berubah (dipakai di key cache hasil)"""
+        with self._lock:
+            self._refresh_if_changed()
+            return self._generation
+
+    def has(self, product_id, image_url=None):
+        """True jika id sudah di-index (dan url gambarnya sama, bila diberikan)"""
+        with self._lock:
+            self._refresh_if_changed()
+            key = str(product_id)
+            if key not in self._positions:
+                return False
+            return image_url is None or self._urls.get(key) == image_url
+
+    def get_many(self, product_ids):
+        """Return (ids found, feature matrix) untuk daftar id"""
+        with self._lock:
+            self._refresh_if_changed()
+            keys = [str(pid) for pid in product_ids if str(pid) in self._positions]
+            if not keys:
+                return [], np.empty((0, self._dim or 0), dtype=np.float32)
+            rows = np.fromiter((self._positions[k] for k in keys), dtype=np.int64, count=len(keys))
+            return keys, np.asarray(self._features[rows])
+
+    def all(self):
+        """Return (all ids, feature matrix view)"""
+        with self._lock:
+            self._refresh_if_changed()
+            if not self._ids:
+                return [], np.empty((0, self._dim or 0), dtype=np.float32)
+            return list(self._ids), self._features[:len(self._ids)]
+
+    def snapshot(self):
+        """Return (generation, {id: image_url}) untuk sinkronisasi index turunan (ANN)"""
+        with self._lock:
+            self._refresh_if_changed()
+            return self._generation, {key: self._urls.get(key) for key in self._ids}
+
+    def stats(self):
+        with self._lock:
+            self._refresh_if_changed()
+            return {
+                'count': len(self._ids),
+                'capacity': 0 if self._features is None else self._features.shape[0],
+                'dim': self._dim,
+                'generation': self._generation,
+                'path': self.index_dir
+            }
+
+    # ==================== WRITE ====================
+
+    def upsert(self, product_id, vector, image_url=None):
+        self.upsert_many([(product_id, vector, image_url)])
+
+    def upsert_many(self, items):
+        """items: iterable of (product_id, vector, image_url)"""
+        items = list(items)
+        if not items:
+            return
+
+        with self._lock, self._process_lock():
+            self._refresh_if_changed()
+            for product_id, vector, image_url in items:
+                vector = np.asarray(vector, dtype=np.float32).ravel()
+                self._ensure_dim(vector.shape[0])
+
+                key = str(product_id)
+                row = self._positions.get(key)
+                if row is None:
+                    row = len(self._ids)
+                    self._ensure_capacity(row + 1)
+                    self._ids.append(key)
+                    self._positions[key] = row
+
+                self._features[row] = vector
+                self._urls[key] = image_url
+
+            self._features.flush()
+            self._save_meta()
+
+    def remove(self, product_id):
+        """Hapus satu id (baris terakhir dipindah ke posisinya). Return True jika ada."""
+        with self._lock, self._process_lock():
+            self._refresh_if_changed()
+            key = str(product_id)
+            row = self._positions.pop(key, None)
+            if row is None:
+                return False
+
+            last = len(self._ids) - 1
+            if row != last:
+                last_key = self._ids[last]
+                self._features[row] = self._features[last]
+                self._ids[row] = last_key
+                self._positions[last_key] = row
+            self._ids.pop()
+            self._urls.pop(key, None)
+
+            self._features.flush()
+            self._save_meta()
+            return True
+
+    # ==================== STORAGE ====================
+
+    def _ensure_dim(self, dim):
+        if self._dim is None:
+            self._dim = dim
+        elif self._dim != dim:
+            raise ValueError(f"Dimensi feature {dim} tidak sama dengan index ({self._dim})")
+
+    def _ensure_capacity(self, needed):
+        capacity = 0 if self._features is None else self._features.shape[0]
+        if needed <= capacity:
+            return
+
+        new_capacity = max(self.initial_capacity, capacity * 2, needed)
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix='.npy')
+        os.close(fd)
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(new_capacity, self._dim))
+        if capacity:
+            grown[:capacity] = self._features[:capacity]
+        grown.flush()
+        del grown
+
+        self._features = None
+        os.replace(tmp_path, self.features_path)
+        self._features = np.load(self.features_path, mmap_mode='r+')
+
+    def _save_meta(self):
+        self._generation += 1
+        meta = {
+            'dim': self._dim,
+            'generation': self._generation,
+            'ids': self._ids,
+            'urls': self._urls
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    def _load(self):
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.features_path):
+            return
+
+        with open(self.meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+        self._dim = meta.get('dim')
+        self._generation = meta.get('generation', 0)
+        self._ids = list(meta.get('ids', []))
+        self._positions = {key: row for row, key in enumerate(self._ids)}
+        self._urls = dict(meta.get('urls', {}))
+        self._features = np.load(self.features_path, mmap_mode='r+')
+
+    def _refresh_if_changed(self):
+        """Muat ulang jika proses lain (worker gunicorn) mengubah index"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._meta_mtime:
+            self._load()
+
+    @contextmanager
+    def _process_lock(self):
+        """Lock file antar proses agar worker tidak menulis bersamaan"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
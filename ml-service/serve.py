@@ -0,0 +1,52 @@
+"""
+Launcher mode produksi untuk ML Service
+
+    python serve.py                  # workers = jumlah core
+    python serve.py --workers 4 --port 5001
+
+Memakai Gunicorn (preload + fork). Di platform tanpa fork/Gunicorn
+(Windows) jatuh ke server Flask threaded tanpa debug/reloader.
+"""
+
+import argparse
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ML Service in production mode')
+    parser.add_argument('--workers', type=int, help='Jumlah worker process (default: jumlah core)')
+    parser.add_argument('--threads', type=int, help='Thread per worker (default: 16 dengan admission, 1 tanpa)')
+    parser.add_argument('--port', type=int, help='Port (default: ML_SERVICE_PORT atau 5001)')
+    args = parser.parse_args()
+
+    # Diteruskan lewat env agar gunicorn.conf.py tetap jadi satu sumber konfigurasi
+    if args.workers:
+        os.environ['ML_SERVICE_WORKERS'] = str(args.workers)
+    if args.threads:
+        os.environ['ML_SERVICE_THREADS'] = str(args.threads)
+    if args.port:
+        os.environ['ML_SERVICE_PORT'] = str(args.port)
+
+    os.chdir(BASE_DIR)
+    sys.path.insert(0, BASE_DIR)
+
+    try:
+        from gunicorn.app.wsgiapp import run
+    except ImportError:
+        run = None
+
+    if run is None or not hasattr(os, 'fork'):
+        print("WARNING: Gunicorn tidak tersedia, memakai Flask threaded server (single process)")
+        from wsgi import app
+        app.run(host='0.0.0.0', port=int(os.environ.get('ML_SERVICE_PORT', 5001)), debug=False, threaded=True)
+        return
+
+    sys.argv = ['gunicorn', '-c', os.path.join(BASE_DIR, 'gunicorn.conf.py'), 'wsgi:app']
+    run()
+
+
+if __name__ == '__main__':
+    main()
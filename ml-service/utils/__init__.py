@@ -0,0 +1,8 @@
+"""
+Utils Package
+Infrastruktur pendukung ML Service (cache, dll)
+"""
+
+from .result_cache import ResultCache
+
+__all__ = ['ResultCache']
@@ -0,0 +1,247 @@
+"""
+Admission - batas konkurensi dan antrean per endpoint (load shedding)
+Saat lonjakan pagi, request gambar menumpuk tanpa batas di belakang
+pekerjaan CPU-bound. Backend Node (aiService.js) menyerah setelah 5 detik
+dan memakai hasil rule-based, sementara service ini tetap membakar CPU
+untuk request yang tidak lagi ditunggu siapa pun. Di sini setiap endpoint
+punya:
+
+- concurrency : jumlah request yang boleh berjalan bersamaan
+- queue_size  : jumlah request yang boleh menunggu slot (FIFO); antrean
+                penuh langsung ditolak (503 + Retry-After) tanpa membaca body
+- deadline    : header X-Request-Timeout-Ms (sisa waktu, relatif) atau
+                X-Request-Deadline (unix epoch detik); request yang
+                deadline-nya lewat selama antre dibuang sebelum mulai
+
+Catatan: seperti metrics, antrean dihitung per proses worker. Request
+yang antre di sini memegang satu thread server selama menunggu, jadi
+batas ini hanya berarti kalau worker punya lebih banyak thread daripada
+konkurensi + antrean endpoint (Gunicorn gthread, ML_SERVICE_THREADS).
+Dengan worker sync satu thread, request berlebih menunggu di backlog
+socket Gunicorn dan tidak pernah sampai ke antrean ini.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+
+TIMEOUT_HEADER = 'X-Request-Timeout-Ms'
+DEADLINE_HEADER = 'X-Request-Deadline'
+
+# Rata-rata bergerak durasi layanan untuk estimasi Retry-After
+_EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER = 30
+
+
+class Rejected(Exception):
+    """
+    Request ditolak sebelum dikerjakan.
+    reason: queue_full | deadline | queue_timeout
+    """
+
+    def __init__(self, reason, message, retry_after=None):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('event', 'granted')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+def parse_deadline(headers, now=None):
+    """Deadline request sebagai time.monotonic() absolut, atau None"""
+    now = time.monotonic() if now is None else now
+    try:
+        if headers.get(TIMEOUT_HEADER):
+            return now + float(headers[TIMEOUT_HEADER]) / 1000.0
+        if headers.get(DEADLINE_HEADER):
+            return now + (float(headers[DEADLINE_HEADER]) - time.time())
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class EndpointLimiter:
+    """Semaphore FIFO dengan antrean terbatas untuk satu endpoint"""
+
+    def __init__(self, name, concurrency, queue_size, queue_timeout=5.0):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self._service_seconds = None
+        self._stats = {'admitted': 0, 'queue_full': 0, 'deadline': 0, 'queue_timeout': 0}
+
+    def acquire(self, deadline=None):
+        """
+        Ambil satu slot; tunggu di antrean kalau semua slot terpakai.
+        Return waktu mulai (untuk release), atau raise Rejected.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if deadline is not None and deadline <= now:
+                self._stats['deadline'] += 1
+                raise Rejected('deadline', f"{self.name}: deadline sudah lewat sebelum diproses")
+            if self._active < self.concurrency and not self._waiters:
+                self._active += 1
+                self._stats['admitted'] += 1
+                return now
+            if len(self._waiters) >= self.queue_size:
+                self._stats['queue_full'] += 1
+                raise Rejected('queue_full', f"{self.name}: antrean penuh ({self.queue_size})",
+                               self._retry_after())
+            waiter = _Waiter()
+            self._waiters.append(waiter)
+
+        limit = now + self.queue_timeout
+        if deadline is not None and deadline < limit:
+            limit, reason = deadline, 'deadline'
+        else:
+            reason = 'queue_timeout'
+        waiter.event.wait(max(0.0, limit - now))
+
+        with self._lock:
+            # Slot bisa saja diserahkan tepat saat wait habis: granted yang menentukan
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                self._stats[reason] += 1
+                raise Rejected(reason, f"{self.name}: tidak mendapat slot sebelum {reason.replace('_', ' ')}",
+                               None if reason == 'deadline' else self._retry_after())
+            self._stats['admitted'] += 1
+        return time.monotonic()
+
+    def release(self, started):
+        """Kembalikan slot; diserahkan langsung ke antrean terdepan kalau ada"""
+        elapsed = time.monotonic() - started
+        with self._lock:
+            if self._service_seconds is None:
+                self._service_seconds = elapsed
+            else:
+                self._service_seconds += _EWMA_ALPHA * (elapsed - self._service_seconds)
+
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self._active -= 1
+
+    def _retry_after(self):
+        """Perkiraan detik sampai antrean saat ini habis (dipanggil di bawah lock)"""
+        service = self._service_seconds or 1.0
+        estimate = (len(self._waiters) + 1) * service / self.concurrency
+        return min(MAX_RETRY_AFTER, max(1, math.ceil(estimate)))
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                concurrency=self.concurrency,
+                queue_size=self.queue_size,
+                active=self._active,
+                queued=len(self._waiters),
+                shed=self._stats['queue_full'] + self._stats['deadline'] + self._stats['queue_timeout'],
+                avg_service_ms=round(self._service_seconds * 1e3, 1) if self._service_seconds is not None else None
+            )
+
+
+class AdmissionController:
+    """Limiter per endpoint (nama view function Flask)"""
+
+    def __init__(self, limits, queue_timeout=5.0, enabled=True):
+        """limits: {endpoint: (concurrency, queue_size)}; concurrency 0 = tanpa batas"""
+        self.enabled = enabled
+        self._limiters = {
+            name: EndpointLimiter(name, concurrency, queue_size, queue_timeout)
+            for name, (concurrency, queue_size) in limits.items()
+            if concurrency > 0
+        }
+
+    def get(self, endpoint):
+        return self._limiters.get(endpoint) if self.enabled else None
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'endpoints': {name: limiter.stats() for name, limiter in self._limiters.items()}
+        }
+
+    def render(self):
+        """Queue depth dan shed count dalam format teks Prometheus"""
+        if not self.enabled:
+            return ''
+        snapshot = {name: limiter.stats() for name, limiter in sorted(self._limiters.items())}
+        lines = []
+        for metric, kind, help_text, key in (
+            ('ml_admission_active', 'gauge', 'Request yang sedang dikerjakan', 'active'),
+            ('ml_admission_queued', 'gauge', 'Request yang menunggu slot', 'queued'),
+            ('ml_admission_admitted_total', 'counter', 'Request yang mendapat slot', 'admitted'),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, stats in snapshot.items():
+                lines.append(f'{metric}{{endpoint="{name}"}} {stats[key]}')
+
+        lines.append('# HELP ml_admission_shed_total Request yang ditolak sebelum dikerjakan')
+        lines.append('# TYPE ml_admission_shed_total counter')
+        for name, stats in snapshot.items():
+            for reason in ('queue_full', 'deadline', 'queue_timeout'):
+                lines.append(f'ml_admission_shed_total{{endpoint="{name}",reason="{reason}"}} {stats[reason]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Self-check: ketiga alasan shed (queue_full, deadline, queue_timeout)
+if __name__ == "__main__":
+    limiter = EndpointLimiter('check', concurrency=1, queue_size=2, queue_timeout=0.2)
+    reasons = []
+
+    def attempt(deadline=None):
+        try:
+            started = limiter.acquire(deadline)
+        except Rejected as e:
+            reasons.append(e.reason)
+            return
+        time.sleep(0.05)
+        limiter.release(started)
+
+    held = limiter.acquire()
+
+    # Deadline sudah lewat saat tiba: ditolak tanpa antre
+    attempt(time.monotonic() - 1)
+    # Satu menunggu sampai deadline, satu sampai queue_timeout (slot masih dipegang)
+    waiting = [threading.Thread(target=attempt, args=(time.monotonic() + 0.1,)),
+               threading.Thread(target=attempt)]
+    for thread in waiting:
+        thread.start()
+    while limiter.stats()['queued'] < 2:
+        time.sleep(0.001)
+    # Antrean (2) penuh
+    attempt()
+    for thread in waiting:
+        thread.join()
+
+    # Slot dilepas -> penunggu berikutnya mendapat slot (FIFO)
+    granted = threading.Thread(target=attempt)
+    granted.start()
+    while limiter.stats()['queued'] < 1:
+        time.sleep(0.001)
+    limiter.release(held)
+    granted.join()
+
+    stats = limiter.stats()
+    print(f"Shed reasons: {sorted(reasons)}")
+    print(f"Stats: {stats}")
+    assert sorted(reasons) == ['deadline', 'deadline', 'queue_full', 'queue_timeout'], reasons
+    assert stats['admitted'] == 2 and stats['active'] == 0 and stats['queued'] == 0, stats
+    assert stats['shed'] == 4
+    print("OK")
@@ -0,0 +1,158 @@
+"""
+Metrics - instrumentasi latency per tahap (decode, grid scan, forest, GCV, ...)
+Setiap tahap dibungkus `with stage('disease.grid'):` dan dicatat ke histogram
+yang diekspor dalam format teks Prometheus (endpoint /metrics). Durasi tahap
+dalam satu request juga dikumpulkan untuk header Server-Timing.
+
+Dimatikan dengan ML_SERVICE_METRICS=false: stage() mengembalikan context
+manager no-op yang sama setiap kali, jadi overhead hampir nol.
+
+Catatan: histogram disimpan per proses. Dengan beberapa worker gunicorn,
+setiap scrape /metrics melihat satu worker.
+"""
+
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Batas bucket histogram (detik), 0.5 ms sampai 10 s
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+ENABLED = os.environ.get('ML_SERVICE_METRICS', 'true').lower() == 'true'
+
+# Durasi tahap untuk request yang sedang berjalan: list [(name, seconds)]
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+_NOOP = nullcontext()
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Histogram per (metric, label value), render ke format teks Prometheus"""
+
+    def __init__(self):
+        self._histograms = {}   # (metric, label name, label value) -> Histogram
+        self._help = {
+            'ml_stage_duration_seconds': 'Latency per tahap analisis',
+            'ml_request_duration_seconds': 'Latency request HTTP per endpoint',
+            'ml_queue_wait_seconds': 'Waktu menunggu slot admission per endpoint',
+        }
+        self._lock = threading.Lock()
+
+    def observe(self, metric, label_name, label_value, seconds):
+        key = (metric, label_name, label_value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._histograms.items())
+            snapshot = [(key, list(h.counts), h.sum, h.count, h.buckets) for key, h in items]
+
+        lines = []
+        current_metric = None
+        for (metric, label_name, label_value), counts, total, count, buckets in snapshot:
+            if metric != current_metric:
+                lines.append(f"# HELP {metric} {self._help.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                current_metric = metric
+            label = f'{label_name}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f'{metric}_sum{{{label}}} {total:.6f}')
+            lines.append(f'{metric}_count{{{label}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Stage:
+    __slots__ = ('name', 'started')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        REGISTRY.observe('ml_stage_duration_seconds', 'stage', self.name, elapsed)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        return False
+
+
+def stage(name):
+    """Context manager pengukur satu tahap; no-op kalau metrics dimatikan"""
+    if not ENABLED:
+        return _NOOP
+    return _Stage(name)
+
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = bool(enabled)
+
+
+def begin_request():
+    """Mulai mengumpulkan durasi tahap untuk request ini (return token)"""
+    return _request_timings.set([])
+
+
+def end_request(token):
+    """Return durasi tahap request ini dan berhenti mengumpulkan"""
+    timings = _request_timings.get()
+    _request_timings.reset(token)
+    return timings or []
+
+
+def observe_request(endpoint, seconds):
+    REGISTRY.observe('ml_request_duration_seconds', 'endpoint', endpoint, seconds)
+
+
+def server_timing_header(timings, total=None):
+    """
+    Header Server-Timing, contoh: 'disease.decode;dur=4.1, disease.grid;dur=2.3, total;dur=9.8'.
+    Tahap dengan nama sama (mis. fitur per kandidat) dijumlahkan.
+    """
+    merged = {}
+    for name, seconds in timings:
+        merged[name] = merged.get(name, 0.0) + seconds
+    parts = [f"{name};dur={seconds * 1e3:.1f}" for name, seconds in merged.items()]
+    if total is not None:
+        parts.append(f"total;dur={total * 1e3:.1f}")
+    return ', '.join(parts)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,148 @@
+"""
+Result Cache - cache hasil analisis gambar berbasis isi (content hash)
+Key = sha256(namespace + versi model + parameter + bytes gambar), jadi
+gambar yang dikirim ulang langsung mendapat hasil lama, dan retraining
+(versi model berubah) otomatis membuat entry lama tidak terpakai.
+
+Dua tier:
+- Memory: LRU dengan jumlah entry terbatas
+- Disk (opsional): file JSON per key, bertahan setelah restart
+Keduanya memakai TTL.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    def __init__(self, max_entries=256, ttl_seconds=3600, disk_dir=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or bool(self.disk_dir)
+
+    @staticmethod
+    def make_key(namespace, image_bytes, model_version, params=None):
+        """Content-addressed key for one image + model version + request params"""
+        digest = hashlib.sha256()
+        digest.update(f"{namespace}\0{model_version}\0".encode())
+        if params is not None:
+            digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        digest.update(b'\0')
+        if isinstance(image_bytes, str):
+            image_bytes = image_bytes.encode()
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return cached value or None"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+        entry = self._read_disk(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            # Promosikan ke memory
+            self._stats['disk_hits'] += 1
+            self._store_memory(key, entry[0], entry[1])
+        return entry[1]
+
+    def set(self, key, value):
+        """Store a JSON-serializable value"""
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._stats['stores'] += 1
+            self._store_memory(key, expires_at, value)
+        self._write_disk(key, expires_at, value)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                enabled=self.enabled,
+                memory_entries=len(self._memory),
+                max_entries=self.max_entries,
+                ttl_seconds=self.ttl_seconds,
+                disk_dir=self.disk_dir
+            )
+
+    def _store_memory(self, key, expires_at, value):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _read_disk(self, key, now):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('expires_at', 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry['expires_at'], entry['value']
+
+    def _write_disk(self, key, expires_at, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Tulis ke file sementara lalu rename agar atomic
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': expires_at, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"WARN: Result cache disk write failed: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
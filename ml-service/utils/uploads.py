@@ -0,0 +1,139 @@
+"""
+Uploads - body gambar biner tanpa inflasi base64 dan tanpa salinan ekstra
+Selain JSON base64, endpoint gambar menerima:
+- application/octet-stream / image/* : body mentah = bytes gambar
+- multipart/form-data field 'image'  : di-stream oleh parser werkzeug
+
+Body dibaca sekali ke satu buffer mmap: anonymous (RAM) untuk body kecil,
+file-backed (temp file di disk) di atas spool threshold. mmap adalah
+file-like (PIL bisa membaca langsung) sekaligus mendukung buffer protocol
+(hashlib untuk cache key), jadi tidak ada salinan bytes tambahan.
+"""
+
+import io
+import mmap
+import tempfile
+
+from flask import Request
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_SPOOL_THRESHOLD = 4 * 1024 * 1024
+BINARY_CONTENT_TYPES = ('application/octet-stream', 'image/')
+
+
+class UploadBuffer:
+    """
+    One uploaded image body.
+    - data: bytes (multipart kecil) atau mmap (siap untuk PIL / hashlib)
+    - spooled: True kalau isinya ada di temp file, bukan RAM
+    """
+
+    def __init__(self, data, spooled=False, file=None):
+        self.data = data
+        self.spooled = spooled
+        self._file = file
+
+    def __len__(self):
+        return len(self.data)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            try:
+                self.data.close()
+            except BufferError:
+                # Masih ada memoryview yang aktif; dibebaskan oleh GC
+                pass
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class UploadRequest(Request):
+    """
+    Flask request yang men-spool file multipart ke disk hanya di atas
+    threshold (default werkzeug: selalu SpooledTemporaryFile 500KB).
+    """
+
+    spool_threshold = DEFAULT_SPOOL_THRESHOLD
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is not None and total_content_length <= self.spool_threshold:
+            return io.BytesIO()
+        return tempfile.TemporaryFile('w+b')
+
+
+def is_binary_upload(request):
+    content_type = (request.mimetype or '').lower()
+    return any(content_type.startswith(t) for t in BINARY_CONTENT_TYPES)
+
+
+def read_request_image(request, field='image'):
+    """
+    Return UploadBuffer untuk body biner atau file multipart, atau None
+    (JSON / form base64 tetap ditangani endpoint seperti sebelumnya).
+    """
+    if is_binary_upload(request):
+        return read_binary_body(request.stream, request.content_length,
+                                getattr(request, 'spool_threshold', DEFAULT_SPOOL_THRESHOLD))
+
+    if request.mimetype == 'multipart/form-data' and field in request.files:
+        file = request.files[field]
+        if file.filename == '':
+            return None
+        return buffer_from_stream(file.stream)
+
+    return None
+
+
+def read_binary_body(stream, content_length, spool_threshold=DEFAULT_SPOOL_THRESHOLD):
+    """Read a raw request body into one mmap buffer (RAM or temp file)"""
+    if content_length is not None and content_length <= spool_threshold:
+        if content_length == 0:
+            return None
+        buffer = mmap.mmap(-1, content_length)
+        view = memoryview(buffer)
+        filled = 0
+        try:
+            while filled < content_length:
+                n = stream.readinto(view[filled:])
+                if not n:
+                    break
+                filled += n
+        finally:
+            view.release()
+        if filled < content_length:
+            buffer.close()
+            raise ValueError('Body request terpotong')
+        return UploadBuffer(buffer)
+
+    # Ukuran besar / tidak diketahui (chunked): spool ke disk per chunk
+    spool = tempfile.TemporaryFile('w+b')
+    chunk = bytearray(CHUNK_SIZE)
+    view = memoryview(chunk)
+    try:
+        while True:
+            n = stream.readinto(view)
+            if not n:
+                break
+            spool.write(view[:n])
+    finally:
+        view.release()
+    return _map_file(spool)
+
+
+def buffer_from_stream(stream):
+    """Multipart file stream (BytesIO atau temp file) -> UploadBuffer"""
+    if isinstance(stream, io.BytesIO):
+        # getvalue() berbagi buffer internal BytesIO (tanpa copy)
+        data = stream.getvalue()
+        return UploadBuffer(data) if data else None
+    return _map_file(stream)
+
+
+def _map_file(file):
+    file.flush()
+    size = file.seek(0, io.SEEK_END)
+    if size == 0:
+        file.close()
+        return None
+    return UploadBuffer(mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ), spooled=True, file=file)
@@ -0,0 +1,42 @@
+"""
+WSGI entry point untuk mode produksi (multi-process)
+
+    python serve.py --workers 4
+    # atau langsung:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Model dimuat sekali di proses induk (preload), lalu worker di-fork dan
+berbagi memori model secara copy-on-write.
+"""
+
+import os
+
+from app import app as flask_app, registry
+
+# Google Vision sengaja tidak di-preload: client gRPC tidak aman dipakai
+# setelah fork, jadi dibuat lazy di masing-masing worker.
+PRELOAD_MODELS = ['health_predictor', 'disease_detector', 'product_analyzer']
+# Process pool tidak bisa diwarisi lewat fork: dibuat per worker di post_fork
+WORKER_POOLS = ['image_executor']
+
+
+def create_app(preload=True):
+    """App factory: optionally load the CPU models before workers are forked"""
+    if preload:
+        registry.warm_up(PRELOAD_MODELS)
+
+        # Training di induk, bukan di tiap worker
+        health_predictor = registry.get('health_predictor')
+        if not os.path.exists(health_predictor.model_path):
+            print("Training health prediction model...")
+            health_predictor.train()
+
+    return flask_app
+
+
+def start_worker_pools():
+    """Start the worker-owned process pools (dipanggil dari gunicorn post_fork)"""
+    registry.warm_up(WORKER_POOLS)
+
+
+app = create_app(preload=os.environ.get('ML_SERVICE_PRELOAD', 'true').lower() == 'true')